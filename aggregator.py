@@ -1,26 +1,40 @@
 import os
 import sys
-import pandas as pd
 import configparser
 import logging
-import openpyxl
-from datetime import datetime
+import multiprocessing
+from datetime import datetime, timedelta
 import glob
 import re
-from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
+import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ingest import get_log_parser, get_log_schema, get_parse_workers, resolve_config_path
+from log_schema import apply_log_schema
+from failure_rules import FAILURE_RULES, evaluate_rules, load_failure_rules
+# pandas、openpyxl 等報表函式庫在實際讀檔或產生報表時才於函式內載入，
+# 啟動 (日期輸入、--check) 時不需等待載入 (打包為執行檔時尤其明顯)
 
 # 初始化日誌記錄
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def create_summary_dashboard(writer, df, date_str):
+def normalize_text(df, col):
     """
-    建立 'Summary_Dashboard' 分頁。
-    上半部：異常模式分析總表。
-    下半部：各線別詳細報表。
+    將字串欄位統一轉為去除前後空白的大寫字串；欄位不存在時視為空字串。
     """
-    workbook = writer.book
-    sheet_name = 'Summary_Dashboard'
-    
+    import pandas as pd
+
+    if col not in df.columns:
+        return pd.Series('', index=df.index)
+    return df[col].astype(str).str.strip().str.upper()
+
+def classify_results(df):
+    """
+    以欄位向量運算產生各項 calc_* 判定欄位 (直接寫回 df)。
+    每個字串欄位只正規化一次。
+    """
+    import pandas as pd
+
     # --- 1. 資料預處理 ---
     # A. 將關鍵欄位轉換為數值型態
     # 以 'dB(A)' 判斷部分異常狀況
@@ -44,15 +58,23 @@ def create_summary_dashboard(writer, df, date_str):
     cond_out_of_control = (df['RPM'] > df['RPM_Low']) | (df['RPM'] > 10000)
     cond_no_rotate = (df['RPM'] == 0)
 
+    # C. 字串欄位正規化 (每欄只做一次)
+    result_ok = normalize_text(df, 'Total_Result').eq('OK')
+    control_ok = normalize_text(df, 'Intelligent_Control').eq('OK')
+    cond_spec_fail = control_ok & ~result_ok
+
+    model_key = df['Model_Name'].astype(str).str.lower().str.replace(" ", "", regex=False)
+    barcode = df['Barcode']
+    cond_no_barcode = barcode.isna() | barcode.astype(str).str.strip().eq('')
+
     # --- 2. 詳細項目計數邏輯 ---
 
-    df['is_fail'] = df['Total_Result'].apply(lambda x: 0 if str(x).strip().upper() == 'OK' else 1)
+    df['is_fail'] = (~result_ok).astype(int)
 
     # 綜合 Noise 判定 (任一Index超標且風扇有運轉，或是頻譜超規格)
     df['calc_noise'] = (
         ((cond_idx1_high | cond_idx2_high | cond_idx3_high) & cond_rotating).astype(int) +
-        df.apply(lambda row: 1 if str(row.get('Intelligent_Control','')).strip().upper() == 'OK' 
-                 and str(row.get('Total_Result','')).strip().upper() != 'OK' else 0, axis=1)
+        cond_spec_fail.astype(int)
     )
 
     # 各項 Index 獨立 Fail 判定
@@ -63,551 +85,1110 @@ def create_summary_dashboard(writer, df, date_str):
     # 兩項(含)以上 Index 異常判定
     df['calc_multi_idx'] = (((cond_idx1_high.astype(int) + cond_idx2_high.astype(int) + cond_idx3_high.astype(int)) >= 2) & cond_rotating).astype(int)
     
-    df['calc_spec_fail'] = df.apply(lambda row: 1 if str(row.get('Intelligent_Control','')).strip().upper() == 'OK' 
-                                    and str(row.get('Total_Result','')).strip().upper() != 'OK' else 0, axis=1)
+    df['calc_spec_fail'] = cond_spec_fail.astype(int)
     
     df['calc_out_control'] = cond_out_of_control.astype(int)
     df['calc_no_rotate'] = cond_no_rotate.astype(int)
     df['calc_rpm_ng'] = ((cond_out_of_control) | (cond_no_rotate)).astype(int)
 
-    df['calc_pause'] = df['Model_Name'].apply(lambda x: 1 if 'pauseorfreerun' in str(x).lower().replace(" ", "") else 0)
-    df['calc_no_barcode'] = df['Barcode'].apply(lambda x: 1 if pd.isna(x) or str(x).strip() == '' else 0)
+    df['calc_pause'] = model_key.str.contains('pauseorfreerun', regex=False, na=False).astype(int)
+    df['calc_no_barcode'] = cond_no_barcode.astype(int)
     df['calc_others'] = ((df['calc_pause'] == 1) | (df['calc_no_barcode'] == 1)).astype(int)
 
+    return df
 
-    # --- 3. 邏輯分析階段 (預先計算總表所需數據) ---
-    
-    lines = sorted(df['Line_Name'].unique())
+# 站點統計表中逐站加總的判定欄位
+STAT_FLAG_COLS = [
+    'is_fail', 'calc_noise',
+    'calc_only_idx1', 'calc_only_idx2', 'calc_only_idx3', 'calc_multi_idx', 'calc_spec_fail',
+    'calc_rpm_ng', 'calc_out_control', 'calc_no_rotate',
+    'calc_others', 'calc_pause', 'calc_no_barcode'
+]
+
+# 需要平均值的量測欄位 -> 統計表中的加總欄位名稱
+STAT_MEAN_COLS = {
+    'index1': 'idx1_sum',
+    'index2': 'idx2_sum',
+    'index3': 'idx3_sum',
+    'dB(A)': 'dba_sum',
+    'RPM': 'rpm_sum'
+}
+
+# Index 值超過此門檻視為線材異常的一次紀錄
+CABLE_FAIL_INDEX = 300
+
+# 統計表中可直接相加合併的欄位
+STAT_SUM_COLS = ['total'] + STAT_FLAG_COLS + list(STAT_MEAN_COLS.values()) + ['cable_fail_count']
+
+def compute_station_stats(df, row_offset=0, cable_index=CABLE_FAIL_INDEX):
+    """
+    以單次 groupby(['Line_Name', 'Device_ID']) 計算各站點統計表。
+    表中只存放可直接相加的數值 (筆數、各判定加總、平均值分子、線材異常次數)，
+    以及依出現順序排列的有效機種名稱，平均值與比率由 finalize_station_stats 推導。
+    df 需先經過 classify_results 處理；分批計算時以 row_offset 標示此批資料的起始列號。
+    cable_index 為線材異常的 Index 門檻 ([Failure_Rules] Cable_Index_Limit)。
+    """
+    import pandas as pd
+
+    keys = ['Line_Name', 'Device_ID']
+    work = df[keys + STAT_FLAG_COLS + list(STAT_MEAN_COLS)].copy()
+    work['cable_fail_count'] = (
+        (df['index1'] > cable_index) | (df['index2'] > cable_index) | (df['index3'] > cable_index)
+    ).astype(int)
+    # 平均值分子以 float64 累加 (量測欄位可能為 float32)
+    work = work.astype({c: 'float64' for c in STAT_MEAN_COLS}).rename(columns=STAT_MEAN_COLS)
+
+    grouped = work.groupby(keys, sort=True, observed=True)
+    stats = grouped.sum()
+    stats.insert(0, 'total', grouped.size())
+
+    # 各站點第一次出現的位置，用於合併線別機種名稱時保持原始順序
+    first_rows = df[keys].reset_index(drop=True).drop_duplicates()
+    stats['first_seen'] = pd.Series(first_rows.index + row_offset, index=pd.MultiIndex.from_frame(first_rows))
+
+    # 有效機種名稱 (排除 pauseorfreerun)，依出現順序去重
+    models = df.loc[df['Model_Name'].notna() & (df['calc_pause'] == 0), keys + ['Model_Name']].drop_duplicates()
+    model_names = models.groupby(keys, sort=False, observed=True)['Model_Name'].agg(lambda s: tuple(str(n) for n in s))
+    stats['model_names'] = [model_names.get(k, ()) for k in stats.index]
+
+    return finalize_station_stats(stats)
+
+def finalize_station_stats(stats):
+    """
+    由統計表的加總欄位推導比率與平均值 (筆數為 0 時視為 0)。
+    """
+    total = stats['total'].where(stats['total'] > 0)
+    stats['rpm_rate'] = (stats['calc_rpm_ng'] / total).fillna(0)
+    stats['other_rate'] = (stats['calc_others'] / total).fillna(0)
+    stats['idx1_mean'] = (stats['idx1_sum'] / total).fillna(0)
+    stats['idx2_mean'] = (stats['idx2_sum'] / total).fillna(0)
+    stats['idx3_mean'] = (stats['idx3_sum'] / total).fillna(0)
+    stats['dba_mean'] = (stats['dba_sum'] / total).fillna(0)
+    stats['rpm_mean'] = (stats['rpm_sum'] / total).fillna(0)
+    return stats
+
+def merge_station_stats(tables):
+    """
+    合併多份 compute_station_stats 結果 (例如分批或分檔計算)：
+    加總欄位相加、first_seen 取最小值、機種名稱依出現順序合併，最後重新推導比率與平均值。
+    """
+    import pandas as pd
+
+    tables = [t for t in tables if t is not None and len(t) > 0]
+    if not tables:
+        return None
+    if len(tables) == 1:
+        return finalize_station_stats(tables[0].copy())
+
+    combined = pd.concat(tables).sort_values('first_seen', kind='stable')
+    grouped = combined.groupby(level=[0, 1], sort=True)
+
+    merged = grouped[STAT_SUM_COLS].sum()
+    merged['first_seen'] = grouped['first_seen'].min()
+
+    model_names = {}
+    for key, names in zip(combined.index, combined['model_names']):
+        merged_names = model_names.setdefault(key, [])
+        merged_names.extend(n for n in names if n not in merged_names)
+    merged['model_names'] = [tuple(model_names.get(k, ())) for k in merged.index]
+
+    return finalize_station_stats(merged)
+
+def line_model_names(line_stats):
+    """
+    合併同線別各站點的機種名稱，依站點出現順序去重。
+    """
+    names = []
+    for station_names in line_stats.sort_values('first_seen')['model_names']:
+        for n in station_names:
+            if n not in names:
+                names.append(n)
+    return names
+
+# Summary_Dashboard 共用樣式表：樣式只在寫出時由後端建立一次
+SUMMARY_BORDER = 'FFFFFF'
+
+# 各線別詳細報表 Group 底色 (主項目, 子項目)
+GROUP_FILLS = {
+    1: ('FFE699', 'FFF2CC'),
+    2: ('BDE7FF', 'D1EFFF'),
+    3: ('A0E8E6', 'C6F1F0'),
+    4: ('C9F084', 'E0F6B8'),
+}
+
+# 排行榜顏色 (第 1 ~ 4 名)
+RANK_FILLS = ['FF5050', 'FF9999', 'FFCCCC', 'FFF2CC']
+
+# 各線別詳細報表指標配置: (名稱, 統計欄位, 是否為比率, 是否為字串, Group, 是否為主項目)
+DASHBOARD_METRICS = [
+    # Group 1
+    ('Total Count',       None,               False, False, 1, False),
+    ('Fail Count',        'is_fail',          False, False, 1, False),
+    ('Fail Rate',         'is_fail',          True,  False, 1, False),
+    ('Noise Rate',        'calc_noise',       True,  False, 1, False),
+    ('RPM Fail Rate',     'calc_rpm_ng',      True,  False, 1, False),
+    ('Other Fail Rate',   'calc_others',      True,  False, 1, False),
     
-    # 失效模式類別
-    detected_failures = {
-        'Carrier Abnormal': [],
-        'Test Pin Abnormal': [],
-        'Mic Position Variant': [],
-        'Mic Cable Abnormal': [],
-        'Isolation Box Abnormal': [],
-        'Need to Check Audio File': []
+    # Group 2
+    ('Noise',             'calc_noise',       False, False, 2, True),
+    ('Only Index1 Fail',  'calc_only_idx1',   False, False, 2, False),
+    ('Only Index2 Fail',  'calc_only_idx2',   False, False, 2, False),
+    ('Only Index3 Fail',  'calc_only_idx3',   False, False, 2, False),
+    ('Multiple Index Fail','calc_multi_idx',  False, False, 2, False),
+    ('Spec Fail',         'calc_spec_fail',   False, False, 2, False),
+
+    # Group 3
+    ('RPM NG',            'calc_rpm_ng',      False, False, 3, True),
+    ('Out of control',    'calc_out_control', False, False, 3, False),
+    ('No rotate',         'calc_no_rotate',   False, False, 3, False),
+
+    # Group 4
+    ('Others',            'calc_others',      False, False, 4, True),
+    ('PauseOrFreeRun',    'calc_pause',       False, False, 4, False),
+    ('No Barcode',        'calc_no_barcode',  False, False, 4, False),
+    ('Model Name',        'Model_Name',       False, True,  4, False),
+]
+
+RANKING_TARGETS = ['Fail Count', 'Fail Rate', 'Noise Rate', 'RPM Fail Rate', 'Other Fail Rate']
+
+# 失效模式 (總表依 failure_rules.FAILURE_RULES 的順序編號)
+FAILURE_MODES = [rule['mode'] for rule in FAILURE_RULES]
+
+def build_dashboard_styles():
+    """
+    建立 Summary_Dashboard 所有樣式名稱與其描述。
+    """
+    styles = {
+        # Summary樣式
+        'title': {'fill': 'FF6666', 'bold': True, 'color': '000000', 'size': 14, 'align': 'center'},
+        'mode_header': {'fill': 'E0E0E0', 'bold': True, 'border_color': SUMMARY_BORDER, 'align': 'center'},
+        'mode_no': {'fill': 'FFCCCC', 'border_color': SUMMARY_BORDER, 'align': 'center'},
+        'mode_name': {'fill': 'FFCCCC', 'border_color': SUMMARY_BORDER, 'align': 'left'},
+        'mode_found': {'fill': 'FFCCCC', 'border_color': SUMMARY_BORDER, 'bold': True, 'color': 'FF0000',
+                       'align': 'left', 'wrap': True},
+        'mode_ok': {'fill': 'FFCCCC', 'border_color': SUMMARY_BORDER, 'bold': True, 'color': '008000',
+                    'align': 'left', 'wrap': True},
+
+        # 各線別詳細報表樣式
+        'line_title': {'fill': 'FFE699', 'bold': True, 'color': '000000', 'size': 14, 'align': 'center'},
+        'line_header': {'fill': 'FFE699', 'bold': True, 'border_color': SUMMARY_BORDER, 'align': 'center'},
     }
 
-    # 輔助函式：將 Line_13 轉換為 C13，Station_1 轉換為 No1，方便TE閱讀Summary
-    def format_location(line_str, station_str=None):
-        # 1. 處理線別名稱
-        l_nums = re.findall(r'\d+', str(line_str))
-        l_code = f"C{int(l_nums[0]):02d}" if l_nums else str(line_str)
-        
-        # 2. 處理站點名稱
-        if station_str:
-            s_nums = re.findall(r'\d+', str(station_str))
-            s_code = f"No{int(s_nums[0])}" if s_nums else str(station_str)
-            return f"{l_code}-{s_code}"
-        
-        return l_code
+    for group_id, (main_fill, sub_fill) in GROUP_FILLS.items():
+        for level, fill, bold in (('main', main_fill, True), ('sub', sub_fill, False)):
+            base = {'fill': fill, 'bold': bold, 'color': '000000', 'border_color': SUMMARY_BORDER}
+            styles[f"g{group_id}_{level}_label"] = base
+            styles[f"g{group_id}_{level}_value"] = dict(base, align='center')
+            for rank, rank_fill in enumerate(RANK_FILLS, 1):
+                styles[f"g{group_id}_{level}_rank{rank}"] = dict(base, align='center', fill=rank_fill)
 
-    for line in lines:
-        line_df = df[df['Line_Name'] == line]
-        stations = sorted(line_df['Device_ID'].unique())
-        
-        # 輔助計算：統計該線別各站點的數據
-        st_stats = {}
-        for st in stations:
-            st_data = line_df[line_df['Device_ID'] == st]
-            total = len(st_data)
-            
-            rpm_fail_count = st_data['calc_rpm_ng'].sum()
-            other_fail_count = st_data['calc_others'].sum()
-            
-            rpm_rate = (rpm_fail_count / total) if total > 0 else 0
-            other_rate = (other_fail_count / total) if total > 0 else 0
-            
-            idx1_mean = st_data['index1'].mean() if total > 0 else 0
-            idx2_mean = st_data['index2'].mean() if total > 0 else 0
-            idx3_mean = st_data['index3'].mean() if total > 0 else 0
-            dba_mean = st_data['dB(A)'].mean() if 'dB(A)' in st_data.columns and total > 0 else 0
-            
-            cable_fail_count = ((st_data['index1'] > 300) | (st_data['index2'] > 300) | (st_data['index3'] > 300)).sum()
-            
-            st_stats[st] = {
-                'rpm_rate': rpm_rate,
-                'other_rate': other_rate,
-                'idx1_mean': idx1_mean,
-                'idx2_mean': idx2_mean,
-                'idx3_mean': idx3_mean,
-                'dba_mean': dba_mean,
-                'cable_fail_count': cable_fail_count
-            }
-
-        # 異常模式 1：載具異常
-        # 條件：各站點因「轉速異常/其他異常拋料率」> 1% 且數值接近 (最大差距 <= 3%)
-        if stations:
-            rpm_rates = [st_stats[s]['rpm_rate'] for s in stations]
-            other_rates = [st_stats[s]['other_rate'] for s in stations]
-
-            all_rpm_high = all(r > 0.01 for r in rpm_rates)
-            all_other_high = all(r > 0.01 for r in other_rates)
-
-            rpm_consistent = (max(rpm_rates) - min(rpm_rates) <= 0.03) if rpm_rates else False
-            other_consistent = (max(other_rates) - min(other_rates) <= 0.03) if other_rates else False
-            
-            if (all_rpm_high and rpm_consistent) or (all_other_high and other_consistent):
-                short_code = format_location(line)
-                detected_failures['Carrier Abnormal'].append(f"{short_code}-All")
-
-        # 異常模式 2：探針異常
-        # 條件：各站點因「轉速異常/其他異常拋料率」> 2%
-        for s in stations:
-            if (st_stats[s]['rpm_rate'] > 0.02) or (st_stats[s]['other_rate'] > 0.02):
-                detected_failures['Test Pin Abnormal'].append(format_location(line, s))
-
-        # 異常模式 3, 5, 6,多個站點比較
-        if len(stations) > 1:
-            for s in stations:
-                other_stations = [os for os in stations if os != s]
-                
-                # 計算其他站點平均值
-                others_idx1_mean = sum(st_stats[os]['idx1_mean'] for os in other_stations) / len(other_stations)
-                others_idx2_mean = sum(st_stats[os]['idx2_mean'] for os in other_stations) / len(other_stations)
-                others_idx3_mean = sum(st_stats[os]['idx3_mean'] for os in other_stations) / len(other_stations)
-                
-                # 邏輯 3：麥克風位置變異
-                # 條件：單台機之index值<同條線其他設備0.8倍
-                if (st_stats[s]['idx1_mean'] < others_idx1_mean * 0.8) or \
-                   (st_stats[s]['idx2_mean'] < others_idx2_mean * 0.8) or \
-                   (st_stats[s]['idx3_mean'] < others_idx3_mean * 0.8):
-                    detected_failures['Mic Position Variant'].append(format_location(line, s))
-
-                # 邏輯 5：隔音箱異常
-                # 條件：單台機之dB值>同條線其他設備1.1倍
-                others_dba_mean = sum(st_stats[os]['dba_mean'] for os in other_stations) / len(other_stations)
-                if others_dba_mean > 0:
-                    if st_stats[s]['dba_mean'] > others_dba_mean * 1.1:
-                         detected_failures['Isolation Box Abnormal'].append(format_location(line, s))
-
-                # 邏輯 6：需確認音頻
-                # 條件：單台機之index值>同條線其他設備1.3倍
-                if (st_stats[s]['idx1_mean'] > others_idx1_mean * 1.3) or \
-                   (st_stats[s]['idx2_mean'] > others_idx2_mean * 1.3) or \
-                   (st_stats[s]['idx3_mean'] > others_idx3_mean * 1.3):
-                    detected_failures['Need to Check Audio File'].append(format_location(line, s))
-
-        # 異常模式 4：線材異常
-        # 條件：單台機之index值>300的次數超過10次
-        for s in stations:
-            if st_stats[s]['cable_fail_count'] > 10:
-                detected_failures['Mic Cable Abnormal'].append(format_location(line, s))
+    return styles
 
+DASHBOARD_STYLES = build_dashboard_styles()
 
-    # --- 4. 生成報表 ---
-    if sheet_name not in workbook.sheetnames:
-        workbook.create_sheet(sheet_name)
-    ws = workbook[sheet_name]
-
-    current_row = 1
+# 輔助函式：將 Line_13 轉換為 C13，Station_1 轉換為 No1，方便TE閱讀Summary
+def format_location(line_str, station_str=None):
+    # 1. 處理線別名稱
+    l_nums = re.findall(r'\d+', str(line_str))
+    l_code = f"C{int(l_nums[0]):02d}" if l_nums else str(line_str)
     
-    # 設定儲存格樣式
-    thin_border = Border(left=Side(style='thin', color='FFFFFF'), right=Side(style='thin', color='FFFFFF'), top=Side(style='thin', color='FFFFFF'), bottom=Side(style='thin', color='FFFFFF'))
-    header_font = Font(bold=True)
-    center_align = Alignment(horizontal='center', vertical='center')
+    # 2. 處理站點名稱
+    if station_str:
+        s_nums = re.findall(r'\d+', str(station_str))
+        s_code = f"No{int(s_nums[0])}" if s_nums else str(station_str)
+        return f"{l_code}-{s_code}"
     
-    # Summary樣式
-    fail_header_fill = PatternFill(start_color='FF6666', end_color='FF6666', fill_type='solid') 
-    fail_header_font = Font(bold=True, color='000000', size=14)
-    fail_row_fill = PatternFill(start_color='FFCCCC', end_color='FFCCCC', fill_type='solid') 
-    fail_row_font = Font(bold=False, color='000000')
+    return l_code
+
+def create_summary_dashboard(writer, df, date_str, rules=None, cable_index=CABLE_FAIL_INDEX):
+    """
+    建立 'Summary_Dashboard' 分頁。
+    上半部：異常模式分析總表。
+    下半部：各線別詳細報表。
+    回傳 (各線別/站點統計表, 偵測到的失效模式)。
+    """
+    # --- 1 & 2. 資料預處理與詳細項目計數 ---
+    classify_results(df)
 
-    # 各線別詳細報表樣式
-    fill_g1_main = PatternFill(start_color='FFE699', end_color='FFE699', fill_type='solid') 
-    font_g1_main = Font(bold=True, color='000000')
-    fill_g1_sub = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid') 
-    font_sub_default = Font(bold=False, color='000000')
+    # --- 3. 邏輯分析階段 (預先計算總表所需數據) ---
+
+    # 各線別/站點統計表 (單次 groupby)，失效模式判定與報表皆由此讀取
+    station_stats = compute_station_stats(df, cable_index=cable_index)
 
-    fill_g2_main = PatternFill(start_color='BDE7FF', end_color='BDE7FF', fill_type='solid')
-    font_g2_main = Font(bold=True, color='000000')
-    fill_g2_sub = PatternFill(start_color='D1EFFF', end_color='D1EFFF', fill_type='solid')
+    detected_failures = write_summary_dashboard(writer, station_stats, date_str, rules)
+    return station_stats, detected_failures
 
-    fill_g3_main = PatternFill(start_color='A0E8E6', end_color='A0E8E6', fill_type='solid')
-    font_g3_main = Font(bold=True, color='000000')
-    fill_g3_sub = PatternFill(start_color='C6F1F0', end_color='C6F1F0', fill_type='solid')
+def detect_failure_modes(station_stats, rules=None):
+    """
+    依失效模式規則 (failure_rules) 判定各站點統計表，回傳 {失效模式: [發生位置, ...]}。
+    rules 為 load_failure_rules 依 config.ini 調整門檻後的規則，None 表示使用預設門檻。
+    """
+    detected_failures = {mode: [] for mode in FAILURE_MODES}
+    for mode, hits in evaluate_rules(station_stats, rules).items():
+        locations = detected_failures.setdefault(mode, [])
+        for line, station in hits:
+            if station is None:
+                locations.append(f"{format_location(line)}-All")
+            else:
+                locations.append(format_location(line, station))
+    return detected_failures
 
-    fill_g4_main = PatternFill(start_color='C9F084', end_color='C9F084', fill_type='solid')
-    font_g4_main = Font(bold=True, color='000000')
-    fill_g4_sub = PatternFill(start_color='E0F6B8', end_color='E0F6B8', fill_type='solid')
+def write_summary_dashboard(writer, station_stats, date_str, rules=None, spc_alerts=None):
+    """
+    由各站點統計表產生 'Summary_Dashboard' 分頁並交由報表後端寫出，回傳偵測到的失效模式。
+    spc_alerts 為 baseline.update_baselines 的 SPC 警示清單，None 時不寫入 SPC 區段。
+    """
+    from report_writer import SheetLayout
 
-    # 排行榜顏色
-    rank_1_fill = PatternFill(start_color='FF5050', end_color='FF5050', fill_type='solid')
-    rank_2_fill = PatternFill(start_color='FF9999', end_color='FF9999', fill_type='solid')
-    rank_3_fill = PatternFill(start_color='FFCCCC', end_color='FFCCCC', fill_type='solid')
-    rank_4_fill = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')
+    sheet_name = 'Summary_Dashboard'
+    lines = list(station_stats.index.unique(level='Line_Name'))
+    detected_failures = detect_failure_modes(station_stats, rules)
 
+    # --- 4. 生成報表 ---
+    layout = SheetLayout()
+    current_row = 1
 
     # ==========================================
     # 第一部分：寫入異常模式總表
     # ==========================================
     
     # 1. 寫入標題
-    ws.merge_cells(start_row=current_row, start_column=1, end_row=current_row, end_column=3)
-    title_cell = ws.cell(row=current_row, column=1, value=f"Daily Failure Mode Analysis ({date_str})")
-    title_cell.font = fail_header_font
-    title_cell.fill = fail_header_fill
-    title_cell.alignment = center_align
+    layout.merge(current_row, 1, current_row, 3)
+    layout.write(current_row, 1, f"Daily Failure Mode Analysis ({date_str})", 'title')
     current_row += 1
 
     # 2. 寫入欄位標題
-    ws.cell(row=current_row, column=1, value="No.").font = Font(bold=True)
-    ws.cell(row=current_row, column=2, value="Failure Mode").font = Font(bold=True)
-    ws.cell(row=current_row, column=3, value="Detected Locations (Line - Station)").font = Font(bold=True)
-    
-    for col in range(1, 4):
-        c = ws.cell(row=current_row, column=col)
-        c.fill = PatternFill(start_color='E0E0E0', end_color='E0E0E0', fill_type='solid') 
-        c.border = thin_border
-        c.alignment = center_align
+    layout.write(current_row, 1, "No.", 'mode_header')
+    layout.write(current_row, 2, "Failure Mode", 'mode_header')
+    layout.write(current_row, 3, "Detected Locations (Line - Station)", 'mode_header')
     current_row += 1
 
-    # 3. 依序列出 6 種失效模式
-    modes_order = [
-        'Carrier Abnormal', 
-        'Test Pin Abnormal', 
-        'Mic Position Variant', 
-        'Mic Cable Abnormal', 
-        'Isolation Box Abnormal', 
-        'Need to Check Audio File'
-    ]
-
-    for idx, mode in enumerate(modes_order, 1):
-        # 序號
-        c1 = ws.cell(row=current_row, column=1, value=idx)
-        c1.fill = fail_row_fill
-        c1.border = thin_border
-        c1.alignment = center_align
-
-        # 失效模式名稱
-        c2 = ws.cell(row=current_row, column=2, value=mode)
-        c2.fill = fail_row_fill
-        c2.border = thin_border
-        c2.alignment = Alignment(horizontal='left', vertical='center')
+    # 3. 依序列出各失效模式
+    for idx, mode in enumerate(detected_failures, 1):
+        # 序號、失效模式名稱
+        layout.write(current_row, 1, idx, 'mode_no')
+        layout.write(current_row, 2, mode, 'mode_name')
 
         # 偵測結果
         locations = detected_failures.get(mode, [])
         if locations:
-            res_str = ", ".join(locations)
             # 若有發現異常，列出發生位置，將字體顯示紅色
-            font_res = Font(color='FF0000', bold=True)
+            layout.write(current_row, 3, ", ".join(locations), 'mode_found')
         else:
-            res_str = "OK"
             # 正常則顯示OK(綠色)
-            font_res = Font(color='008000', bold=True)
-
-        c3 = ws.cell(row=current_row, column=3, value=res_str)
-        c3.fill = fail_row_fill
-        c3.border = thin_border
-        c3.font = font_res
-        c3.alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
+            layout.write(current_row, 3, "OK", 'mode_ok')
 
         current_row += 1
 
     # 總表與詳細報表之間加入空白行
     current_row += 2 
 
+    styles = DASHBOARD_STYLES
+    if spc_alerts is not None:
+        # 滾動基準線的管制圖警示 (跨日飄移)
+        from baseline import SPC_STYLES, write_spc_section
+
+        styles = dict(DASHBOARD_STYLES, **SPC_STYLES)
+        current_row = write_spc_section(layout, current_row, spc_alerts, date_str)
+        current_row += 2
+
 
     # ==========================================
     # 第二部分：寫入各線別詳細報表
     # ==========================================
     
     for line in lines:
-        line_df = df[df['Line_Name'] == line]
-        stations = sorted(line_df['Device_ID'].unique())
+        current_row = write_line_block(layout, current_row, line, station_stats.loc[line])
+        current_row += 1 # 各線別之間的空白行
+
+    writer.write_layout(sheet_name, layout, styles)
+    return detected_failures
+
+def write_line_block(layout, current_row, title, line_stats, start_col=1, title_style='line_title'):
+    """
+    寫入單一線別的詳細報表區塊 (標題、欄位標題與各項指標)，回傳區塊後的下一列。
+    line_stats 為該線別的站點統計表 (以 Device_ID 為索引)。
+    """
+    stations = list(line_stats.index)
+    c0 = start_col - 1
+    
+    # 標題：線別名稱
+    layout.merge(current_row, c0+1, current_row, c0+len(stations)+2)
+    layout.write(current_row, c0+1, title, title_style)
+    current_row += 1
+
+    # 欄位標題
+    headers = ['Metric', 'Total'] + stations
+    for i, h in enumerate(headers):
+        layout.write(current_row, c0+i+1, h, 'line_header')
+    current_row += 1
+
+    for label, col, is_rate, is_string, group_id, is_main in DASHBOARD_METRICS:
         
-        # 標題：線別名稱
-        ws.merge_cells(start_row=current_row, start_column=1, end_row=current_row, end_column=len(stations)+2)
-        cell = ws.cell(row=current_row, column=1, value=line)
-        cell.font = Font(bold=True, size=14, color='000000')
-        cell.fill = fill_g1_main
-        cell.alignment = center_align
-        current_row += 1
+        # 判斷所屬 Group 並套用對應底色
+        style_prefix = f"g{group_id}_{'main' if is_main else 'sub'}"
 
-        # 欄位標題
-        headers = ['Metric', 'Total'] + stations
-        for i, h in enumerate(headers):
-            c = ws.cell(row=current_row, column=i+1, value=h)
-            c.font = Font(bold=True)
-            c.fill = PatternFill(start_color='FFE699', end_color='FFE699', fill_type='solid')
-            c.border = thin_border
-            c.alignment = center_align
-        current_row += 1
+        # 寫入指標名稱
+        layout.write(current_row, c0+1, label, f"{style_prefix}_label")
 
-        # 指標配置
-        metrics_config = [
-            # Group 1
-            ('Total Count',       None,               False, False, 1, False),
-            ('Fail Count',        'is_fail',          False, False, 1, False),
-            ('Fail Rate',         'is_fail',          True,  False, 1, False),
-            ('Noise Rate',        'calc_noise',       True,  False, 1, False),
-            ('RPM Fail Rate',     'calc_rpm_ng',      True,  False, 1, False),
-            ('Other Fail Rate',   'calc_others',      True,  False, 1, False),
-            
-            # Group 2
-            ('Noise',             'calc_noise',       False, False, 2, True),
-            ('Only Index1 Fail',  'calc_only_idx1',   False, False, 2, False),
-            ('Only Index2 Fail',  'calc_only_idx2',   False, False, 2, False),
-            ('Only Index3 Fail',  'calc_only_idx3',   False, False, 2, False),
-            ('Multiple Index Fail','calc_multi_idx',  False, False, 2, False),
-            ('Spec Fail',         'calc_spec_fail',   False, False, 2, False),
-
-            # Group 3
-            ('RPM NG',            'calc_rpm_ng',      False, False, 3, True),
-            ('Out of control',    'calc_out_control', False, False, 3, False),
-            ('No rotate',         'calc_no_rotate',   False, False, 3, False),
-
-            # Group 4
-            ('Others',            'calc_others',      False, False, 4, True),
-            ('PauseOrFreeRun',    'calc_pause',       False, False, 4, False),
-            ('No Barcode',        'calc_no_barcode',  False, False, 4, False),
-            ('Model Name',        'Model_Name',       False, True,  4, False),
-        ]
-
-        ranking_targets = ['Fail Count', 'Fail Rate', 'Noise Rate', 'RPM Fail Rate', 'Other Fail Rate']
-
-        for label, col, is_rate, is_string, group_id, is_main in metrics_config:
+        # "Model Name" Row合併儲存格，並隱藏"Model Name"有"pauseorfreerun"的情形:
+        if label == 'Model Name':
+            layout.merge(current_row, c0+2, current_row, c0+2+len(stations))
+            val = ",".join(line_model_names(line_stats))
+            layout.write(current_row, c0+2, val, f"{style_prefix}_value")
             
-            # 判斷所屬 Group 並套用對應底色
-            if group_id == 1:
-                base_fill = fill_g1_main if is_main else fill_g1_sub
-                base_font = font_g1_main if is_main else font_sub_default
-            elif group_id == 2:
-                base_fill = fill_g2_main if is_main else fill_g2_sub
-                base_font = font_g2_main if is_main else font_sub_default
-            elif group_id == 3:
-                base_fill = fill_g3_main if is_main else fill_g3_sub
-                base_font = font_g3_main if is_main else font_sub_default
-            else: # Group 4
-                base_fill = fill_g4_main if is_main else fill_g4_sub
-                base_font = font_g4_main if is_main else font_sub_default
-
-            # 寫入指標名稱
-            c_label = ws.cell(row=current_row, column=1, value=label)
-            c_label.fill = base_fill
-            c_label.font = base_font
-            c_label.border = thin_border
-
-            # "Model Name" Row合併儲存格，並隱藏"Model Name"有"pauseorfreerun"的情形:
-            if label == 'Model Name':
-                ws.merge_cells(start_row=current_row, start_column=2, end_row=current_row, end_column=2+len(stations))
-                
-                unique_names = line_df[col].dropna().unique()
-                valid_names = [str(n) for n in unique_names if 'pauseorfreerun' not in str(n).lower().replace(" ", "")]
-                val = ",".join(valid_names)
-                
-                c_total = ws.cell(row=current_row, column=2, value=val)
-                c_total.fill = base_fill
-                c_total.font = base_font
-                c_total.border = thin_border
-                c_total.alignment = center_align
-                
-                current_row += 1
-                continue
-            
-            # 計算數據
-            station_values = []
+            current_row += 1
+            continue
+        
+        # 計算數據
+        station_values = []
+        
+        # 單線整體(Total)欄位計算
+        line_total = line_stats['total'].sum()
+        if is_string:
+            val = ",".join(line_model_names(line_stats))
+        elif label == 'Total Count':
+            val = line_total
+        elif is_rate:
+            fails = line_stats[col].sum()
+            val = f"{(fails/line_total)*100:.2f}%" if line_total > 0 else "0.00%"
+        else:
+            val = line_stats[col].sum()
+        
+        layout.write(current_row, c0+2, val, f"{style_prefix}_value")
+
+        # 各台機欄位計算
+        for i, station in enumerate(stations):
+            st_row = line_stats.loc[station]
             
-            # 單線整體(Total)欄位計算
+            raw_num_val = 0
             if is_string:
-                unique_names = line_df[col].dropna().unique()
-                valid_names = [str(n) for n in unique_names if 'pauseorfreerun' not in str(n).lower().replace(" ", "")]
-                val = ",".join(valid_names)
+                valid_names = st_row['model_names']
+                st_val = valid_names[0] if len(valid_names) > 0 else ""
             elif label == 'Total Count':
-                val = len(line_df)
+                raw_num_val = st_row['total']
+                st_val = raw_num_val
             elif is_rate:
-                total = len(line_df)
-                fails = line_df[col].sum()
-                val = f"{(fails/total)*100:.2f}%" if total > 0 else "0.00%"
+                total = st_row['total']
+                fails = st_row[col]
+                raw_num_val = (fails/total) if total > 0 else 0
+                st_val = f"{raw_num_val*100:.2f}%"
             else:
-                val = line_df[col].sum()
+                raw_num_val = st_row[col]
+                st_val = raw_num_val
             
-            c_total = ws.cell(row=current_row, column=2, value=val)
-            c_total.fill = base_fill
-            c_total.font = base_font
-            c_total.border = thin_border
-            c_total.alignment = center_align
-
-            # 各台機欄位計算
-            for i, station in enumerate(stations):
-                st_df = line_df[line_df['Device_ID'] == station]
-                
-                raw_num_val = 0
-                if is_string:
-                    unique_names = st_df[col].dropna().unique()
-                    valid_names = [str(n) for n in unique_names if 'pauseorfreerun' not in str(n).lower().replace(" ", "")]
-                    st_val = valid_names[0] if len(valid_names) > 0 else ""
-                elif label == 'Total Count':
-                    raw_num_val = len(st_df)
-                    st_val = raw_num_val
-                elif is_rate:
-                    total = len(st_df)
-                    fails = st_df[col].sum()
-                    raw_num_val = (fails/total) if total > 0 else 0
-                    st_val = f"{raw_num_val*100:.2f}%"
+            layout.write(current_row, c0+i+3, st_val, f"{style_prefix}_value")
+            station_values.append({'col_idx': c0+i+3, 'val': raw_num_val})
+
+        # 排名上色邏輯
+        if label in RANKING_TARGETS:
+            unique_vals = sorted(list(set([x['val'] for x in station_values])), reverse=True)
+            
+            val_1st = unique_vals[0] if len(unique_vals) > 0 else None
+            val_2nd = unique_vals[1] if len(unique_vals) > 1 else None
+            val_3rd = unique_vals[2] if len(unique_vals) > 2 else None
+            val_4rd = unique_vals[3] if len(unique_vals) > 3 else None
+
+            for item in station_values:
+                if item['val'] == 0: continue
+                    
+                if item['val'] == val_1st:
+                    rank = 1
+                elif item['val'] == val_2nd:
+                    rank = 2
+                elif item['val'] == val_3rd:
+                    rank = 3
+                elif item['val'] == val_4rd:
+                    rank = 4
                 else:
-                    raw_num_val = st_df[col].sum()
-                    st_val = raw_num_val
-                
-                c_st = ws.cell(row=current_row, column=i+3, value=st_val)
-                c_st.fill = base_fill 
-                c_st.font = base_font
-                c_st.border = thin_border
-                c_st.alignment = center_align
-                
-                station_values.append({'col_idx': i+3, 'val': raw_num_val, 'cell': c_st})
-
-            # 排名上色邏輯
-            if label in ranking_targets:
-                unique_vals = sorted(list(set([x['val'] for x in station_values])), reverse=True)
-                
-                val_1st = unique_vals[0] if len(unique_vals) > 0 else None
-                val_2nd = unique_vals[1] if len(unique_vals) > 1 else None
-                val_3rd = unique_vals[2] if len(unique_vals) > 2 else None
-                val_4rd = unique_vals[3] if len(unique_vals) > 3 else None
-
-                for item in station_values:
-                    if item['val'] == 0: continue
-                        
-                    if item['val'] == val_1st:
-                        item['cell'].fill = rank_1_fill 
-                    elif item['val'] == val_2nd:
-                        item['cell'].fill = rank_2_fill 
-                    elif item['val'] == val_3rd:
-                        item['cell'].fill = rank_3_fill 
-                    elif item['val'] == val_4rd:
-                        item['cell'].fill = rank_4_fill
+                    continue
+                layout.set_style(current_row, item['col_idx'], f"{style_prefix}_rank{rank}")
 
-            current_row += 1
-        
-        current_row += 1 # 各線別之間的空白行
+        current_row += 1
+
+    return current_row
 
-def run_aggregation(target_date=None):
+def get_base_dir():
     """
-    整合各機台產出的測試日誌檔並生成報表。
+    程式所在目錄 (打包為執行檔時為執行檔所在目錄)。
     """
     if getattr(sys, 'frozen', False):
-        base_dir = os.path.dirname(sys.executable)
-    else:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-    
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+def parse_device_mapping(config):
+    """
+    解析 [Device_Mapping] (IP = 線別,站點)，回傳 {ip_key: {'Line', 'Station'}}；格式錯誤的項目記錄錯誤後略過。
+    """
+    device_map = {}
+    if 'Device_Mapping' in config:
+        for ip, mapping in config['Device_Mapping'].items():
+            try:
+                line, station = mapping.split(',')                
+                formatted_station = station.strip().replace('_', ' ')
+                device_map[ip.replace('.', '_')] = {'Line': line.strip(), 'Station': formatted_station}
+            except ValueError:
+                logging.error(f"解析 IP {ip} 對應之格式錯誤: {mapping}")
+    return device_map
+
+def load_settings():
+    """
+    讀取 config.ini 並整理執行所需設定，失敗時回傳 None。
+    回傳 dict: config, base_dir, source_dir, output_dir, device_map, failure_rules, cable_index。
+    """
+    base_dir = get_base_dir()
     config_path = os.path.join(base_dir, 'config.ini')
 
     if not os.path.exists(config_path):
         logging.error(f"找不到 Config 檔案路徑: {config_path}")
-        return
+        return None
 
     config = configparser.ConfigParser()
     config.read(config_path, encoding='utf-8')
 
     try:
         source_dir = config['Path']['Source_Folder']
-        output_base = config['Path']['Output_Folder']
-        if output_base.startswith('.\\') or output_base.startswith('./'):
-            output_dir = os.path.join(base_dir, output_base.replace('.\\', '').replace('./', ''))
-        else:
-            output_dir = output_base
+        output_dir = resolve_config_path(base_dir, config['Path']['Output_Folder'])
     except KeyError as e:
         logging.error(f"Config 檔案缺少鍵值: {e}")
-        return
+        return None
     
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    if target_date is None:
-        from datetime import timedelta
-        target_date = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
-    
-    logging.info(f"開始整合日期: {target_date} 之資料")
+    return {
+        'config': config,
+        'base_dir': base_dir,
+        'source_dir': source_dir,
+        'output_dir': output_dir,
+        'device_map': parse_device_mapping(config),
+        'failure_rules': load_failure_rules(config),
+        'cable_index': get_cable_index_limit(config),
+    }
 
-    device_map = {}
-    if 'Device_Mapping' in config:
-        for ip, mapping in config['Device_Mapping'].items():
-            try:
-                line, station = mapping.split(',')                
-                formatted_station = station.strip().replace('_', ' ')
-                device_map[ip.replace('.', '_')] = {'Line': line.strip(), 'Station': formatted_station}
-            except ValueError:
-                logging.error(f"解析 IP {ip} 對應之格式錯誤: {mapping}")
+def get_cable_index_limit(config):
+    """
+    由 config.ini 的 [Failure_Rules] Cable_Index_Limit 取得線材異常的 Index 門檻。
+    """
+    try:
+        return config.getfloat('Failure_Rules', 'Cable_Index_Limit', fallback=CABLE_FAIL_INDEX)
+    except ValueError:
+        logging.error(f"Config 中 Cable_Index_Limit 必須為數字，改用預設值 {CABLE_FAIL_INDEX}")
+        return CABLE_FAIL_INDEX
+
+def default_target_date(days_ago=1):
+    """
+    未指定日期時預設處理前一天的資料。
+    """
+    return (datetime.now() - timedelta(days=days_ago)).strftime('%Y%m%d')
 
+def find_log_files(source_dir, target_date):
+    """
+    回傳指定日期的日誌檔清單 (依檔名排序)。
+    """
     search_pattern = os.path.join(source_dir, f"{target_date}_*.txt")
-    files = glob.glob(search_pattern)
-    
-    if not files:
-        logging.warning(f"在 {source_dir} 找不到日期 {target_date} 的日誌檔")
+    return sorted(glob.glob(search_pattern))
+
+def save_trend_stats(settings, target_date, station_stats, detected_failures):
+    """
+    將當日統計存入長期趨勢資料庫 ([Trend] Enabled)；失敗只記錄錯誤，不影響日報表。
+    """
+    from trend_store import get_store_path, save_daily_stats
+
+    db_path = get_store_path(settings)
+    if db_path is None:
         return
+    try:
+        save_daily_stats(db_path, target_date, station_stats, detected_failures)
+    except sqlite3.Error as e:
+        logging.error(f"寫入趨勢資料庫 {db_path} 失敗: {e}")
 
-    all_data = []
+def daily_summary_path(output_dir, target_date):
+    return os.path.join(output_dir, f"Daily_Summary_{target_date}.xlsx")
 
-    for file_path in files:
-        filename = os.path.basename(file_path)
-        match = re.match(rf"{target_date}_(.+)\.txt", filename)
-        if not match:
-            continue
-            
-        ip_key = match.group(1)
-        meta = device_map.get(ip_key, {'Line': 'Unknown_Line', 'Station': f'Unknown {ip_key}'})
+def temp_output_path(output_file):
+    """
+    寫出報表時使用的暫存檔 (與正式報表位於同一資料夾，完成後再取代)。
+    """
+    folder, name = os.path.split(output_file)
+    return os.path.join(folder, f"~{os.path.splitext(name)[0]}.tmp.xlsx")
 
-        try:
-            df = pd.read_csv(file_path, sep='\t', encoding='cp950', on_bad_lines='skip', index_col=False)
-            df.columns = df.columns.str.strip()
-            
-            # 修正舊版軟體的欄位拼寫錯誤
-            if 'Toral_Result' in df.columns:
-                df.rename(columns={'Toral_Result':'Total_Result'}, inplace=True)
-                logging.info(f"已修正檔案 {filename} 中的錯字 'Toral_Result'")
-
-            if 'Total_Result' not in df.columns:
-                logging.warning(f"跳過檔案 {filename}: 缺少 'Total_Result' 欄位")
-                continue
-
-            df['Line_Name'] = meta['Line']
-            df['Device_ID'] = meta['Station']
-            df['Source_IP'] = ip_key.replace('_', '.')
-            df['Log_Date'] = target_date
-            df['Total_Result'] = df['Total_Result'].astype(str)
-            
-            all_data.append(df)
-            logging.info(f"已處理檔案: {filename} (共 {len(df)} 筆資料)")
+def replace_output(tmp_file, output_file):
+    """
+    以暫存檔取代正式報表，開啟中的報表不會看到寫到一半的內容。
+    無法覆寫 (例如報表正在 Excel 中開啟) 時保留暫存檔並回傳 False。
+    """
+    try:
+        os.replace(tmp_file, output_file)
+        return True
+    except PermissionError as e:
+        logging.error(f"無法覆寫 {output_file} (檔案可能已開啟)，新報表保留於 {tmp_file}: {e}")
+        return False
 
-        except UnicodeDecodeError:
-            try:
-                df = pd.read_csv(file_path, sep='\t', encoding='utf-8', on_bad_lines='skip', index_col=False)
-                df.columns = df.columns.str.strip()
-                df['Line_Name'] = meta['Line']
-                df['Device_ID'] = meta['Station']
-                df['Source_IP'] = ip_key.replace('_', '.')
-                df['Log_Date'] = target_date
-                df['Total_Result'] = df['Total_Result'].astype(str)
-                all_data.append(df)
-                logging.info(f"使用 UTF-8 編碼成功處理檔案: {filename}")
-            except Exception as e2:
-                logging.error(f"嘗試 UTF-8 編碼讀取檔案 {filename} 失敗: {e2}")
+def is_summary_up_to_date(settings, target_date, files):
+    """
+    Daily_Summary 已存在且修改時間不早於當日所有日誌檔與 config.ini 時視為最新。
+    """
+    output_file = daily_summary_path(settings['output_dir'], target_date)
+    if not os.path.exists(output_file):
+        return False
 
-        except Exception as e:
-            logging.error(f"讀取檔案 {filename} 發生未知錯誤: {e}")
+    inputs = list(files) + [os.path.join(settings['base_dir'], 'config.ini')]
+    newest_input = max(os.path.getmtime(p) for p in inputs if os.path.exists(p))
+    return os.path.getmtime(output_file) >= newest_input
+
+def find_log_dates(source_dir):
+    """
+    回傳來源資料夾中所有日誌檔的日期 (YYYYMMDD，由小到大)。
+    """
+    dates = set()
+    for path in glob.glob(os.path.join(source_dir, "*_*.txt")):
+        match = re.match(r"(\d{8})_.+\.txt$", os.path.basename(path))
+        if match:
+            dates.add(match.group(1))
+    return sorted(dates)
+
+def date_range(date_from, date_to):
+    """
+    回傳 date_from ~ date_to (含) 的每一天 (YYYYMMDD)。
+    """
+    start = datetime.strptime(date_from, '%Y%m%d')
+    end = datetime.strptime(date_to, '%Y%m%d')
+    return [(start + timedelta(days=i)).strftime('%Y%m%d') for i in range((end - start).days + 1)]
+
+def run_aggregation(target_date=None, settings=None, parse_workers=None):
+    """
+    整合各機台產出的測試日誌檔並生成報表，回傳輸出檔路徑 (無資料時回傳 None)。
+    批次處理時可傳入共用的 settings；parse_workers 可覆寫 config.ini 的平行讀取程序數。
+    各階段與各日誌檔的執行效能記錄於 run_profile ([Profiling])，寫出於報表旁的 _run.json。
+    """
+    from run_profile import open_run_profile
+
+    if settings is None:
+        settings = load_settings()
+    if settings is None:
+        return None
+
+    if target_date is None:
+        target_date = default_target_date()
+
+    profile = open_run_profile(settings['config'], target_date)
+    output_file = daily_summary_path(settings['output_dir'], target_date)
+    try:
+        with profile.profiling(output_file):
+            return aggregate_date(settings, target_date, profile, parse_workers)
+    finally:
+        profile.close(output_file)
+
+def aggregate_date(settings, target_date, profile, parse_workers=None):
+    """
+    run_aggregation 的彙整流程，各階段以 profile.stage 計時。
+    """
+    import pandas as pd
+
+    from baseline import update_baselines
+    from ingest import iter_parsed, open_ingest
+    from raw_output import open_raw_output
+    from report_writer import open_report_writer
+    from run_profile import timed_parse_log_file
+    from trace_index import get_index_path, trace_rows, update_trace_index
+
+    config = settings['config']
+    base_dir = settings['base_dir']
+    source_dir = settings['source_dir']
+    output_dir = settings['output_dir']
+    device_map = settings['device_map']
+
+    logging.info(f"開始整合日期: {target_date} 之資料")
+
+    with profile.stage('discovery'):
+        # 依檔名排序，確保輸出順序與 worker 完成順序無關
+        files = find_log_files(source_dir, target_date)
+    
+    if not files:
+        logging.warning(f"在 {source_dir} 找不到日期 {target_date} 的日誌檔")
+        return None
+
+    schema = get_log_schema(config)
+    if config.getboolean('Performance', 'Streaming', fallback=False):
+        return run_streaming_aggregation(settings, target_date, files, schema, profile)
+
+    from retest import get_retest_options, write_retest_sheet
+    from spectrum import compute_spectrum_stats, get_spectrum_options, write_spectrum_sheet
+
+    spectrum_options = get_spectrum_options(config)
+    retest_options = get_retest_options(config)
+    ingest = open_ingest(config, base_dir, len(files), schema, parse_workers)
+    profile.info.update(mode='normal', files=len(files), parse_workers=ingest['workers'], schema=schema,
+                        cache=ingest['cache'] is not None)
+
+    with profile.stage('parse') as stage:
+        # 依檔名順序回傳，輸出順序與 worker 完成順序無關
+        results = iter_parsed(timed_parse_log_file, files, (target_date, device_map, ingest['cache'], schema),
+                              ingest['workers'])
+        all_data = []
+        for df, record in results:
+            profile.add_file(record)
+            if df is not None:
+                all_data.append(df)
+        stage['rows'] = sum(len(df) for df in all_data)
 
     if all_data:
-        master_df = pd.concat(all_data, ignore_index=True)
-        output_file = os.path.join(output_dir, f"Daily_Summary_{target_date}.xlsx")
+        with profile.stage('concat', rows=stage['rows']):
+            master_df = pd.concat(all_data, ignore_index=True)
+            if schema and schema['typed']:
+                # 各檔的類別欄位類別值不同，合併後會退回 object，需重新轉換
+                apply_log_schema(master_df)
+        del all_data
+        rows = len(master_df)
         
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            master_df.to_excel(writer, sheet_name=target_date, index=False)
-            create_summary_dashboard(writer, master_df, target_date)
-            
+        excel_engine = config.get('Output', 'Excel_Engine', fallback='openpyxl').strip()
+        output_file = daily_summary_path(output_dir, target_date)
+        tmp_file = temp_output_path(output_file)
+
+        writer = open_report_writer(tmp_file, excel_engine)
+        try:
+            with profile.stage('raw_sheet_write', rows=rows):
+                raw_output = open_raw_output(writer, output_file, target_date, config)
+                raw_output.append(master_df)
+                raw_output.close()
+            # 以下三個階段即 create_summary_dashboard，分開計時
+            with profile.stage('classification', rows=rows):
+                classify_results(master_df)
+            stats_df = master_df
+            retest_stats = None
+            if retest_options['enabled']:
+                with profile.stage('retest', rows=rows):
+                    stats_df, retest_stats = resolve_retests(master_df, retest_options['count'])
+            with profile.stage('failure_modes', rows=len(stats_df)):
+                station_stats = compute_station_stats(stats_df, cable_index=settings['cable_index'])
+            del stats_df
+            with profile.stage('baseline'):
+                spc_alerts = update_baselines(settings, target_date, station_stats)
+            with profile.stage('dashboard_write'):
+                detected_failures = write_summary_dashboard(writer, station_stats, target_date,
+                                                            settings['failure_rules'], spc_alerts)
+            if spectrum_options['enabled']:
+                with profile.stage('spectrum', rows=rows):
+                    write_spectrum_sheet(writer, compute_spectrum_stats(master_df), target_date, spectrum_options)
+            if retest_stats is not None:
+                with profile.stage('retest_write'):
+                    write_retest_sheet(writer, retest_stats, target_date)
+        finally:
+            with profile.stage('save', rows=rows):
+                writer.close()
+
+        with profile.stage('trend'):
+            save_trend_stats(settings, target_date, station_stats, detected_failures)
+        trace_path = get_index_path(settings)
+        if trace_path is not None:
+            with profile.stage('trace', rows=rows):
+                update_trace_index(trace_path, target_date, trace_rows(master_df))
+        if not replace_output(tmp_file, output_file):
+            return None
         logging.info(f"資料整合完畢。輸出檔案為: {output_file}")
-    else:
+        return output_file
+
+    logging.warning("未找到有效資料，無法產出報表。")
+    return None
+
+def resolve_retests(df, count='all'):
+    """
+    判定重測 (retest) 並計算各站點的首次良率與重測統計，回傳 (納入站點統計的資料, 重測統計表)。
+    count 為 [Retest] Count：all 時回傳原本的 df，first / final 時只保留每個條碼的首次或最後一次測試。
+    df 需先經過 classify_results 處理。
+    """
+    from retest import compute_retest_stats, count_mask, log_retest_summary, mark_retests, retest_key_frame
+
+    keys = mark_retests(retest_key_frame(df))
+    retest_stats = compute_retest_stats(keys)
+    log_retest_summary(retest_stats)
+
+    mask = count_mask(keys, count)
+    if mask is not None:
+        logging.info(f"[Retest] Count = {count}: 站點統計納入 {int(mask.sum())}/{len(df)} 筆資料")
+        df = df[mask]
+    return df, retest_stats
+
+def get_chunk_rows(config):
+    """
+    由 config.ini 的 [Performance] Chunk_Rows 取得串流模式每批讀取的列數。
+    """
+    from streaming import DEFAULT_CHUNK_ROWS
+
+    try:
+        chunk_rows = config.getint('Performance', 'Chunk_Rows', fallback=DEFAULT_CHUNK_ROWS)
+    except ValueError:
+        logging.error(f"Config 中 Chunk_Rows 必須為整數，改用 {DEFAULT_CHUNK_ROWS}")
+        return DEFAULT_CHUNK_ROWS
+    return max(1, chunk_rows)
+
+def run_streaming_aggregation(settings, target_date, files, schema=None, profile=None):
+    """
+    串流模式 ([Performance] Streaming = true)：分批讀取日誌並累加站點統計，不合併整日的 master_df。
+    報表內容與一般模式相同，回傳輸出檔路徑 (無資料時回傳 None)。
+    profile (RunProfile) 記錄各階段效能；讀取、分類與統計在同一個 stream 階段內逐批進行。
+    """
+    from baseline import update_baselines
+    from raw_output import get_raw_output_options, open_raw_output
+    from report_writer import open_report_writer
+    from retest import (
+        compute_retest_stats, get_retest_options, log_retest_summary, mark_retests, retest_key_frame,
+        write_retest_sheet
+    )
+    from run_profile import RunProfile
+    from spectrum import get_spectrum_options, write_spectrum_sheet
+    from streaming import plan_log_files, stream_log_files
+    from trace_index import get_index_path, trace_chunk_rows, update_trace_index
+
+    if profile is None:
+        profile = RunProfile(target_date, {'enabled': False})
+
+    config = settings['config']
+    spectrum_options = get_spectrum_options(config)
+    retest_options = get_retest_options(config)
+    if retest_options['enabled'] and retest_options['count'] != 'all':
+        # 站點統計逐批累加，無法事先排除重測，僅輸出 Retest 分頁
+        logging.warning(f"串流模式不支援 [Retest] Count = {retest_options['count']}，站點統計包含全部資料列")
+    with profile.stage('plan'):
+        plans, raw_columns = plan_log_files(files, target_date, settings['device_map'], schema)
+    if not plans:
         logging.warning("未找到有效資料，無法產出報表。")
+        return None
 
-if __name__ == "__main__":
+    chunk_rows = get_chunk_rows(config)
+    logging.info(f"串流模式: 每批讀取 {chunk_rows} 列")
+    profile.info.update(mode='streaming', files=len(files), chunk_rows=chunk_rows, schema=schema)
+
+    output_file = daily_summary_path(settings['output_dir'], target_date)
+    excel_engine = config.get('Output', 'Excel_Engine', fallback='openpyxl').strip()
+    raw_mode, _ = get_raw_output_options(config)
+    if excel_engine not in ('openpyxl_write_only', 'xlsxwriter') and raw_mode in ('sheet', 'sharded'):
+        # openpyxl 會把整日原始資料列保留在記憶體中的活頁簿，改用逐列寫出的後端以維持固定記憶體用量
+        logging.warning(f"串流模式的原始資料分頁不支援 Excel_Engine = {excel_engine}，改用 xlsxwriter 輸出")
+        excel_engine = 'xlsxwriter'
+
+    tmp_file = temp_output_path(output_file)
+
+    writer = open_report_writer(tmp_file, excel_engine)
+    try:
+        with profile.stage('stream') as stage:
+            raw_output = open_raw_output(writer, output_file, target_date, config)
+            collect = {}
+            if retest_options['enabled']:
+                collect['retest'] = retest_key_frame
+            trace_path = get_index_path(settings)
+            if trace_path is not None:
+                collect['trace'] = trace_chunk_rows
+            station_stats, spectrum_stats, collected = stream_log_files(
+                plans, raw_columns, target_date, schema, chunk_rows, raw_output,
+                cable_index=settings['cable_index'], spectrum=spectrum_options['enabled'],
+                collect=collect, profile=profile
+            )
+            retest_keys = collected.get('retest')
+            raw_output.close()
+            stage['rows'] = None if station_stats is None else int(station_stats['total'].sum())
+        detected_failures = None
+        if station_stats is not None:
+            with profile.stage('baseline'):
+                spc_alerts = update_baselines(settings, target_date, station_stats)
+            with profile.stage('dashboard_write'):
+                detected_failures = write_summary_dashboard(writer, station_stats, target_date,
+                                                            settings['failure_rules'], spc_alerts)
+            if spectrum_options['enabled']:
+                with profile.stage('spectrum'):
+                    write_spectrum_sheet(writer, spectrum_stats, target_date, spectrum_options)
+            if retest_keys is not None:
+                with profile.stage('retest', rows=len(retest_keys)):
+                    retest_stats = compute_retest_stats(mark_retests(retest_keys))
+                    log_retest_summary(retest_stats)
+                    write_retest_sheet(writer, retest_stats, target_date)
+    finally:
+        with profile.stage('save'):
+            writer.close()
+
+    if station_stats is None:
+        os.remove(tmp_file)
+        logging.warning("未找到有效資料，無法產出報表。")
+        return None
+
+    with profile.stage('trend'):
+        save_trend_stats(settings, target_date, station_stats, detected_failures)
+    if collected.get('trace') is not None:
+        with profile.stage('trace', rows=len(collected['trace'])):
+            update_trace_index(trace_path, target_date, collected['trace'])
+    if not replace_output(tmp_file, output_file):
+        return None
+    logging.info(f"資料整合完畢。輸出檔案為: {output_file}")
+    return output_file
+
+# 批次模式下各日期子程序共用的設定 (每個子程序只讀取一次 config.ini)
+_worker_settings = None
+
+def _init_date_worker(profiler=None):
+    global _worker_settings
+    _worker_settings = load_settings()
+    if _worker_settings is not None and profiler:
+        # 命令列的 --profile 不在 config.ini 中，需傳給子程序
+        from run_profile import set_profiler
+        set_profiler(_worker_settings['config'], profiler)
+
+def _run_date_job(target_date):
+    # 日期層級已平行處理，子程序內逐檔讀取，避免巢狀程序池
+    return run_aggregation(target_date, settings=_worker_settings, parse_workers=1)
+
+def get_date_workers(config, date_count):
+    """
+    由 config.ini 的 [Performance] Date_Workers 取得同時處理的日期數 (0 表示使用全部 CPU 核心)。
+    """
+    try:
+        workers = config.getint('Performance', 'Date_Workers', fallback=1)
+    except ValueError:
+        logging.error("Config 中 Date_Workers 必須為整數，改為逐日處理")
+        return 1
+
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, date_count))
+
+def run_batch(dates, settings, jobs=None, force=False):
+    """
+    在同一個程序中依序或平行處理多個日期，回傳 {日期: 輸出檔路徑或 None}。
+    沒有日誌檔的日期與報表已是最新的日期會略過 (force=True 時仍重新產生)。
+    """
+    pending = []
+    for target_date in dates:
+        files = find_log_files(settings['source_dir'], target_date)
+        if not files:
+            continue
+        if not force and is_summary_up_to_date(settings, target_date, files):
+            logging.info(f"略過日期 {target_date}: Daily_Summary_{target_date}.xlsx 已是最新")
+            continue
+        pending.append(target_date)
+
+    if not pending:
+        logging.info("沒有需要產生的報表")
+        return {}
+
+    if jobs is None:
+        jobs = get_date_workers(settings['config'], len(pending))
+    jobs = max(1, min(jobs, len(pending)))
+    logging.info(f"共 {len(pending)} 個日期待處理 (同時處理 {jobs} 個): {', '.join(pending)}")
+
+    if jobs == 1:
+        return {d: run_aggregation(d, settings=settings) for d in pending}
+
+    results = {}
+    profiler = settings['config'].get('Profiling', 'Profiler', fallback=None)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_date_worker, initargs=(profiler,)) as executor:
+        futures = {executor.submit(_run_date_job, d): d for d in pending}
+        for future in as_completed(futures):
+            target_date = futures[future]
+            try:
+                results[target_date] = future.result()
+            except Exception as e:
+                logging.error(f"日期 {target_date} 處理失敗: {e}")
+                results[target_date] = None
+    return {d: results[d] for d in pending}
+
+class _ErrorCounter(logging.Handler):
+    """
+    計算檢查期間記錄的錯誤數 (各設定函式遇到錯誤值時會記錄錯誤並改用預設值)。
+    """
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+def check_setup():
+    """
+    檢查 config.ini、[Device_Mapping] 與來源資料夾 (--check)，結果寫入日誌，回傳發現的錯誤數。
+    只讀取設定與檔名，不載入 pandas 等報表函式庫，也不建立任何資料夾。
+    """
+    counter = _ErrorCounter()
+    root = logging.getLogger()
+    root.addHandler(counter)
+    try:
+        _check_setup()
+    finally:
+        root.removeHandler(counter)
+
+    if counter.count:
+        logging.error(f"檢查完成: 發現 {counter.count} 個錯誤")
+    else:
+        logging.info("檢查完成: 設定正確")
+    return counter.count
+
+def _check_setup():
+    from run_profile import get_profiling_options
+
+    base_dir = get_base_dir()
+    config_path = os.path.join(base_dir, 'config.ini')
+    if not os.path.exists(config_path):
+        logging.error(f"找不到 Config 檔案路徑: {config_path}")
+        return
+
+    config = configparser.ConfigParser()
+    try:
+        config.read(config_path, encoding='utf-8')
+    except (configparser.Error, UnicodeDecodeError) as e:
+        logging.error(f"無法解析 Config 檔案 {config_path}: {e}")
+        return
+    logging.info(f"Config 檔案: {config_path}")
+
+    try:
+        source_dir = config['Path']['Source_Folder']
+        output_dir = resolve_config_path(base_dir, config['Path']['Output_Folder'])
+    except KeyError as e:
+        logging.error(f"Config 檔案缺少鍵值: {e}")
+        return
+    if not os.path.isdir(output_dir):
+        logging.warning(f"輸出資料夾不存在，產生報表時會自動建立: {output_dir}")
+
+    # 各項設定值 (錯誤值由各設定函式記錄)
+    load_failure_rules(config)
+    get_cable_index_limit(config)
+    get_log_parser(config)
+    get_parse_workers(config, 1)
+    get_date_workers(config, 1)
+    get_profiling_options(config)
+
+    # --- [Device_Mapping] ---
+    device_map = parse_device_mapping(config)
+    if not device_map:
+        logging.warning("[Device_Mapping] 沒有任何機台對應，所有站點將顯示為 Unknown_Line")
+    stations = {}
+    for ip_key, meta in device_map.items():
+        ip = ip_key.replace('_', '.')
+        if not re.match(r"^\d{1,3}(\.\d{1,3}){3}$", ip):
+            logging.warning(f"[Device_Mapping] {ip} 不是有效的 IP 位址")
+        stations.setdefault((meta['Line'], meta['Station']), []).append(ip)
+    for (line, station), ips in stations.items():
+        if len(ips) > 1:
+            logging.warning(f"[Device_Mapping] {line} {station} 對應到多個 IP: {', '.join(ips)}")
+    lines = {meta['Line'] for meta in device_map.values()}
+    logging.info(f"[Device_Mapping]: {len(device_map)} 台機台, {len(lines)} 條線別")
+
+    # --- 來源資料夾 ---
+    if not os.path.isdir(source_dir):
+        logging.error(f"找不到來源資料夾 Source_Folder: {source_dir}")
+        return
+    dates = set()
+    unmapped = set()
+    for path in glob.glob(os.path.join(source_dir, "*_*.txt")):
+        match = re.match(r"(\d{8})_(.+)\.txt$", os.path.basename(path))
+        if match:
+            dates.add(match.group(1))
+            if match.group(2) not in device_map:
+                unmapped.add(match.group(2).replace('_', '.'))
+    if not dates:
+        logging.warning(f"來源資料夾中沒有日誌檔 ({{YYYYMMDD}}_{{IP}}.txt): {source_dir}")
+        return
+    logging.info(f"來源資料夾: {source_dir} ({len(dates)} 個日期, {min(dates)} ~ {max(dates)})")
+    if unmapped:
+        logging.warning(f"以下 IP 的日誌不在 [Device_Mapping] 中，報表將顯示為 Unknown_Line: {', '.join(sorted(unmapped))}")
+
+def valid_date(value):
+    if not re.match(r"^\d{8}$", value):
+        raise argparse.ArgumentTypeError(f"日期格式錯誤: {value} (應為 8 位數字，例如 20260101)")
+    try:
+        datetime.strptime(value, '%Y%m%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"無效的日期: {value}")
+    return value
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="整合各機台測試日誌並產生 Daily_Summary 報表；未指定日期參數時以互動方式輸入日期。"
+    )
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--date', type=valid_date, help="處理單一日期 (YYYYMMDD)")
+    target.add_argument('--from', dest='date_from', type=valid_date, metavar='YYYYMMDD',
+                        help="日期區間起始日 (未指定 --to 時處理至昨天)")
+    target.add_argument('--all-missing', action='store_true',
+                        help="處理來源資料夾中所有尚未產生或已過期的報表")
+    parser.add_argument('--to', dest='date_to', type=valid_date, metavar='YYYYMMDD', help="日期區間結束日 (含)")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="同時處理的日期數 (預設依 config.ini 的 [Performance] Date_Workers)")
+    parser.add_argument('--force', action='store_true', help="即使報表已是最新也重新產生")
+    parser.add_argument('--watch', action='store_true',
+                        help="常駐監看 Source_Folder，日誌有變動時自動重新產生該日期的報表 (Ctrl+C 結束)")
+    parser.add_argument('--serve', action='store_true',
+                        help="啟動本機查詢服務 (HTTP/JSON)，提供各線別/站點指標、失效模式與報表下載 (Ctrl+C 結束)")
+    parser.add_argument('--check', action='store_true',
+                        help="只檢查 config.ini、[Device_Mapping] 與來源資料夾，不產生報表")
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=['cprofile', 'pyinstrument'],
+                        help="以 cProfile (預設) 或 pyinstrument 分析執行效能，結果寫在報表旁 ([Profiling] Profiler)")
+    return parser
+
+def load_cli_settings(args):
+    """
+    讀取 config.ini，並套用命令列的 --profile。
+    """
+    settings = load_settings()
+    if settings is not None and args.profile:
+        from run_profile import set_profiler
+        set_profiler(settings['config'], args.profile)
+    return settings
+
+def prompt_for_date():
     while True:
         # 詢問 user 日期
         user_date= input("請輸入要執行的日期(格式為YYYYMMDD,例如 20260101):").strip()
         # 簡單驗證輸入格式是否為 8 個數字
         if re.match(r"^\d{8}$", user_date):
             print(f"準備執行日期 {user_date} 的測試紀錄...")
-            run_aggregation(user_date)
-            break # 執行完畢後跳出迴圈
+            return user_date
         else:
             print("輸入格式錯誤!請重新輸入 8 位數字的日期格式(例如:20260101)。\n")
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.date_to and not args.date_from:
+        parser.error("--to 需搭配 --from 使用")
+
+    if args.check:
+        return 1 if check_setup() else 0
+
+    if args.watch:
+        from watcher import run_watcher
+        return run_watcher(load_cli_settings(args) if args.profile else None)
+
+    if args.serve:
+        from query_service import run_service
+        return run_service(load_cli_settings(args) if args.profile else None)
+
+    # 未指定日期參數時沿用原本的互動式輸入
+    if not (args.date or args.date_from or args.all_missing):
+        target_date = prompt_for_date()
+        settings = load_cli_settings(args)
+        return 0 if settings is not None and run_aggregation(target_date, settings=settings) else 1
+
+    settings = load_cli_settings(args)
+    if settings is None:
+        return 1
+
+    if args.date:
+        dates = [args.date]
+    elif args.date_from:
+        dates = date_range(args.date_from, args.date_to or default_target_date())
+    else:
+        dates = find_log_dates(settings['source_dir'])
+
+    results = run_batch(dates, settings, jobs=args.jobs, force=args.force)
+    failed = [d for d, output_file in results.items() if output_file is None]
+    if failed:
+        logging.warning(f"以下日期未產出報表: {', '.join(failed)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    # 打包成執行檔時，子程序需透過 freeze_support 啟動
+    multiprocessing.freeze_support()
+    # 以匯入的 aggregator 模組執行，與功能模組 (from aggregator import ...) 共用同一份模組層級的狀態
+    from aggregator import main as aggregator_main
+    sys.exit(aggregator_main())
@@ -0,0 +1,413 @@
+"""
+各站點滾動基準線 (Rolling Baseline) 與 SPC 管制圖警示。
+
+Summary_Dashboard 的失效模式規則只比較同一天同線別的站點，整條線一起緩慢飄移時不會被發現。
+本模組為每個站點的 index1 ~ index3、dB(A)、RPM 每日平均值保存精簡的基準線狀態
+(EWMA、最近 Window 天的每日平均值與連續天數計數)，存於長期趨勢資料庫 ([Trend] Database) 的
+station_baseline 資料表。每日彙整只讀取並更新各站點的狀態 (與站點數成正比)，不需重新讀取歷史資料。
+
+當日數值在更新前與基準線比較，違反下列管制圖規則時列於 Summary_Dashboard 的 SPC 區段：
+- Beyond Limit: 當日平均值超出基準平均 ± Sigma 倍標準差
+- EWMA Drift  : EWMA 超出基準平均 ± Sigma 倍 EWMA 標準差 (緩慢飄移)
+- Run         : 連續 Run_Days 天位於基準平均的同一側
+- Trend       : 連續 Trend_Days 天持續上升或下降
+重跑同一天時由該日更新前的狀態重新計算；較基準線最後更新日更早的日期不更新也不檢查，
+可用 python baseline.py rebuild 依趨勢資料庫的每日統計依序重建。
+
+    python baseline.py show [線別]
+    python baseline.py rebuild [--from YYYYMMDD] [--to YYYYMMDD]
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+from aggregator import DASHBOARD_STYLES, SUMMARY_BORDER, format_location, load_settings, valid_date
+
+# 基準線量測指標: (名稱, 統計表的加總欄位, 平均值欄位)
+BASELINE_METRICS = [
+    ('index1', 'idx1_sum', 'idx1_mean'),
+    ('index2', 'idx2_sum', 'idx2_mean'),
+    ('index3', 'idx3_sum', 'idx3_mean'),
+    ('dB(A)', 'dba_sum', 'dba_mean'),
+    ('RPM', 'rpm_sum', 'rpm_mean'),
+]
+
+DEFAULT_BASELINE_OPTIONS = {
+    'enabled': False,
+    'alpha': 0.2,
+    'window': 30,
+    'min_days': 10,
+    'sigma': 3.0,
+    'run_days': 9,
+    'trend_days': 6,
+    'percentiles': [5.0, 95.0],
+}
+
+# 批次平行處理多個日期時各程序輪流更新，等待其他程序寫完的秒數
+BASELINE_LOCK_TIMEOUT = 60
+
+SPC_STYLES = {
+    'spc_header': DASHBOARD_STYLES['mode_header'],
+    'spc_label': {'fill': 'FFCCCC', 'border_color': SUMMARY_BORDER, 'align': 'left'},
+    'spc_rule': {'fill': 'FFCCCC', 'border_color': SUMMARY_BORDER, 'bold': True, 'color': 'FF0000', 'align': 'left'},
+    'spc_value': {'fill': 'FFCCCC', 'border_color': SUMMARY_BORDER, 'align': 'center', 'num_format': '0.00'},
+    'spc_days': {'fill': 'FFCCCC', 'border_color': SUMMARY_BORDER, 'align': 'center'},
+}
+
+# SPC 區段的欄位: (標題, 警示欄位, 樣式)
+SPC_COLUMNS = [
+    ('Location', 'location', 'spc_label'),
+    ('Metric', 'metric', 'spc_label'),
+    ('Rule', 'rule', 'spc_rule'),
+    ('Value', 'value', 'spc_value'),
+    ('EWMA', 'ewma', 'spc_value'),
+    ('Baseline Mean', 'mean', 'spc_value'),
+    ('Std', 'std', 'spc_value'),
+    ('Lower Limit', 'lower', 'spc_value'),
+    ('Upper Limit', 'upper', 'spc_value'),
+    ('P Low', 'p_low', 'spc_value'),
+    ('P High', 'p_high', 'spc_value'),
+    ('Days', 'days', 'spc_days'),
+]
+
+
+def get_baseline_options(config):
+    """
+    由 config.ini 的 [Baseline] 區段取得基準線與管制圖設定。
+    """
+    options = dict(DEFAULT_BASELINE_OPTIONS)
+    try:
+        options['enabled'] = config.getboolean('Baseline', 'Enabled', fallback=options['enabled'])
+    except ValueError:
+        logging.error("Config 中 [Baseline] Enabled 必須為 true/false，改用預設值")
+
+    for key, name, kind, low in (('alpha', 'Alpha', float, 0.0), ('sigma', 'Sigma', float, 0.0),
+                                 ('window', 'Window', int, 2), ('min_days', 'Min_Days', int, 2),
+                                 ('run_days', 'Run_Days', int, 2), ('trend_days', 'Trend_Days', int, 2)):
+        getter = config.getfloat if kind is float else config.getint
+        try:
+            value = getter('Baseline', name, fallback=options[key])
+        except ValueError:
+            logging.error(f"Config 中 [Baseline] {name} 必須為數值，改用預設值 {options[key]}")
+            continue
+        # Alpha / Sigma 必須大於 0；天數至少 2 天 (兩點即可計算標準差與斜率)
+        if (value <= low if kind is float else value < low) or (key == 'alpha' and value > 1):
+            logging.error(f"Config 中 [Baseline] {name} = {value} 超出範圍，改用預設值 {options[key]}")
+            continue
+        options[key] = value
+
+    value = config.get('Baseline', 'Percentiles', fallback=None)
+    if value is not None:
+        try:
+            percentiles = sorted(float(p) for p in value.split(','))
+            if len(percentiles) != 2 or not all(0 <= p <= 100 for p in percentiles):
+                raise ValueError(value)
+            options['percentiles'] = percentiles
+        except ValueError:
+            logging.error(f"Config 中 [Baseline] Percentiles 必須為 0 ~ 100 的兩個數值 (例如 5, 95)，"
+                          f"改用預設值 {options['percentiles']}")
+    return options
+
+
+def open_baseline(db_path):
+    conn = sqlite3.connect(db_path, timeout=BASELINE_LOCK_TIMEOUT)
+    # 讀取與更新狀態在同一個交易內完成 (BEGIN IMMEDIATE)，平行處理的日期不會互相覆蓋
+    conn.isolation_level = None
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS station_baseline (
+            line_name TEXT NOT NULL,
+            device_id TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            log_date TEXT NOT NULL,
+            state TEXT NOT NULL,
+            previous TEXT,
+            PRIMARY KEY (line_name, device_id, metric)
+        )
+    """)
+    return conn
+
+
+def new_state():
+    return {'n': 0, 'ewma': None, 'window': [], 'run': 0, 'trend': 0}
+
+
+def window_stats(state, options):
+    """
+    由最近 Window 天的每日平均值計算基準平均、標準差與百分位數。
+    """
+    window = np.asarray(state['window'], dtype='float64')
+    if len(window) == 0:
+        return None
+    low, high = np.percentile(window, options['percentiles'])
+    return {
+        'mean': float(window.mean()),
+        'std': float(window.std(ddof=1)) if len(window) > 1 else 0.0,
+        'p_low': float(low),
+        'p_high': float(high),
+    }
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+def update_state(state, value, options):
+    """
+    以當日數值更新基準線狀態，回傳 (新狀態, 違反的規則清單)；規則以更新前的基準線判定。
+    每個狀態只保存固定筆數，更新時間與歷史天數無關。
+    """
+    alpha = options['alpha']
+    base = window_stats(state, options)
+    updated = dict(state)
+
+    updated['ewma'] = value if state['ewma'] is None else alpha * value + (1 - alpha) * state['ewma']
+
+    # 與基準平均同側的連續天數 (正值為高於平均)、連續上升/下降的天數 (正值為上升)
+    side = _sign(value - base['mean']) if base else 0
+    updated['run'] = state['run'] + side if side and _sign(state['run']) == side else side
+    step = _sign(value - state['window'][-1]) if state['window'] else 0
+    updated['trend'] = state['trend'] + step if step and _sign(state['trend']) == step else step
+
+    updated['window'] = (state['window'] + [value])[-options['window']:]
+    updated['n'] = state['n'] + 1
+
+    violations = []
+    if base is None or state['n'] < options['min_days'] or base['std'] <= 0:
+        return updated, violations
+
+    limit = options['sigma'] * base['std']
+    ewma_limit = limit * math.sqrt(alpha / (2 - alpha))
+    details = dict(base, value=value, ewma=updated['ewma'], days=state['n'])
+    if abs(value - base['mean']) > limit:
+        violations.append(dict(details, rule='Beyond Limit', lower=base['mean'] - limit, upper=base['mean'] + limit))
+    if abs(updated['ewma'] - base['mean']) > ewma_limit:
+        violations.append(dict(details, rule='EWMA Drift', lower=base['mean'] - ewma_limit,
+                               upper=base['mean'] + ewma_limit))
+    if abs(updated['run']) >= options['run_days']:
+        violations.append(dict(details, rule='Run', lower=None, upper=None, days=abs(updated['run'])))
+    if abs(updated['trend']) >= options['trend_days']:
+        violations.append(dict(details, rule='Trend', lower=None, upper=None, days=abs(updated['trend'])))
+    return updated, violations
+
+
+def station_values(station_stats):
+    """
+    由站點統計表取出各站點當日的指標平均值: {(Line_Name, Device_ID, 指標): 平均值}。
+    沒有資料的站點與缺少加總欄位 (舊版趨勢資料庫) 的指標不列入。
+    """
+    values = {}
+    for (line, station), st in station_stats.iterrows():
+        if not st['total'] > 0:
+            continue
+        for metric, sum_col, mean_col in BASELINE_METRICS:
+            if sum_col in st.index and not np.isnan(float(st[sum_col])):
+                values[(str(line), str(station), metric)] = float(st[mean_col])
+    return values
+
+
+def apply_day(conn, log_date, station_stats, options):
+    """
+    於一個交易內以當日站點統計更新基準線，回傳違反管制圖規則的警示清單 (依線別、站點、指標排序)。
+    """
+    values = station_values(station_stats)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        stored = {
+            (line, station, metric): (date, json.loads(state), previous)
+            for line, station, metric, date, state, previous in conn.execute(
+                "SELECT line_name, device_id, metric, log_date, state, previous FROM station_baseline"
+            )
+        }
+        alerts = []
+        rows = []
+        skipped = 0
+        order = {metric: i for i, (metric, _, _) in enumerate(BASELINE_METRICS)}
+        for key in sorted(values, key=lambda k: (k[0], k[1], order[k[2]])):
+            line, station, metric = key
+            if key in stored:
+                date, state, previous = stored[key]
+                if date > log_date:
+                    skipped += 1
+                    continue
+                if date == log_date:
+                    # 重跑同一天：由該日更新前的狀態重新計算
+                    state = json.loads(previous) if previous else new_state()
+            else:
+                state = new_state()
+
+            updated, violations = update_state(state, values[key], options)
+            location = format_location(line, station)
+            alerts.extend(dict(v, location=location, metric=metric) for v in violations)
+            rows.append((line, station, metric, log_date, json.dumps(updated), json.dumps(state)))
+
+        conn.executemany("INSERT OR REPLACE INTO station_baseline VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+    if skipped:
+        logging.warning(f"{log_date} 早於基準線的最後更新日，{skipped} 項站點指標不更新也不檢查 "
+                        "(可執行 python baseline.py rebuild 依日期順序重建)")
+    return alerts
+
+
+def update_baselines(settings, log_date, station_stats):
+    """
+    以當日站點統計更新基準線並回傳 SPC 警示清單；未啟用 ([Baseline] 或 [Trend]) 或失敗時回傳 None。
+    失敗只記錄錯誤，不影響日報表。
+    """
+    from trend_store import get_store_path
+
+    options = get_baseline_options(settings['config'])
+    db_path = get_store_path(settings)
+    if not options['enabled'] or db_path is None:
+        return None
+
+    try:
+        conn = open_baseline(db_path)
+        try:
+            alerts = apply_day(conn, log_date, station_stats, options)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.error(f"更新基準線 {db_path} 失敗: {e}")
+        return None
+
+    if alerts:
+        logging.warning(f"SPC 警示 {len(alerts)} 項: " + ", ".join(
+            f"{a['location']} {a['metric']} {a['rule']}" for a in alerts
+        ))
+    else:
+        logging.info("SPC 檢查: 各站點指標皆在基準線範圍內")
+    return alerts
+
+
+def write_spc_section(layout, current_row, alerts, date_str):
+    """
+    於 Summary_Dashboard 寫入 SPC 警示區段，回傳區段後的下一列。
+    """
+    last_col = len(SPC_COLUMNS)
+    layout.merge(current_row, 1, current_row, last_col)
+    layout.write(current_row, 1, f"SPC Drift Alerts ({date_str})", 'title')
+    current_row += 1
+
+    for i, (title, _, _) in enumerate(SPC_COLUMNS, 1):
+        layout.write(current_row, i, title, 'spc_header')
+    current_row += 1
+
+    if not alerts:
+        layout.merge(current_row, 1, current_row, last_col)
+        layout.write(current_row, 1, "OK", 'mode_ok')
+        return current_row + 1
+
+    for alert in alerts:
+        for i, (_, field, style) in enumerate(SPC_COLUMNS, 1):
+            value = alert[field]
+            if style == 'spc_value' and value is not None:
+                value = round(float(value), 4)
+            layout.write(current_row, i, value, style)
+        current_row += 1
+    return current_row
+
+
+def rebuild_baselines(settings, start_date=None, end_date=None):
+    """
+    清除基準線後依日期順序以趨勢資料庫的每日統計重建，回傳重建的天數。
+    """
+    from trend_store import get_store_path, load_daily_stats
+
+    options = get_baseline_options(settings['config'])
+    db_path = get_store_path(settings)
+    stats, _ = load_daily_stats(db_path, start_date, end_date)
+    dates = list(stats.index.unique(level='log_date'))
+
+    conn = open_baseline(db_path)
+    try:
+        conn.execute("DELETE FROM station_baseline")
+        alerts = 0
+        for log_date in dates:
+            alerts += len(apply_day(conn, log_date, stats.xs(log_date, level='log_date'), options))
+    finally:
+        conn.close()
+    logging.info(f"基準線重建完成: {len(dates)} 天, 期間共 {alerts} 項 SPC 警示")
+    return len(dates)
+
+
+def show_baselines(settings, line=None):
+    """
+    列出各站點指標目前的基準線 (最後更新日、天數、平均、標準差、百分位數與 EWMA)。
+    """
+    from trend_store import get_store_path
+
+    options = get_baseline_options(settings['config'])
+    conn = open_baseline(get_store_path(settings))
+    try:
+        rows = list(conn.execute(
+            "SELECT line_name, device_id, metric, log_date, state FROM station_baseline ORDER BY line_name, device_id"
+        ))
+    finally:
+        conn.close()
+
+    low, high = (f"P{p:g}" for p in options['percentiles'])
+    headers = ['Location', 'Metric', 'Date', 'Days', 'Mean', 'Std', low, high, 'EWMA']
+    order = {metric: i for i, (metric, _, _) in enumerate(BASELINE_METRICS)}
+    table = []
+    for line_name, device_id, metric, log_date, state in sorted(rows, key=lambda r: (r[0], r[1], order.get(r[2], 0))):
+        if line and format_location(line) != format_location(line_name):
+            continue
+        state = json.loads(state)
+        base = window_stats(state, options)
+        table.append([format_location(line_name, device_id), metric, log_date, str(state['n'])]
+                     + [f"{base[k]:.3f}" for k in ('mean', 'std', 'p_low', 'p_high')] + [f"{state['ewma']:.3f}"])
+
+    if not table:
+        print("尚無基準線資料")
+        return
+    widths = [max([len(h)] + [len(row[i]) for row in table]) for i, h in enumerate(headers)]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for row in table:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="各站點滾動基準線：列出目前的基準線，或依趨勢資料庫重建")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    show = commands.add_parser('show', help="列出各站點指標目前的基準線")
+    show.add_argument('line', nargs='?', help="只列出指定線別 (例如 Line_1 或 C01)")
+
+    rebuild = commands.add_parser('rebuild', help="清除基準線後依趨勢資料庫的每日統計依序重建")
+    rebuild.add_argument('--from', dest='date_from', type=valid_date, metavar='YYYYMMDD', help="起始日")
+    rebuild.add_argument('--to', dest='date_to', type=valid_date, metavar='YYYYMMDD', help="結束日 (含)")
+    return parser
+
+
+def main(argv=None):
+    from trend_store import get_store_path
+
+    args = build_arg_parser().parse_args(argv)
+    settings = load_settings()
+    if settings is None:
+        return 1
+
+    db_path = get_store_path(settings)
+    if db_path is None or not os.path.exists(db_path):
+        logging.error("趨勢資料庫未啟用或尚未建立，請確認 config.ini 的 [Trend] 設定並先執行每日彙整")
+        return 1
+
+    if args.command == 'show':
+        show_baselines(settings, args.line)
+    else:
+        rebuild_baselines(settings, args.date_from, args.date_to)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+彙整流程各階段的效能測試。
+
+以 synthetic_logs 產生指定規模的合成日誌，依 run_aggregation 的順序分別計時：
+discovery (尋找日誌檔) / parse (讀取與清理) / concat (合併) / classification (classify_results) /
+retest (重測判定，[Retest] Enabled 時) / failure_modes (站點統計與失效模式判定) / raw_sheet_write (原始資料) /
+dashboard_write (Summary_Dashboard) / spectrum (Spectrum 分頁，[Spectrum] Enabled 時) /
+retest_write (Retest 分頁) / save (寫出 Excel 檔)。
+讀檔與輸出設定取自 config.ini ([Schema]、[Performance] Parser、[Output]、[Spectrum]、[Retest]、[Failure_Rules])，
+可用參數覆寫。每個階段重複 --repeat 次取最快一次，結果寫入 JSON 檔；
+指定 --compare 時與先前的結果比較，任一階段變慢超過 --tolerance 時回傳 1。
+
+    python benchmarks/bench_pipeline.py --lines 4 --stations 8 --rows 20000
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/pipeline_20260101_060000.json
+"""
+import argparse
+import configparser
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd  # noqa: E402
+
+from aggregator import (  # noqa: E402
+    classify_results, compute_station_stats, detect_failure_modes, find_log_files, get_cable_index_limit,
+    resolve_retests, write_summary_dashboard
+)
+from ingest import get_log_schema, parse_log_file, station_meta  # noqa: E402
+from failure_rules import load_failure_rules  # noqa: E402
+from log_schema import apply_log_schema  # noqa: E402
+from raw_output import open_raw_output  # noqa: E402
+from retest import get_retest_options, write_retest_sheet  # noqa: E402
+from report_writer import open_report_writer  # noqa: E402
+from spectrum import compute_spectrum_stats, get_spectrum_options, write_spectrum_sheet  # noqa: E402
+from synthetic_logs import generate_logs, parse_failure_mix  # noqa: E402
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+
+STAGES = [
+    'discovery', 'parse', 'concat', 'classification', 'retest', 'failure_modes',
+    'raw_sheet_write', 'dashboard_write', 'spectrum', 'retest_write', 'save',
+]
+
+BENCH_DATE = '20260101'
+
+
+@contextmanager
+def timed(seconds, name):
+    """
+    將區塊的執行秒數記錄於 seconds[name]。
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds[name] = time.perf_counter() - start
+
+
+def load_bench_config(path, args):
+    """
+    讀取 config.ini，並以命令列參數覆寫讀檔與輸出設定。
+    """
+    config = configparser.ConfigParser()
+    if path and os.path.exists(path):
+        config.read(path, encoding='utf-8')
+
+    overrides = {
+        ('Schema', 'Typed'): args.typed,
+        ('Schema', 'Columns'): args.columns,
+        ('Performance', 'Parser'): args.parser,
+        ('Output', 'Excel_Engine'): args.excel_engine,
+        ('Output', 'Raw_Data'): args.raw_data,
+        ('Spectrum', 'Enabled'): args.spectrum,
+        ('Retest', 'Enabled'): args.retest,
+        ('Retest', 'Count'): args.retest_count,
+    }
+    for (section, option), value in overrides.items():
+        if value is None:
+            continue
+        if not config.has_section(section):
+            config.add_section(section)
+        config.set(section, option, str(value))
+    return config
+
+
+def run_pipeline(source_dir, output_dir, device_map, config):
+    """
+    依 run_aggregation 的順序執行一次完整彙整，回傳 ({階段: 秒數}, 資料筆數)。
+    """
+    schema = get_log_schema(config)
+    rules = load_failure_rules(config)
+    cable_index = get_cable_index_limit(config)
+    spectrum_options = get_spectrum_options(config)
+    retest_options = get_retest_options(config)
+    excel_engine = config.get('Output', 'Excel_Engine', fallback='openpyxl').strip()
+    seconds = {}
+
+    with timed(seconds, 'discovery'):
+        files = [
+            f for f in find_log_files(source_dir, BENCH_DATE)
+            if station_meta(os.path.basename(f), BENCH_DATE, device_map) is not None
+        ]
+
+    with timed(seconds, 'parse'):
+        frames = [parse_log_file(f, BENCH_DATE, device_map, None, schema) for f in files]
+
+    with timed(seconds, 'concat'):
+        master_df = pd.concat([df for df in frames if df is not None], ignore_index=True)
+        if schema and schema['typed']:
+            apply_log_schema(master_df)
+    del frames
+
+    with timed(seconds, 'classification'):
+        classify_results(master_df)
+
+    stats_df = master_df
+    retest_stats = None
+    if retest_options['enabled']:
+        with timed(seconds, 'retest'):
+            stats_df, retest_stats = resolve_retests(master_df, retest_options['count'])
+
+    with timed(seconds, 'failure_modes'):
+        station_stats = compute_station_stats(stats_df, cable_index=cable_index)
+        detect_failure_modes(station_stats, rules)
+    del stats_df
+
+    output_file = os.path.join(output_dir, f"Daily_Summary_{BENCH_DATE}.xlsx")
+    writer = open_report_writer(output_file, excel_engine)
+    try:
+        with timed(seconds, 'raw_sheet_write'):
+            raw_output = open_raw_output(writer, output_file, BENCH_DATE, config)
+            raw_output.append(master_df)
+            raw_output.close()
+
+        with timed(seconds, 'dashboard_write'):
+            write_summary_dashboard(writer, station_stats, BENCH_DATE, rules)
+
+        if spectrum_options['enabled']:
+            with timed(seconds, 'spectrum'):
+                write_spectrum_sheet(writer, compute_spectrum_stats(master_df), BENCH_DATE, spectrum_options)
+
+        if retest_stats is not None:
+            with timed(seconds, 'retest_write'):
+                write_retest_sheet(writer, retest_stats, BENCH_DATE)
+    finally:
+        with timed(seconds, 'save'):
+            writer.close()
+
+    return seconds, len(master_df)
+
+
+def git_revision():
+    """
+    目前的 git commit (有未提交的變更時加上 -dirty)；不在 git 版本庫中時回傳 None。
+    """
+    try:
+        revision = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=BASE_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision or None
+
+
+def summarize(runs, rows):
+    """
+    彙整多次執行的秒數：各階段取最快一次，並計算每秒處理列數。
+    """
+    stages = {}
+    for name in STAGES:
+        seconds = [run[name] for run in runs if name in run]
+        if not seconds:
+            continue
+        best = min(seconds)
+        stages[name] = {
+            'seconds': round(best, 6),
+            'runs': [round(s, 6) for s in seconds],
+            'rows_per_sec': round(rows / best) if best > 0 else None,
+        }
+    return stages
+
+
+def compare_results(baseline, current, tolerance):
+    """
+    逐階段比較兩次結果，回傳變慢超過 tolerance (例如 0.1 = 10%) 的階段。
+    """
+    regressions = []
+    print(f"\n與 {baseline.get('revision') or '先前結果'} ({baseline.get('created')}) 比較:")
+    print(f"{'階段':<16} {'先前秒數':>10} {'本次秒數':>10} {'比例':>7}")
+    for name in STAGES:
+        old = baseline['stages'].get(name)
+        new = current['stages'].get(name)
+        if not old or not new:
+            continue
+        ratio = new['seconds'] / old['seconds'] if old['seconds'] > 0 else float('inf')
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = '  <- 變慢'
+        print(f"{name:<16} {old['seconds']:>10.3f} {new['seconds']:>10.3f} {ratio:>6.2f}x{flag}")
+
+    if baseline.get('params') != current.get('params'):
+        print("注意: 兩次測試的資料規模或設定不同，比較結果僅供參考")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以合成日誌測試彙整流程各階段的效能")
+    parser.add_argument('--lines', type=int, default=4, help="線別數")
+    parser.add_argument('--stations', type=int, default=8, help="每條線的站點數")
+    parser.add_argument('--rows', type=int, default=1000, help="每個站點的資料筆數")
+    parser.add_argument('--failure-mix', default='', help="異常比例，例如 noise=0.05,rpm=0.01")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="重複執行次數 (各階段取最快一次)")
+    parser.add_argument('--config', default=os.path.join(BASE_DIR, 'config.ini'), help="讀取設定的 config.ini")
+    parser.add_argument('--typed', choices=['true', 'false'], help="覆寫 [Schema] Typed")
+    parser.add_argument('--columns', help="覆寫 [Schema] Columns")
+    parser.add_argument('--parser', choices=['pandas', 'fast'], help="覆寫 [Performance] Parser")
+    parser.add_argument('--excel-engine', help="覆寫 [Output] Excel_Engine")
+    parser.add_argument('--raw-data', help="覆寫 [Output] Raw_Data")
+    parser.add_argument('--spectrum', choices=['true', 'false'], help="覆寫 [Spectrum] Enabled")
+    parser.add_argument('--retest', choices=['true', 'false'], help="覆寫 [Retest] Enabled")
+    parser.add_argument('--retest-count', choices=['all', 'first', 'final'], help="覆寫 [Retest] Count")
+    parser.add_argument('--output', help="結果 JSON 檔 (預設 benchmarks/results/pipeline_{時間}.json)")
+    parser.add_argument('--compare', help="與先前的結果 JSON 比較")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="比較時允許變慢的比例 (預設 0.1 = 10%%)")
+    args = parser.parse_args(argv)
+
+    try:
+        failure_mix = parse_failure_mix(args.failure_mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # aggregator 匯入時已設定日誌，只保留警告以上的訊息以免干擾輸出
+    logging.getLogger().setLevel(logging.WARNING)
+    config = load_bench_config(args.config, args)
+
+    runs = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_dir = os.path.join(work_dir, 'logs')
+        start = time.perf_counter()
+        files, device_map = generate_logs(source_dir, BENCH_DATE, args.lines, args.stations, args.rows,
+                                          failure_mix, args.seed)
+        size_mb = sum(os.path.getsize(f) for f in files) / 1024 / 1024
+        print(f"已產生 {len(files)} 個日誌檔, {size_mb:.1f} MB ({time.perf_counter() - start:.1f} 秒)")
+
+        for i in range(max(1, args.repeat)):
+            output_dir = os.path.join(work_dir, f'out{i}')
+            os.makedirs(output_dir)
+            seconds, rows = run_pipeline(source_dir, output_dir, device_map, config)
+            runs.append(seconds)
+            print(f"第 {i + 1} 次: {sum(seconds.values()):.2f} 秒")
+
+    result = {
+        'benchmark': 'pipeline',
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'params': {
+            'lines': args.lines,
+            'stations': args.stations,
+            'rows_per_station': args.rows,
+            'failure_mix': failure_mix,
+            'seed': args.seed,
+            'typed': config.getboolean('Schema', 'Typed', fallback=False),
+            'columns': config.get('Schema', 'Columns', fallback='all'),
+            'parser': config.get('Performance', 'Parser', fallback='pandas'),
+            'excel_engine': config.get('Output', 'Excel_Engine', fallback='openpyxl'),
+            'raw_data': config.get('Output', 'Raw_Data', fallback='sheet'),
+            'spectrum': get_spectrum_options(config)['enabled'],
+            'retest': get_retest_options(config),
+        },
+        'rows': rows,
+        'files': len(files),
+        'size_mb': round(size_mb, 2),
+        'stages': summarize(runs, rows),
+    }
+    result['total_seconds'] = round(sum(s['seconds'] for s in result['stages'].values()), 6)
+
+    print(f"\n{'階段':<16} {'秒數':>10} {'列/秒':>14}")
+    for name, stage in result['stages'].items():
+        rate = f"{stage['rows_per_sec']:,}" if stage['rows_per_sec'] else '-'
+        print(f"{name:<16} {stage['seconds']:>10.3f} {rate:>14}")
+    print(f"{'total':<16} {result['total_seconds']:>10.3f}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"結果已寫入: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_results(baseline, result, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+產生與 test_log/ 相同欄位格式的合成測試日誌，供效能測試使用。
+
+每個站點一個日誌檔 ({date}_10_200_{線別}_{站點}.txt)，tab 分隔、CRLF 換行、ASCII 編碼，
+欄位順序與實際機台日誌相同。各資料列依 failure_mix 的比例產生不同的異常型態
+(對應 classify_results 的判定)，其餘為正常 (OK) 資料；同樣的參數與 seed 會產生相同的內容。
+
+    python benchmarks/synthetic_logs.py --out /tmp/synthetic --lines 4 --stations 8 --rows 20000
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# 實際機台日誌的欄位順序 (與 test_log/ 相同)
+LOG_HEADER = [
+    'Time', 'Barcode', 'Model_Name', 'Voltage', 'Duty', 'Total_Result', 'Section', 'Intelligent_Control',
+    'dB(A)', 'RPM', 'index1', 'index2', 'index3', 'Index1_Limit', 'Index2_Limit', 'Index3_Limit',
+    'RPM_Low', 'RPM_Up', 'Range_Up', 'Range_Low', '1P', '2P', '3P', '4P',
+    'RPM1', 'RPM2', 'RPM3', 'RPM4', 'RPM5', 'RPM6',
+    'Spectrum_Control', '1/n_Octave', 'Criteria_Path', 'Spectrum_OK?', 'Overall_Noise?',
+    '500.0', '630.0', '800.0', '1000.0', '1250.0', '1600.0', '2000.0', '2500.0',
+    '3150.0', '4000.0', '5000.0', '6300.0', '8000.0', '10000.0',
+    'LineName', 'BoxName', 'MESResult', 'ProgramVersion',
+]
+
+# 各頻帶的平均 dB 值 (依 test_log/ 樣本估計)
+BAND_LEVELS = [38.0, 38.0, 48.0, 39.5, 40.0, 42.0, 40.0, 40.0, 43.5, 44.0, 40.0, 42.0, 47.0, 48.0]
+
+MODEL_NAME = 'TAA0412DDX01W2P F'
+PAUSE_MODEL_NAME = 'Pause or Free Run'
+INDEX_LIMITS = (200.0, 350.0, 1.0)
+RPM_LOW = 6500.0
+
+# 各異常型態的預設比例 (其餘為正常資料)：
+# noise: Index 超過上限、rpm: 未轉動或轉速失控、spec: 智慧判定 OK 但總判定 NG、
+# pause: Pause or Free Run 機種、no_barcode: 缺少條碼、cable: Index 超過線材異常門檻
+DEFAULT_FAILURE_MIX = {
+    'noise': 0.02,
+    'rpm': 0.005,
+    'spec': 0.005,
+    'pause': 0.002,
+    'no_barcode': 0.002,
+    'cable': 0.001,
+}
+
+
+def parse_failure_mix(value):
+    """
+    解析 "noise=0.05,rpm=0.01" 格式的異常比例，未列出的型態沿用預設值。
+    """
+    mix = dict(DEFAULT_FAILURE_MIX)
+    for item in (value or '').split(','):
+        if not item.strip():
+            continue
+        kind, _, ratio = item.partition('=')
+        kind = kind.strip()
+        if kind not in DEFAULT_FAILURE_MIX:
+            raise ValueError(f"未知的異常型態: {kind} (可用: {', '.join(DEFAULT_FAILURE_MIX)})")
+        mix[kind] = float(ratio)
+    if any(r < 0 for r in mix.values()) or sum(mix.values()) > 1:
+        raise ValueError("異常比例需介於 0 ~ 1，且總和不可超過 1")
+    return mix
+
+
+def station_ip(line, station):
+    return f"10.200.{line}.{station}"
+
+
+def build_device_map(lines, stations):
+    """
+    回傳與 load_settings 相同格式的 {ip_key: {'Line', 'Station'}} 對應表。
+    """
+    return {
+        station_ip(line, station).replace('.', '_'): {'Line': f'Line_{line}', 'Station': f'Station {station}'}
+        for line in range(1, lines + 1)
+        for station in range(1, stations + 1)
+    }
+
+
+def synthetic_frame(rows, date, failure_mix, rng, serial_start=0):
+    """
+    產生單一站點 rows 筆的日誌資料 (欄位與 LOG_HEADER 相同，數值已格式化為日誌的小數位數)。
+    """
+    kinds = ['ok'] + list(failure_mix)
+    probs = [1 - sum(failure_mix.values())] + list(failure_mix.values())
+    kind = rng.choice(len(kinds), size=rows, p=probs)
+    is_kind = {name: kind == i for i, name in enumerate(kinds)}
+    failed = kind != 0
+
+    # 自 06:00 起每 20 ~ 60 秒一筆
+    start = datetime.strptime(date, '%Y%m%d') + timedelta(hours=6)
+    times = (start + pd.to_timedelta(np.cumsum(rng.integers(20, 60, size=rows)), unit='s')).strftime('%Y%m%d%H%M%S')
+
+    rpm = rng.normal(3500, 20, rows)
+    rpm_fail = is_kind['rpm']
+    rpm[rpm_fail] = np.where(rng.random(rpm_fail.sum()) < 0.5, 0.0, rng.uniform(6600, 9000, rpm_fail.sum()))
+
+    index1 = np.abs(rng.normal(30, 6, rows))
+    index2 = np.abs(rng.normal(45, 10, rows))
+    index3 = np.abs(rng.normal(0.85, 0.03, rows))
+    noise = is_kind['noise']
+    # 超過 Index1 上限但低於線材異常門檻 (300)
+    index1[noise] = INDEX_LIMITS[0] * rng.uniform(1.02, 1.45, noise.sum())
+    cable = is_kind['cable']
+    index1[cable] = rng.uniform(310, 600, cable.sum())
+
+    barcode = np.char.add('TAA0412DDX01W2PA', np.char.zfill((serial_start + np.arange(rows)).astype(str), 10))
+    barcode[is_kind['no_barcode']] = ''
+    model = np.where(is_kind['pause'], PAUSE_MODEL_NAME, MODEL_NAME)
+
+    data = {
+        'Time': times,
+        'Barcode': barcode,
+        'Model_Name': model,
+        'Voltage': '12.00',
+        'Duty': '20.00',
+        'Total_Result': np.where(failed, 'NG', 'OK'),
+        'Section': 'Section1',
+        'Intelligent_Control': 'OK',
+        'dB(A)': rng.normal(57.5, 0.5, rows),
+        'RPM': rpm,
+        'index1': index1,
+        'index2': index2,
+        'index3': index3,
+        'Index1_Limit': INDEX_LIMITS[0],
+        'Index2_Limit': INDEX_LIMITS[1],
+        'Index3_Limit': INDEX_LIMITS[2],
+        'RPM_Low': RPM_LOW,
+        'RPM_Up': 1.0,
+        'Range_Up': '32',
+        'Range_Low': '48',
+    }
+    for pin in ('1P', '2P', '3P', '4P'):
+        data[pin] = 'TRUE'
+    # 升速過程各段轉速：由低於最終轉速逐段接近
+    ramp = rng.uniform(0, 60, rows)
+    for step in range(6):
+        data[f'RPM{step + 1}'] = rpm - ramp * (5 - step) / 5
+    data.update({
+        'Spectrum_Control': 'OK',
+        '1/n_Octave': '3rd Octave',
+        'Criteria_Path': '',
+        'Spectrum_OK?': 'OK',
+        'Overall_Noise?': np.where(noise | cable, 'NG', 'OK'),
+    })
+    for band, level in zip(LOG_HEADER[35:49], BAND_LEVELS):
+        data[band] = rng.normal(level, 1.5, rows)
+    data.update({
+        'LineName': 'ITDC-C07',
+        'BoxName': '1',
+        'MESResult': '0}N/A}',
+        'ProgramVersion': 'FanNoiseDetection-AMBU-VTEST8.vi',
+    })
+    return pd.DataFrame(data, columns=LOG_HEADER)
+
+
+def generate_logs(out_dir, date, lines=4, stations=8, rows=5000, failure_mix=None, seed=0):
+    """
+    於 out_dir 產生 lines * stations 個日誌檔 (每檔 rows 筆)，回傳 (檔案路徑清單, device_map)。
+    """
+    failure_mix = DEFAULT_FAILURE_MIX if failure_mix is None else failure_mix
+    os.makedirs(out_dir, exist_ok=True)
+
+    files = []
+    for line in range(1, lines + 1):
+        for station in range(1, stations + 1):
+            rng = np.random.default_rng([seed, line, station])
+            df = synthetic_frame(rows, date, failure_mix, rng, serial_start=(line * 1000 + station) * rows)
+            path = os.path.join(out_dir, f"{date}_{station_ip(line, station).replace('.', '_')}.txt")
+            df.to_csv(path, sep='\t', index=False, float_format='%.2f', lineterminator='\r\n', encoding='ascii')
+            files.append(path)
+    return files, build_device_map(lines, stations)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="產生與 test_log/ 相同格式的合成測試日誌")
+    parser.add_argument('--out', required=True, help="輸出資料夾")
+    parser.add_argument('--date', default='20260101', help="日誌日期 (YYYYMMDD)")
+    parser.add_argument('--lines', type=int, default=4, help="線別數")
+    parser.add_argument('--stations', type=int, default=8, help="每條線的站點數")
+    parser.add_argument('--rows', type=int, default=5000, help="每個站點的資料筆數")
+    parser.add_argument('--failure-mix', default='', help="異常比例，例如 noise=0.05,rpm=0.01")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_failure_mix(args.failure_mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    files, device_map = generate_logs(args.out, args.date, args.lines, args.stations, args.rows, mix, args.seed)
+    print(f"已產生 {len(files)} 個日誌檔 (每檔 {args.rows} 筆) 於 {args.out}")
+    # 可直接貼入 config.ini 的 [Device_Mapping]
+    print("[Device_Mapping]")
+    for ip_key, meta in device_map.items():
+        print(f"{ip_key.replace('_', '.')} = {meta['Line']},{meta['Station'].replace(' ', '_')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
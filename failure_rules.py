@@ -0,0 +1,118 @@
+"""
+失效模式規則引擎。
+
+每條規則以 dict 宣告 (失效模式名稱、規則類型、使用的統計欄位與門檻)，
+直接對整張站點統計表 (以 Line_Name, Device_ID 為索引) 做向量運算，
+「同線別其他站點平均值」以各線別總和扣除自身後除以 (站點數 - 1) 求得 (leave-one-out)，
+計算量與站點數成正比。門檻可由 config.ini 的 [Failure_Rules] 覆寫。
+
+規則類型:
+- line_consistent : 線別內所有站點的指標皆 > threshold 且最大差距 <= spread 時，記錄為 "{線別}-All"
+- station_above   : 站點指標 > threshold
+- peer_ratio      : 站點指標與同線別其他站點平均值的比較 (op 為 below: < 平均 * ratio；above: > 平均 * ratio)，
+                    線別只有一個站點時不判定；positive_peers 為 True 時其他站點平均需大於 0
+同一規則列出多個指標時，任一指標符合即判定異常。
+"""
+import copy
+import logging
+
+# 總表依此順序編號 (1 ~ 6)；key 為 config.ini 中門檻設定的名稱前綴
+FAILURE_RULES = [
+    # 載具異常：各站點因「轉速異常/其他異常拋料率」> 1% 且數值接近 (最大差距 <= 3%)
+    {'mode': 'Carrier Abnormal', 'key': 'Carrier', 'kind': 'line_consistent',
+     'metrics': ['rpm_rate', 'other_rate'], 'threshold': 0.01, 'spread': 0.03},
+    # 探針異常：各站點因「轉速異常/其他異常拋料率」> 2%
+    {'mode': 'Test Pin Abnormal', 'key': 'Test_Pin', 'kind': 'station_above',
+     'metrics': ['rpm_rate', 'other_rate'], 'threshold': 0.02},
+    # 麥克風位置變異：單台機之index值<同條線其他設備0.8倍
+    {'mode': 'Mic Position Variant', 'key': 'Mic_Position', 'kind': 'peer_ratio',
+     'metrics': ['idx1_mean', 'idx2_mean', 'idx3_mean'], 'op': 'below', 'ratio': 0.8},
+    # 線材異常：單台機之index值>300的次數超過10次 (300 為 Cable_Index_Limit，於站點統計時計數)
+    {'mode': 'Mic Cable Abnormal', 'key': 'Mic_Cable', 'kind': 'station_above',
+     'metrics': ['cable_fail_count'], 'threshold': 10},
+    # 隔音箱異常：單台機之dB值>同條線其他設備1.1倍
+    {'mode': 'Isolation Box Abnormal', 'key': 'Isolation_Box', 'kind': 'peer_ratio',
+     'metrics': ['dba_mean'], 'op': 'above', 'ratio': 1.1, 'positive_peers': True},
+    # 需確認音頻：單台機之index值>同條線其他設備1.3倍
+    {'mode': 'Need to Check Audio File', 'key': 'Audio_File', 'kind': 'peer_ratio',
+     'metrics': ['idx1_mean', 'idx2_mean', 'idx3_mean'], 'op': 'above', 'ratio': 1.3},
+]
+
+# 可由 config.ini 覆寫的規則參數
+RULE_PARAMS = ['threshold', 'spread', 'ratio']
+
+
+def load_failure_rules(config):
+    """
+    以 config.ini 的 [Failure_Rules] 覆寫規則門檻，例如 Carrier_Threshold、Carrier_Spread、Mic_Position_Ratio。
+    """
+    rules = copy.deepcopy(FAILURE_RULES)
+    for rule in rules:
+        for param in RULE_PARAMS:
+            if param not in rule:
+                continue
+            option = f"{rule['key']}_{param.title()}"
+            try:
+                rule[param] = config.getfloat('Failure_Rules', option, fallback=rule[param])
+            except ValueError:
+                logging.error(f"Config 中 [Failure_Rules] {option} 必須為數字，改用預設值 {rule[param]}")
+    return rules
+
+
+def leave_one_out_means(stats, metrics):
+    """
+    各站點「同線別其他站點」的平均值；線別只有一個站點時為 NaN。
+    """
+    grouped = stats[metrics].groupby(level='Line_Name', sort=False)
+    totals = grouped.transform('sum')
+    others = grouped.transform('count') - 1
+    return (totals - stats[metrics]).div(others.where(others > 0))
+
+
+def eval_line_consistent(stats, rule):
+    metrics = rule['metrics']
+    grouped = stats[metrics].groupby(level='Line_Name', sort=False)
+    low = grouped.min()
+    high = grouped.max()
+    hit = ((low > rule['threshold']) & (high - low <= rule['spread'])).any(axis=1)
+    return [(line, None) for line in hit.index[hit]]
+
+
+def eval_station_above(stats, rule):
+    hit = (stats[rule['metrics']] > rule['threshold']).any(axis=1)
+    return list(hit.index[hit])
+
+
+def eval_peer_ratio(stats, rule):
+    metrics = rule['metrics']
+    peers = leave_one_out_means(stats, metrics)
+    limit = peers * rule['ratio']
+    if rule['op'] == 'below':
+        hit = stats[metrics] < limit
+    else:
+        hit = stats[metrics] > limit
+    if rule.get('positive_peers'):
+        hit &= peers > 0
+    hit = hit.any(axis=1)
+    return list(hit.index[hit])
+
+
+RULE_EVALUATORS = {
+    'line_consistent': eval_line_consistent,
+    'station_above': eval_station_above,
+    'peer_ratio': eval_peer_ratio,
+}
+
+
+def evaluate_rules(station_stats, rules=None):
+    """
+    依規則判定站點統計表，回傳 {失效模式: [(Line_Name, Device_ID 或 None), ...]}，
+    發生位置依統計表的線別、站點順序排列。
+    """
+    rules = FAILURE_RULES if rules is None else rules
+    results = {}
+    for rule in rules:
+        evaluator = RULE_EVALUATORS[rule['kind']]
+        results[rule['mode']] = evaluator(station_stats, rule) if len(station_stats) else []
+    return results
+
@@ -0,0 +1,272 @@
+"""
+當日增量彙整 (Near-live dashboard)。
+
+測試機台整天以附加方式寫入日誌檔，本模組為每個檔案記錄已讀取的位元組位置 (checkpoint)，
+每次執行只解析新增的完整資料列 (未以換行結尾的最後一列留待下次)，
+並把新資料的站點統計累加至保存的統計表，因此每次更新的成本與新增列數成正比。
+
+輸出檔為 Live_Summary_{date}.xlsx (僅含 Summary_Dashboard)，隔天的完整報表仍由 run_aggregation 產生。
+"""
+import base64
+import io
+import json
+import logging
+import os
+import sys
+
+import pandas as pd
+
+from aggregator import (
+    CABLE_FAIL_INDEX, STAT_SUM_COLS, classify_results, compute_station_stats, default_target_date, find_log_files,
+    load_settings, merge_station_stats, write_summary_dashboard
+)
+from ingest import (
+    clean_log_columns, detect_encoding, read_log_bytes, resolve_config_path, station_meta, tag_log_frame
+)
+from report_writer import open_report_writer
+
+# 站點統計欄位變更時遞增，舊版狀態檔會重新彙整
+STATE_VERSION = 2
+
+
+def stats_to_records(stats):
+    """
+    將站點統計表的可合併欄位轉為 JSON 可儲存的列資料。
+    """
+    if stats is None or len(stats) == 0:
+        return []
+
+    records = []
+    for (line, station), row in stats.iterrows():
+        record = {'Line_Name': line, 'Device_ID': station}
+        for col in STAT_SUM_COLS + ['first_seen']:
+            value = row[col]
+            record[col] = value.item() if hasattr(value, 'item') else value
+        record['model_names'] = list(row['model_names'])
+        records.append(record)
+    return records
+
+
+def stats_from_records(records):
+    """
+    stats_to_records 的反向轉換；無資料時回傳 None。
+    """
+    if not records:
+        return None
+
+    stats = pd.DataFrame(records).set_index(['Line_Name', 'Device_ID'])
+    stats['model_names'] = [tuple(n) for n in stats['model_names']]
+    return stats
+
+
+def load_state(state_path, target_date):
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == STATE_VERSION and state.get('date') == target_date:
+                return state
+            logging.warning(f"增量狀態檔 {state_path} 版本或日期不符，將重新彙整")
+        except (OSError, ValueError) as e:
+            logging.warning(f"增量狀態檔 {state_path} 讀取失敗，將重新彙整: {e}")
+    return {'version': STATE_VERSION, 'date': target_date, 'files': {}}
+
+
+def save_state(state_path, state):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, state_path)
+
+
+def file_was_replaced(f, entry, size):
+    """
+    檔案變小或開頭的欄位標題與紀錄不同時，視為被截斷或換成新檔，需從頭重讀。
+    """
+    if size < entry['offset']:
+        return True
+    header = base64.b64decode(entry['header']) if entry.get('header') else b''
+    if header:
+        f.seek(0)
+        if f.read(len(header)) != header:
+            return True
+    return False
+
+
+def read_appended_rows(file_path, entry):
+    """
+    由 checkpoint 位置讀取新增的完整資料列，回傳 (DataFrame 或 None, 更新後的 entry)。
+    entry: offset (已處理位元組數)、rows (已處理列數)、encoding、
+    header / first_row (base64 的欄位標題列與第一筆資料列)。
+    傳入的 entry 不會被修改，呼叫端處理完新增資料後才以回傳的 entry 取代 checkpoint。
+    """
+    entry = dict(entry)
+    filename = os.path.basename(file_path)
+    size = os.path.getsize(file_path)
+
+    with open(file_path, 'rb') as f:
+        if entry['offset'] and file_was_replaced(f, entry, size):
+            logging.warning(f"檔案 {filename} 已被截斷或替換，重新讀取")
+            entry = new_file_entry()
+
+        f.seek(entry['offset'])
+        data = f.read(size - entry['offset'])
+
+    # 只處理以換行結尾的完整資料列 (CRLF 的 \r 由 read_csv 處理)
+    end = data.rfind(b'\n')
+    if end < 0:
+        return None, entry
+    data = data[:end + 1]
+
+    if entry['offset'] == 0:
+        header_end = data.find(b'\n') + 1
+        first_end = data.find(b'\n', header_end) + 1
+        if first_end == 0:
+            # 尚未有完整的第一筆資料，下次再讀
+            return None, entry
+        entry['header'] = base64.b64encode(data[:header_end]).decode('ascii')
+        entry['first_row'] = base64.b64encode(data[header_end:first_end]).decode('ascii')
+        entry['encoding'] = detect_encoding(data)
+        prefix = data[:header_end]
+        skip_first = False
+    else:
+        # read_csv 會依第一筆資料決定欄位數過多的列要略過或截斷，
+        # 因此每次都帶入原檔的第一筆資料一起解析後再移除，結果與完整讀取一致
+        prefix = base64.b64decode(entry['header']) + base64.b64decode(entry['first_row'])
+        skip_first = True
+
+    entry['offset'] += len(data)
+    body = data[len(prefix):] if not skip_first else data
+    if not body.strip():
+        return None, entry
+
+    raw = data if not skip_first else prefix + data
+    try:
+        df = pd.read_csv(io.BytesIO(raw), sep='\t', encoding=entry['encoding'], on_bad_lines='skip', index_col=False)
+    except UnicodeDecodeError:
+        df, entry['encoding'] = read_log_bytes(raw, filename)
+
+    if skip_first:
+        df = df.iloc[1:].reset_index(drop=True)
+
+    clean_log_columns(df, filename)
+    return df, entry
+
+
+def new_file_entry():
+    return {'offset': 0, 'rows': 0, 'encoding': None, 'header': None, 'first_row': None, 'stats': []}
+
+
+def update_file(file_path, entry, target_date, device_map, cable_index=CABLE_FAIL_INDEX):
+    """
+    將單一檔案新增的資料列累加進該檔的站點統計，回傳 (entry, 新增列數)。
+    """
+    filename = os.path.basename(file_path)
+    source = station_meta(filename, target_date, device_map)
+    if source is None:
+        return entry, 0
+    ip_key, meta = source
+
+    df, entry = read_appended_rows(file_path, entry)
+    if df is None or len(df) == 0:
+        return entry, 0
+
+    if 'Total_Result' not in df.columns:
+        logging.warning(f"跳過檔案 {filename}: 缺少 'Total_Result' 欄位")
+        return entry, 0
+
+    tag_log_frame(df, ip_key, meta, target_date)
+    classify_results(df)
+    new_stats = compute_station_stats(df, row_offset=entry['rows'], cable_index=cable_index)
+
+    merged = merge_station_stats([stats_from_records(entry['stats']), new_stats])
+    entry['stats'] = stats_to_records(merged)
+    entry['rows'] += len(df)
+    return entry, len(df)
+
+
+def combine_file_stats(files, state):
+    """
+    依檔名順序合併各檔統計表，first_seen 加上前面檔案的列數，與完整彙整時的列順序一致。
+    """
+    tables = []
+    rows_before = 0
+    for file_path in files:
+        entry = state['files'].get(os.path.basename(file_path))
+        if not entry:
+            continue
+        stats = stats_from_records(entry['stats'])
+        if stats is not None:
+            stats['first_seen'] += rows_before
+            tables.append(stats)
+        rows_before += entry['rows']
+    return merge_station_stats(tables)
+
+
+def run_incremental(target_date=None):
+    """
+    增量更新指定日期 (預設為今天) 的 Live_Summary 報表。
+    """
+    settings = load_settings()
+    if settings is None:
+        return
+
+    config = settings['config']
+    if target_date is None:
+        target_date = default_target_date(days_ago=0)
+
+    state_dir = resolve_config_path(
+        settings['base_dir'], config.get('Incremental', 'State_Folder', fallback='./incremental_state')
+    )
+    os.makedirs(state_dir, exist_ok=True)
+    state_path = os.path.join(state_dir, f"{target_date}.json")
+    state = load_state(state_path, target_date)
+
+    files = find_log_files(settings['source_dir'], target_date)
+    if not files:
+        logging.warning(f"在 {settings['source_dir']} 找不到日期 {target_date} 的日誌檔")
+        return
+
+    new_rows = 0
+    for file_path in files:
+        filename = os.path.basename(file_path)
+        entry = state['files'].get(filename, new_file_entry())
+        try:
+            # update_file 回傳新的 entry；處理失敗時 state 保留原本的 checkpoint，下次重新讀取這些資料列
+            entry, added = update_file(file_path, entry, target_date, settings['device_map'],
+                                         settings['cable_index'])
+        except Exception as e:
+            logging.error(f"增量讀取檔案 {filename} 發生錯誤: {e}")
+            continue
+        state['files'][filename] = entry
+        new_rows += added
+        if added:
+            logging.info(f"已增量處理檔案: {filename} (新增 {added} 筆, 累計 {entry['rows']} 筆)")
+
+    station_stats = combine_file_stats(files, state)
+    save_state(state_path, state)
+
+    if station_stats is None:
+        logging.warning("未找到有效資料，無法產出報表。")
+        return
+
+    output_file = os.path.join(settings['output_dir'], f"Live_Summary_{target_date}.xlsx")
+    tmp_file = os.path.join(settings['output_dir'], f"~Live_Summary_{target_date}.tmp.xlsx")
+    excel_engine = config.get('Output', 'Excel_Engine', fallback='openpyxl').strip()
+
+    with open_report_writer(tmp_file, excel_engine) as writer:
+        write_summary_dashboard(writer, station_stats, target_date, settings['failure_rules'])
+
+    try:
+        os.replace(tmp_file, output_file)
+    except PermissionError as e:
+        logging.error(f"無法覆寫 {output_file} (檔案可能已開啟): {e}")
+        return
+
+    logging.info(f"增量更新完畢 (新增 {new_rows} 筆)。輸出檔案為: {output_file}")
+    return station_stats
+
+
+if __name__ == "__main__":
+    # 可由排程每隔數分鐘執行一次，例如: python incremental.py 20260209
+    run_incremental(sys.argv[1] if len(sys.argv) > 1 else None)
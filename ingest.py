@@ -0,0 +1,362 @@
+"""
+日誌讀取的共用流程，Daily_Summary (run_aggregation)、串流/增量彙整、條碼索引與合併匯出 (merge_export) 共用。
+
+- 讀檔：編碼偵測、read_csv 或快速讀取 (tab_parser)、欄位清理，以及線別/站點標記 (parse_log_file)
+- 讀檔設定：[Schema] 型態與欄位、[Performance] Parser，以及對應的解析快取 ([Cache])
+- 平行讀取：依 [Performance] Parse_Workers 以程序池讀取，結果依檔名順序逐一回傳；
+  同時送出的檔案數有上限，呼叫端可邊讀邊寫出，不需保留全部檔案的解析結果
+
+本模組不匯入 aggregator；pandas 於實際讀檔時才載入。
+"""
+import codecs
+import hashlib
+import io
+import itertools
+import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from log_schema import SPECTRUM_COLUMNS, apply_log_schema, parse_columns_option, prune_columns, read_dtypes
+
+# 編碼偵測取樣長度 (位元組)
+ENCODING_SAMPLE_SIZE = 64 * 1024
+LOG_ENCODINGS = ['cp950', 'utf-8', 'utf-8-sig']
+
+# 日誌讀取方式 ([Performance] Parser)
+LOG_PARSERS = ['pandas', 'fast']
+
+# 解析邏輯變更時調整此版本號，使舊的解析快取失效
+PARSE_CACHE_VERSION = '1'
+
+# 平行讀取時每個程序預先送出的檔案數
+PREFETCH_PER_WORKER = 2
+
+
+def detect_encoding(raw, sample_size=ENCODING_SAMPLE_SIZE):
+    """
+    依檔案開頭樣本判斷日誌編碼：UTF-8 BOM、UTF-8 或 cp950。
+    純 ASCII 內容沿用原本預設的 cp950。
+    """
+    if raw.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+
+    sample = raw[:sample_size]
+    if sample.isascii():
+        return 'cp950'
+
+    try:
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # 樣本結尾可能剛好切在多位元組字元中間，視為合法 UTF-8
+        if e.reason == 'unexpected end of data' and len(raw) > len(sample):
+            return 'utf-8'
+    return 'cp950'
+
+
+def header_names(raw, encoding):
+    """
+    取出日誌標題列的原始欄位名稱。
+    """
+    end = raw.find(b'\n')
+    line = raw[:end if end >= 0 else len(raw)].decode(encoding, errors='replace')
+    return line.rstrip('\r').split('\t')
+
+
+def read_log_bytes(raw, filename, typed=False):
+    """
+    由記憶體中的檔案內容解析日誌，回傳 (DataFrame, 使用的編碼)。
+    若偵測結果在樣本以外的位置解碼失敗，改用其他編碼重新解析同一份內容，不再重讀檔案。
+    typed=True 時依 log_schema 直接指定各欄位型態，量測欄位含非數值內容時改為一般讀取後再轉換。
+    """
+    import pandas as pd
+
+    encoding = detect_encoding(raw)
+    candidates = [encoding] + [enc for enc in LOG_ENCODINGS if enc != encoding]
+
+    for enc in candidates:
+        try:
+            dtypes = read_dtypes(header_names(raw, enc)) if typed else None
+            try:
+                df = pd.read_csv(io.BytesIO(raw), sep='\t', encoding=enc, on_bad_lines='skip', index_col=False,
+                                 dtype=dtypes)
+            except ValueError as e:
+                if dtypes is None or isinstance(e, UnicodeDecodeError):
+                    raise
+                logging.warning(f"檔案 {filename} 含無法依型態解析的欄位值，改為一般讀取: {e}")
+                df = pd.read_csv(io.BytesIO(raw), sep='\t', encoding=enc, on_bad_lines='skip', index_col=False)
+            if enc != encoding:
+                logging.warning(f"檔案 {filename} 以 {encoding} 解碼失敗，改用 {enc} 編碼")
+            return df, enc
+        except UnicodeDecodeError:
+            continue
+
+    raise UnicodeDecodeError(encoding, raw[:1], 0, 1, f"無法以 {', '.join(candidates)} 解碼")
+
+
+def read_log_file(file_path, schema=None):
+    """
+    讀取並清理單一日誌檔 (去除欄位名稱空白、修正舊版錯字)，尚未加上線別/站點標記。
+    使用的編碼記錄於 df.attrs['encoding']，快速讀取時略過的資料列數記錄於 df.attrs['malformed_rows']。
+    schema 為 get_log_schema 的設定 (typed: 依 Schema 指定型態, columns: 只保留的欄位, parser: 讀取方式)。
+    """
+    filename = os.path.basename(file_path)
+    typed = bool(schema and schema['typed'])
+
+    df = None
+    if schema and schema['parser'] == 'fast':
+        from tab_parser import read_log_mmap
+
+        result = read_log_mmap(file_path, schema['columns'], typed)
+        if result is None:
+            logging.info(f"檔案 {filename} 不符合快速讀取的固定格式，改用 read_csv 讀取")
+        else:
+            df, encoding, skipped = result
+            if skipped:
+                logging.warning(f"檔案 {filename} 有 {skipped} 列欄位數多於標題，已略過")
+            df.attrs['malformed_rows'] = skipped
+
+    if df is None:
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        df, encoding = read_log_bytes(raw, filename, typed=typed)
+    clean_log_columns(df, filename)
+    if schema:
+        # 欄位於解析後才移除：read_csv 的 usecols 會改變欄位數過多的資料列的處理方式
+        df = prune_columns(df, schema['columns'])
+    if typed:
+        apply_log_schema(df)
+    df.attrs['encoding'] = encoding
+    return df
+
+
+def clean_log_columns(df, filename):
+    """
+    去除欄位名稱前後空白，並修正舊版軟體的欄位拼寫錯誤。
+    """
+    df.columns = df.columns.str.strip()
+
+    # 修正舊版軟體的欄位拼寫錯誤
+    if 'Toral_Result' in df.columns:
+        df.rename(columns={'Toral_Result':'Total_Result'}, inplace=True)
+        logging.info(f"已修正檔案 {filename} 中的錯字 'Toral_Result'")
+    return df
+
+
+def station_meta(filename, target_date, device_map):
+    """
+    由檔名 {date}_{ip}.txt 取得 (ip_key, 線別/站點對應)；檔名不符時回傳 None。
+    """
+    match = re.match(rf"{target_date}_(.+)\.txt", filename)
+    if not match:
+        return None
+
+    ip_key = match.group(1)
+    meta = device_map.get(ip_key, {'Line': 'Unknown_Line', 'Station': f'Unknown {ip_key}'})
+    return ip_key, meta
+
+
+def tag_log_frame(df, ip_key, meta, target_date):
+    """
+    加上線別、站點、來源 IP 與日期標記。
+    """
+    df['Line_Name'] = meta['Line']
+    df['Device_ID'] = meta['Station']
+    df['Source_IP'] = ip_key.replace('_', '.')
+    df['Log_Date'] = target_date
+    df['Total_Result'] = df['Total_Result'].astype(str)
+    return df
+
+
+def load_log_file(file_path, cache=None, schema=None):
+    """
+    讀取單一日誌檔 (尚未加上標記)，回傳 (DataFrame, 是否由快取載入)。
+    提供 cache (ParseCache) 時，來源檔未變動則直接載入快取，否則讀取後寫入快取。
+    """
+    df = cache.load(file_path) if cache else None
+    if df is not None:
+        return df, True
+
+    # 讀取前先取得來源檔狀態，讀取期間有變動時不寫入快取
+    key = cache.source_key(file_path) if cache else None
+    df = read_log_file(file_path, schema)
+    if cache:
+        cache.store(file_path, df, key)
+    return df, False
+
+
+def parse_log_file(file_path, target_date, device_map, cache=None, schema=None):
+    """
+    讀取單一機台日誌檔並加上線別/站點標記。
+    讀取失敗或格式不符時回傳 None，不影響其他檔案。
+    提供 cache (ParseCache) 時，來源檔未變動則直接載入快取。
+    """
+    filename = os.path.basename(file_path)
+    source = station_meta(filename, target_date, device_map)
+    if source is None:
+        return None
+    ip_key, meta = source
+
+    try:
+        df, from_cache = load_log_file(file_path, cache, schema)
+
+        if 'Total_Result' not in df.columns:
+            logging.warning(f"跳過檔案 {filename}: 缺少 'Total_Result' 欄位")
+            return None
+
+        encoding = df.attrs.get('encoding', 'unknown')
+        tag_log_frame(df, ip_key, meta, target_date)
+
+        source = "快取" if from_cache else f"編碼 {encoding}"
+        logging.info(f"已處理檔案: {filename} (共 {len(df)} 筆資料, {source})")
+        return df
+
+    except UnicodeDecodeError as e:
+        logging.error(f"檔案 {filename} 編碼無法辨識: {e}")
+
+    except Exception as e:
+        logging.error(f"讀取檔案 {filename} 發生未知錯誤: {e}")
+
+    return None
+
+
+def get_log_schema(config):
+    """
+    依 config.ini 的 [Schema] 區段取得讀檔設定；未啟用型態宣告且保留全部欄位時回傳 None (沿用原本讀法)。
+    回傳 dict: typed (是否依 log_schema 指定型態), columns (要保留的欄位清單，None 表示全部),
+    parser ([Performance] Parser: pandas 使用 read_csv, fast 使用 tab_parser 的快速讀取)。
+    啟用頻譜分析時，篩選欄位一律保留 Spectrum 分頁所需的頻帶與 RPM1 ~ RPM6 欄位。
+    """
+    from spectrum import get_spectrum_options
+
+    typed = config.getboolean('Schema', 'Typed', fallback=False)
+    columns = parse_columns_option(config.get('Schema', 'Columns', fallback='all'))
+    if columns is not None and get_spectrum_options(config)['enabled']:
+        columns += [c for c in SPECTRUM_COLUMNS if c not in columns]
+    parser = get_log_parser(config)
+    if not typed and columns is None and parser == 'pandas':
+        return None
+    return {'typed': typed, 'columns': columns, 'parser': parser}
+
+
+def get_log_parser(config):
+    """
+    由 config.ini 的 [Performance] Parser 取得日誌讀取方式 (LOG_PARSERS)。
+    """
+    parser = config.get('Performance', 'Parser', fallback='pandas').strip().lower()
+    if parser not in LOG_PARSERS:
+        logging.error(f"未知的 Parser 設定: {parser}，改用 pandas")
+        parser = 'pandas'
+    return parser
+
+
+def cache_version(schema):
+    """
+    解析快取版本號：讀檔設定不同時快取內容不同，需分開存放。
+    """
+    if schema is None:
+        return PARSE_CACHE_VERSION
+    tag = 't' if schema['typed'] else 'u'
+    if schema['parser'] == 'fast':
+        tag += 'f'
+    if schema['columns'] is not None:
+        tag += hashlib.sha1(','.join(schema['columns']).encode('utf-8')).hexdigest()[:8]
+    return f"{PARSE_CACHE_VERSION}{tag}"
+
+
+def open_parse_cache(config, base_dir, schema=None):
+    """
+    依 config.ini 的 [Cache] 區段建立解析快取；未啟用時回傳 None。
+    """
+    if not config.getboolean('Cache', 'Enabled', fallback=False):
+        return None
+
+    from parse_cache import ParseCache
+
+    folder = resolve_config_path(base_dir, config.get('Cache', 'Folder', fallback='./parse_cache'))
+    fmt = config.get('Cache', 'Format', fallback='parquet').strip().lower()
+    return ParseCache(folder, fmt, version=cache_version(schema))
+
+
+def resolve_config_path(base_dir, path):
+    """
+    config.ini 中以 ./ 或 .\\ 開頭的路徑視為相對於程式所在目錄。
+    """
+    if path.startswith('.\\') or path.startswith('./'):
+        return os.path.join(base_dir, path.replace('.\\', '').replace('./', ''))
+    return path
+
+
+def get_parse_workers(config, file_count):
+    """
+    由 config.ini 的 [Performance] Parse_Workers 取得平行讀取程序數。
+    未設定或 1 表示逐檔讀取；0 表示使用全部 CPU 核心。
+    """
+    try:
+        workers = config.getint('Performance', 'Parse_Workers', fallback=1)
+    except ValueError:
+        logging.error("Config 中 Parse_Workers 必須為整數，改為逐檔讀取")
+        return 1
+
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, file_count))
+
+
+def open_ingest(config, base_dir, file_count, schema=None, parse_workers=None):
+    """
+    回傳讀檔設定 dict: schema (get_log_schema 的結果), cache (ParseCache 或 None), workers (平行讀取程序數)。
+    parse_workers 可覆寫 config.ini 的 [Performance] Parse_Workers。
+    """
+    workers = get_parse_workers(config, file_count) if parse_workers is None else parse_workers
+    return {
+        'schema': schema,
+        'cache': open_parse_cache(config, base_dir, schema),
+        'workers': max(1, workers),
+    }
+
+
+def all_columns_schema(schema):
+    """
+    保留全部欄位的讀檔設定 (合併匯出使用)：沿用型態與 Parser，不套用 [Schema] Columns。
+    與預設讀法相同時回傳 None，與 Daily_Summary 共用同一份解析快取。
+    """
+    if schema is None or schema['columns'] is None:
+        return schema
+    if not schema['typed'] and schema['parser'] == 'pandas':
+        return None
+    return dict(schema, columns=None)
+
+
+def iter_parsed(func, files, args=(), workers=1):
+    """
+    依 files 的順序逐一回傳 func(file, *args)；workers > 1 時以程序池平行執行 (func 需可被 pickle)。
+    程序池異常終止時，尚未回傳的檔案改為逐檔讀取。
+    """
+    if workers <= 1 or len(files) <= 1:
+        for file_path in files:
+            yield func(file_path, *args)
+        return
+
+    logging.info(f"以 {workers} 個平行程序讀取 {len(files)} 個日誌檔")
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            remaining = iter(files)
+            pending = deque(
+                executor.submit(func, f, *args) for f in itertools.islice(remaining, workers * PREFETCH_PER_WORKER)
+            )
+            while pending:
+                result = pending.popleft().result()
+                next_file = next(remaining, None)
+                if next_file is not None:
+                    pending.append(executor.submit(func, next_file, *args))
+                done += 1
+                yield result
+    except BrokenProcessPool as e:
+        logging.error(f"平行讀取程序異常終止，改為逐檔讀取: {e}")
+        for file_path in files[done:]:
+            yield func(file_path, *args)
@@ -0,0 +1,138 @@
+"""
+測試機台日誌的欄位定義 (Schema)。
+
+與機台日誌相同的欄位清單 (LOG_COLUMNS)，另外為每個欄位宣告精簡的資料型態：
+量測值為 float32、重複率高的文字欄位為 category、Time 解析為日期時間，
+讀檔時直接指定 dtype，不再由 read_csv 逐欄推斷後再以 pd.to_numeric 轉換。
+"""
+
+# Time 欄位格式，例如 20260209075808
+LOG_TIME_FORMAT = '%Y%m%d%H%M%S'
+
+# 1/3 八音度頻帶 (日誌標題中為 500.0、630.0 ... 的格式)
+OCTAVE_BANDS = ['500', '630', '800', '1000', '1250', '1600', '2000', '2500',
+                '3150', '4000', '5000', '6300', '8000', '10000']
+
+# 升速過程各段轉速
+RPM_COLUMNS = ['RPM1', 'RPM2', 'RPM3', 'RPM4', 'RPM5', 'RPM6']
+
+# 日誌欄位的標準順序 (與機台日誌標題相同，頻帶欄位為 Schema 名稱；合併匯出依此對齊欄位)
+LOG_COLUMNS = [
+    'Time', 'Barcode', 'Model_Name', 'Voltage', 'Duty', 'Total_Result', 'Section', 'Intelligent_Control',
+    'dB(A)', 'RPM', 'index1', 'index2', 'index3', 'Index1_Limit', 'Index2_Limit', 'Index3_Limit',
+    'RPM_Low', 'RPM_Up', 'Range_Up', 'Range_Low', '1P', '2P', '3P', '4P',
+] + RPM_COLUMNS + [
+    'Spectrum_Control', '1/n_Octave', 'Criteria_Path', 'Spectrum_OK?', 'Overall_Noise?',
+] + OCTAVE_BANDS + ['LineName', 'BoxName', 'MESResult', 'ProgramVersion']
+
+FLOAT_COLUMNS = [
+    'Voltage', 'Duty', 'dB(A)', 'RPM', 'index1', 'index2', 'index3',
+    'Index1_Limit', 'Index2_Limit', 'Index3_Limit', 'RPM_Low', 'RPM_Up', 'Range_Up', 'Range_Low',
+] + RPM_COLUMNS + OCTAVE_BANDS
+
+CATEGORY_COLUMNS = [
+    'Model_Name', 'Total_Result', 'Section', 'Intelligent_Control', '1P', '2P', '3P', '4P',
+    'Spectrum_Control', '1/n_Octave', 'Criteria_Path', 'Spectrum_OK?', 'Overall_Noise?',
+    'LineName', 'BoxName', 'MESResult', 'ProgramVersion',
+    # 彙整時加上的標記欄位
+    'Line_Name', 'Device_ID', 'Source_IP', 'Log_Date'
+]
+
+# 欄位名稱 -> 型態 ('float32' / 'category' / 'datetime' / 'str')
+LOG_SCHEMA = {'Time': 'datetime', 'Barcode': 'str'}
+LOG_SCHEMA.update({c: 'float32' for c in FLOAT_COLUMNS})
+LOG_SCHEMA.update({c: 'category' for c in CATEGORY_COLUMNS})
+
+# 產生 Daily_Summary 儀表板所需的欄位 (Schema 設定 Columns = report 時只保留這些欄位)
+REPORT_COLUMNS = [
+    'Time', 'Barcode', 'Model_Name', 'Total_Result', 'Intelligent_Control', 'dB(A)', 'RPM',
+    'index1', 'index2', 'index3', 'Index1_Limit', 'Index2_Limit', 'Index3_Limit', 'RPM_Low', 'RPM_Up'
+]
+
+# Spectrum 分頁所需的欄位 (啟用頻譜分析時一律保留)
+SPECTRUM_COLUMNS = RPM_COLUMNS + OCTAVE_BANDS
+
+# 彙整時一律保留的標記欄位
+TAG_COLUMNS = ['Line_Name', 'Device_ID', 'Source_IP', 'Log_Date']
+
+
+def canonical_column(name):
+    """
+    將日誌標題中的欄位名稱對應到 Schema 名稱：去除空白、500.0 -> 500、修正舊版錯字 Toral_Result。
+    """
+    name = str(name).strip()
+    if name.endswith('.0') and name[:-2].isdigit():
+        return name[:-2]
+    if name == 'Toral_Result':
+        return 'Total_Result'
+    return name
+
+
+def parse_columns_option(value):
+    """
+    解析 config.ini 的 [Schema] Columns：all (全部欄位) / report (儀表板所需欄位) / 以逗號分隔的欄位清單。
+    回傳要保留的欄位清單，全部保留時回傳 None；自訂清單一律補上儀表板所需欄位。
+    """
+    value = (value or 'all').strip()
+    if value.lower() == 'all':
+        return None
+    if value.lower() == 'report':
+        return list(REPORT_COLUMNS)
+
+    columns = [canonical_column(c) for c in value.split(',') if c.strip()]
+    return columns + [c for c in REPORT_COLUMNS if c not in columns]
+
+
+def read_dtypes(header_names):
+    """
+    依日誌標題列建立 read_csv 的 dtype 參數 (鍵為標題中的原始欄位名稱)。
+    Time 先以字串讀入，由 apply_log_schema 依固定格式解析。
+    """
+    dtypes = {}
+    for name in header_names:
+        kind = LOG_SCHEMA.get(canonical_column(name))
+        if kind in ('float32', 'category'):
+            dtypes[name] = kind
+        elif kind in ('datetime', 'str'):
+            dtypes[name] = str
+    return dtypes
+
+
+def prune_columns(df, columns):
+    """
+    只保留 columns 中的欄位與標記欄位 (df 欄位名稱需已清理)；columns 為 None 時不變動。
+    """
+    if columns is None:
+        return df
+    wanted = set(columns) | set(TAG_COLUMNS)
+    keep = [c for c in df.columns if canonical_column(c) in wanted]
+    if len(keep) == len(df.columns):
+        return df
+    pruned = df[keep].copy()
+    pruned.attrs.update(df.attrs)
+    return pruned
+
+
+def apply_log_schema(df):
+    """
+    將欄位轉為 Schema 宣告的型態 (直接寫回 df)；已是目標型態的欄位不重複轉換。
+    無法轉換的量測值與時間視為缺值，與 classify_results 的 errors='coerce' 一致。
+    """
+    import pandas as pd
+
+    for col in df.columns:
+        kind = LOG_SCHEMA.get(canonical_column(col))
+        series = df[col]
+        if kind == 'float32':
+            if series.dtype != 'float32':
+                df[col] = pd.to_numeric(series, errors='coerce').astype('float32')
+        elif kind == 'category':
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                df[col] = series.astype('category')
+        elif kind == 'datetime':
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                if pd.api.types.is_float_dtype(series):
+                    # 含缺值的時間欄位會被推斷為浮點數，先轉回整數避免字串帶有 .0
+                    series = series.astype('Int64')
+                df[col] = pd.to_datetime(series.astype(str), format=LOG_TIME_FORMAT, errors='coerce')
+    return df
@@ -0,0 +1,177 @@
+"""
+合併匯出：將來源資料夾中的日誌檔依檔名順序合併為單一 CSV 或 Parquet 檔 (取代舊版 AllinOne 腳本)。
+
+與 Daily_Summary 共用 ingest 的讀檔流程 (編碼偵測、[Performance] Parser 與 Parse_Workers、[Cache] 解析快取)，
+各檔讀取後直接附加寫出，不保留整份合併資料。欄位依 log_schema.LOG_COLUMNS 對齊
+(日誌標題中 500.0 等頻帶欄位對應為 500)，前面加上 Source_File 與 Log_Date；CSV 中缺值輸出為空白。
+
+    python merge_export.py                                      (Source_Folder 中所有日誌檔)
+    python merge_export.py --from 20260201 --to 20260228 --format parquet
+    python merge_export.py D:\\logs --output merged.csv
+"""
+import argparse
+import glob
+import logging
+import multiprocessing
+import os
+import re
+import sys
+
+import pandas as pd
+
+from aggregator import date_range, default_target_date, load_settings, valid_date
+from ingest import all_columns_schema, get_log_schema, iter_parsed, load_log_file, open_ingest
+from log_schema import FLOAT_COLUMNS, LOG_COLUMNS, LOG_TIME_FORMAT, canonical_column
+from raw_output import SpillFile
+
+MERGE_FORMATS = ['csv', 'parquet']
+MERGE_TAG_COLUMNS = ['Source_File', 'Log_Date']
+DEFAULT_MERGE_NAME = 'Merged_Noise_Test_Log'
+
+
+def merge_kinds():
+    """
+    Parquet 各欄型態：量測值為 float64，其餘 (含 Time) 為文字，各檔型態一致。
+    """
+    kinds = {col: 'string' for col in MERGE_TAG_COLUMNS + LOG_COLUMNS}
+    kinds.update({col: 'float64' for col in FLOAT_COLUMNS})
+    return kinds
+
+
+def file_log_date(filename):
+    match = re.search(r'(\d{8})', filename)
+    return match.group(1) if match else 'Unknown'
+
+
+def find_merge_files(folder, dates=None):
+    """
+    回傳 folder 中的日誌檔 (依檔名排序)；指定 dates 時只保留檔名日期在其中的檔案。
+    """
+    files = sorted(glob.glob(os.path.join(folder, '*.txt')))
+    if dates is not None:
+        dates = set(dates)
+        files = [f for f in files if file_log_date(os.path.basename(f)) in dates]
+    return files
+
+
+def read_merge_frame(file_path, cache=None, schema=None):
+    """
+    讀取單一日誌檔並對齊為合併匯出的欄位；讀取失敗時回傳 None。可於平行讀取的子程序中執行。
+    """
+    filename = os.path.basename(file_path)
+    try:
+        df, from_cache = load_log_file(file_path, cache, schema)
+    except UnicodeDecodeError as e:
+        logging.error(f"檔案 {filename} 編碼無法辨識: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"讀取檔案 {filename} 發生未知錯誤: {e}")
+        return None
+
+    df = df.rename(columns=canonical_column)
+    df = df.loc[:, ~df.columns.duplicated()]
+    frame = df.reindex(columns=LOG_COLUMNS)
+    if pd.api.types.is_datetime64_any_dtype(frame['Time']):
+        # Typed 讀取時 Time 已解析為日期時間，轉回日誌的格式
+        frame['Time'] = frame['Time'].dt.strftime(LOG_TIME_FORMAT)
+    frame.insert(0, 'Source_File', filename)
+    frame.insert(1, 'Log_Date', file_log_date(filename))
+
+    source = "快取" if from_cache else f"編碼 {df.attrs.get('encoding', 'unknown')}"
+    logging.info(f"已讀取檔案: {filename} (共 {len(frame)} 筆資料, {source})")
+    return frame
+
+
+def merge_logs(files, output_path, ingest, fmt='csv'):
+    """
+    依檔名順序讀取 files 並逐檔附加寫出至 output_path，回傳 (合併的檔案數, 資料筆數)。
+    ingest 為 open_ingest 的讀檔設定；寫出失敗時不留下寫到一半的檔案。
+    """
+    spill = SpillFile(output_path, fmt, kinds=merge_kinds() if fmt == 'parquet' else None)
+    merged = 0
+    try:
+        frames = iter_parsed(read_merge_frame, files, (ingest['cache'], ingest['schema']), ingest['workers'])
+        for frame in frames:
+            if frame is None:
+                continue
+            spill.append(frame)
+            merged += 1
+    except BaseException:
+        spill.abort()
+        raise
+    spill.close()
+    return merged, spill.rows
+
+
+def resolve_format(fmt, output_path=None):
+    """
+    決定輸出格式：未指定時依輸出檔副檔名判斷，Parquet 需安裝 pyarrow (未安裝時改用 csv)。
+    """
+    if fmt is None:
+        fmt = 'parquet' if output_path and output_path.lower().endswith('.parquet') else 'csv'
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logging.warning("未安裝 pyarrow，合併檔改存為 csv")
+            fmt = 'csv'
+    return fmt
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="將日誌檔依檔名順序合併為單一 CSV 或 Parquet 檔")
+    parser.add_argument('folder', nargs='?', help="日誌資料夾 (預設為 config.ini 的 Source_Folder)")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--date', type=valid_date, help="只合併單一日期 (YYYYMMDD)")
+    target.add_argument('--from', dest='date_from', type=valid_date, metavar='YYYYMMDD',
+                        help="日期區間起始日 (未指定 --to 時合併至昨天)")
+    parser.add_argument('--to', dest='date_to', type=valid_date, metavar='YYYYMMDD', help="日期區間結束日 (含)")
+    parser.add_argument('--format', choices=MERGE_FORMATS, help="輸出格式 (預設依 --output 副檔名，否則為 csv)")
+    parser.add_argument('--output', help=f"輸出檔路徑 (預設為 Output_Folder 中的 {DEFAULT_MERGE_NAME}.csv)")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="平行讀取的程序數 (預設依 config.ini 的 [Performance] Parse_Workers)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.date_to and not args.date_from:
+        parser.error("--to 需搭配 --from 使用")
+
+    settings = load_settings()
+    if settings is None:
+        return 1
+    config = settings['config']
+
+    folder = args.folder or settings['source_dir']
+    if args.date:
+        dates = [args.date]
+    elif args.date_from:
+        dates = date_range(args.date_from, args.date_to or default_target_date())
+    else:
+        dates = None
+
+    files = find_merge_files(folder, dates)
+    if not files:
+        logging.error(f"在 {folder} 找不到可合併的日誌檔")
+        return 1
+
+    fmt = resolve_format(args.format, args.output)
+    output_path = args.output or os.path.join(settings['output_dir'], f"{DEFAULT_MERGE_NAME}.{fmt}")
+
+    ingest = open_ingest(config, settings['base_dir'], len(files), all_columns_schema(get_log_schema(config)),
+                         args.jobs)
+    merged, rows = merge_logs(files, output_path, ingest, fmt)
+    if not merged:
+        logging.warning("沒有可合併的資料，未產出合併檔")
+        return 1
+
+    logging.info(f"合併完成: {merged}/{len(files)} 個檔案, 共 {rows} 筆資料。輸出檔案為: {os.path.abspath(output_path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    # 打包成執行檔時，子程序需透過 freeze_support 啟動
+    multiprocessing.freeze_support()
+    sys.exit(main())
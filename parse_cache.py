@@ -0,0 +1,113 @@
+"""
+已解析日誌檔的欄式快取 (Parquet，未安裝 pyarrow 時改用 pickle)。
+
+快取檔以「來源檔絕對路徑 + 檔案大小 + 修改時間」為鍵，
+來源檔未變動時直接載入快取，避免重新解析整份 tab 分隔文字檔。
+"""
+import glob
+import hashlib
+import logging
+import os
+
+import pandas as pd
+
+CACHE_FORMATS = {'parquet': '.parquet', 'pickle': '.pkl'}
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ParseCache:
+    """
+    以來源檔路徑、大小與 mtime 為鍵的單檔快取。
+    物件本身可被 pickle，可直接傳給平行讀取的子程序使用。
+    """
+
+    def __init__(self, folder, fmt='parquet', version='1'):
+        if fmt not in CACHE_FORMATS:
+            logging.error(f"未知的快取格式: {fmt}，改用 parquet")
+            fmt = 'parquet'
+        if fmt == 'parquet' and not parquet_available():
+            logging.warning("未安裝 pyarrow，解析快取改用 pickle 格式")
+            fmt = 'pickle'
+
+        self.folder = folder
+        self.fmt = fmt
+        self.version = version
+        os.makedirs(folder, exist_ok=True)
+
+    def _prefix(self, file_path):
+        key = os.path.normcase(os.path.abspath(file_path))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+    @staticmethod
+    def source_key(file_path):
+        """
+        來源檔目前的 (大小, 修改時間)。
+        """
+        st = os.stat(file_path)
+        return st.st_size, st.st_mtime_ns
+
+    def cache_path(self, file_path, key=None):
+        """
+        回傳來源檔狀態 key (預設為目前狀態) 對應的快取檔路徑。
+        """
+        size, mtime_ns = key or self.source_key(file_path)
+        name = f"{self._prefix(file_path)}_v{self.version}_{size}_{mtime_ns}{CACHE_FORMATS[self.fmt]}"
+        return os.path.join(self.folder, name)
+
+    def load(self, file_path):
+        """
+        來源檔未變動時回傳快取的 DataFrame，否則回傳 None。
+        """
+        path = self.cache_path(file_path)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            if self.fmt == 'parquet':
+                return pd.read_parquet(path)
+            return pd.read_pickle(path)
+        except Exception as e:
+            logging.warning(f"快取檔 {os.path.basename(path)} 讀取失敗，將重新解析: {e}")
+            return None
+
+    def store(self, file_path, df, key=None):
+        """
+        寫入快取並刪除同一來源檔的舊快取；寫入失敗只記錄警告，不影響報表。
+        key 為讀取前取得的 source_key：讀取期間來源檔有變動 (例如機台仍在寫入) 時，
+        讀到的資料可能不完整，不寫入快取，下次重新解析。
+        """
+        try:
+            current = self.source_key(file_path)
+        except OSError:
+            return
+        if key is not None and key != current:
+            logging.info(f"{os.path.basename(file_path)} 於讀取期間有變動，不寫入解析快取")
+            return
+        path = self.cache_path(file_path, current)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+
+        try:
+            if self.fmt == 'parquet':
+                df.to_parquet(tmp_path, index=False)
+            else:
+                df.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.warning(f"無法寫入 {os.path.basename(file_path)} 的解析快取: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        for old in glob.glob(os.path.join(self.folder, f"{self._prefix(file_path)}_*")):
+            if old != path and not old.endswith('.tmp'):
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
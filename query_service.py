@@ -0,0 +1,453 @@
+"""
+本機查詢服務：以 HTTP/JSON 提供各線別/站點指標與失效模式，不需開啟 Daily_Summary 報表。
+
+與 Daily_Summary 共用彙整流程 (讀檔設定、解析快取、分類、[Retest] Count、失效模式規則)。
+各日期的彙整結果保存於記憶體中的 LRU 快取 ([Service] Cache_Dates)，以該日日誌檔的大小與修改時間判斷是否過期，
+日誌有變動時下次查詢自動重新彙整。多個請求同時查詢同一日期時只彙整一次，其餘請求等待並共用結果。
+Excel 報表改為依需求產生：報表不存在或已過期時才執行 run_aggregation。
+
+    python query_service.py [--host 127.0.0.1] [--port 8765]
+
+    GET /api/dates                                       來源資料夾中的日誌日期
+    GET /api/summary?date=YYYYMMDD[&line=C13]            各線別/站點指標與失效模式
+    GET /api/summary?from=YYYYMMDD&to=YYYYMMDD           日期區間 (每個日期各自快取)
+    GET /api/failures?date=YYYYMMDD                      只回傳失效模式
+    GET /api/export?date=YYYYMMDD                        下載 Daily_Summary 報表 (需要時才產生)
+    GET /api/status                                      快取狀態
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from aggregator import (
+    FAILURE_MODES, STAT_FLAG_COLS, STAT_MEAN_COLS, daily_summary_path, date_range, detect_failure_modes,
+    find_log_dates, find_log_files, format_location, is_summary_up_to_date, line_model_names, load_settings,
+    run_aggregation, valid_date
+)
+
+DEFAULT_SERVICE_OPTIONS = {
+    'host': '127.0.0.1',
+    'port': 8765,
+    'cache_dates': 32,
+    'max_range_days': 31,
+}
+
+# 比率指標: (JSON 欄位, 統計欄位)，與 Summary_Dashboard 的 Group 1 相同
+RATE_FIELDS = [
+    ('fail_rate', 'is_fail'),
+    ('noise_rate', 'calc_noise'),
+    ('rpm_fail_rate', 'calc_rpm_ng'),
+    ('other_fail_rate', 'calc_others'),
+]
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def get_service_options(config):
+    """
+    由 config.ini 的 [Service] 區段取得查詢服務設定。
+    """
+    options = dict(DEFAULT_SERVICE_OPTIONS)
+    options['host'] = config.get('Service', 'Host', fallback=options['host']).strip()
+    for key, name in (('port', 'Port'), ('cache_dates', 'Cache_Dates'), ('max_range_days', 'Max_Range_Days')):
+        try:
+            options[key] = max(1, config.getint('Service', name, fallback=options[key]))
+        except ValueError:
+            logging.error(f"Config 中 [Service] {name} 必須為整數，改用預設值 {options[key]}")
+    return options
+
+
+def source_fingerprint(files):
+    """
+    日誌檔的 (檔名, 大小, 修改時間)；任一檔案新增、刪除或變動時結果不同。
+    """
+    fingerprint = []
+    for file_path in files:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            continue
+        fingerprint.append((os.path.basename(file_path), st.st_size, st.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+class SummaryCache:
+    """
+    各日期彙整結果的 LRU 快取 (執行緒安全)。每個項目記錄來源日誌的 fingerprint，不符時視為過期。
+    """
+
+    def __init__(self, max_dates):
+        self.max_dates = max_dates
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._date_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, date, fingerprint):
+        with self._lock:
+            entry = self._entries.get(date)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(date)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, date, fingerprint, summary):
+        with self._lock:
+            self._entries[date] = (fingerprint, summary)
+            self._entries.move_to_end(date)
+            while len(self._entries) > self.max_dates:
+                evicted, _ = self._entries.popitem(last=False)
+                logging.info(f"查詢快取已滿，移除日期 {evicted}")
+
+    def date_lock(self, date):
+        """
+        同一日期的彙整與報表產生共用一把鎖，同時查詢時只執行一次。
+        """
+        with self._lock:
+            return self._date_locks.setdefault(date, threading.Lock())
+
+    def status(self):
+        with self._lock:
+            return {
+                'dates': list(self._entries),
+                'max_dates': self.max_dates,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+def compute_station_table(settings, target_date, files):
+    """
+    依 Daily_Summary 的流程計算單日各站點統計表 (不寫出報表)；無有效資料時回傳 None。
+    [Performance] Streaming = true 時分批累加，不合併整日資料。
+    """
+    from aggregator import classify_results, compute_station_stats, get_chunk_rows, resolve_retests
+    from ingest import get_log_schema, iter_parsed, open_ingest, parse_log_file
+    from retest import get_retest_options
+
+    config = settings['config']
+    schema = get_log_schema(config)
+    retest_options = get_retest_options(config)
+
+    if config.getboolean('Performance', 'Streaming', fallback=False):
+        from streaming import plan_log_files, stream_log_files
+
+        if retest_options['enabled'] and retest_options['count'] != 'all':
+            logging.warning(f"串流模式不支援 [Retest] Count = {retest_options['count']}，站點統計包含全部資料列")
+
+        plans, raw_columns = plan_log_files(files, target_date, settings['device_map'], schema)
+        if not plans:
+            return None
+        station_stats, _, _ = stream_log_files(plans, raw_columns, target_date, schema, get_chunk_rows(config),
+                                               cable_index=settings['cable_index'])
+        return station_stats
+
+    import pandas as pd
+
+    from log_schema import apply_log_schema
+
+    ingest = open_ingest(config, settings['base_dir'], len(files), schema)
+    args = (target_date, settings['device_map'], ingest['cache'], schema)
+    frames = [df for df in iter_parsed(parse_log_file, files, args, ingest['workers']) if df is not None]
+    if not frames:
+        return None
+    df = pd.concat(frames, ignore_index=True)
+    del frames
+    if schema and schema['typed']:
+        apply_log_schema(df)
+
+    classify_results(df)
+    if retest_options['enabled']:
+        df, _ = resolve_retests(df, retest_options['count'])
+    return compute_station_stats(df, cable_index=settings['cable_index'])
+
+
+def metric_values(rows):
+    """
+    將站點統計表的一列或多列 (同線別) 合計為 JSON 指標：筆數、比率、各判定筆數與量測平均值。
+    """
+    total = int(rows['total'].sum())
+    values = {'total': total, 'fail_count': int(rows['is_fail'].sum())}
+    for name, col in RATE_FIELDS:
+        values[name] = float(rows[col].sum() / total) if total else 0.0
+    values['counts'] = {col: int(rows[col].sum()) for col in STAT_FLAG_COLS}
+    values['means'] = {
+        metric: float(rows[sum_col].sum() / total) if total else 0.0 for metric, sum_col in STAT_MEAN_COLS.items()
+    }
+    values['cable_fail_count'] = int(rows['cable_fail_count'].sum())
+    return values
+
+
+def summarize_date(target_date, station_stats, rules=None):
+    """
+    單日的 JSON 結果：各線別 (含各站點) 指標與失效模式。
+    """
+    detected = detect_failure_modes(station_stats, rules)
+    lines = []
+    for line in station_stats.index.unique(level='Line_Name'):
+        line_stats = station_stats.loc[line]
+        stations = []
+        for station in line_stats.index:
+            st = line_stats.loc[[station]]
+            stations.append(dict(
+                {'station': station, 'location': format_location(line, station)},
+                **metric_values(st), model_names=list(st['model_names'].iloc[0])
+            ))
+        lines.append(dict(
+            {'line': line, 'location': format_location(line)},
+            **metric_values(line_stats), model_names=line_model_names(line_stats), stations=stations
+        ))
+
+    failures = [
+        {'no': no, 'mode': mode, 'locations': detected.get(mode, [])}
+        for no, mode in enumerate(FAILURE_MODES, 1)
+    ]
+    return {'date': target_date, 'lines': lines, 'failure_modes': failures}
+
+
+def filter_lines(summary, line):
+    """
+    只保留指定線別 (可用 Line_13 或 C13)；失效模式只保留該線別的發生位置。
+    """
+    code = format_location(line)
+    lines = [entry for entry in summary['lines'] if entry['location'] == code]
+    failures = [
+        dict(mode, locations=[loc for loc in mode['locations'] if loc.startswith(f"{code}-")])
+        for mode in summary['failure_modes']
+    ]
+    return dict(summary, lines=lines, failure_modes=failures)
+
+
+class QueryService:
+    """
+    查詢服務的處理邏輯 (與 HTTP 無關)，各方法可由多個執行緒同時呼叫。
+    """
+
+    def __init__(self, settings, options=None):
+        self.settings = settings
+        self.options = dict(DEFAULT_SERVICE_OPTIONS, **(options or {}))
+        self.cache = SummaryCache(self.options['cache_dates'])
+        # 產生報表會寫入共用的趨勢/條碼索引/基準線資料庫並使用全域的 tracemalloc，一次只執行一個
+        self._export_lock = threading.Lock()
+
+    def date_summary(self, target_date):
+        """
+        回傳單日的彙整結果 (快取未過期時直接回傳)；該日沒有日誌或沒有有效資料時回傳 None。
+        """
+        files = find_log_files(self.settings['source_dir'], target_date)
+        if not files:
+            return None
+        fingerprint = source_fingerprint(files)
+        summary = self.cache.get(target_date, fingerprint)
+        if summary is not None:
+            return summary
+
+        with self.cache.date_lock(target_date):
+            # 等待期間其他請求可能已完成同一日期的彙整
+            fingerprint = source_fingerprint(files)
+            summary = self.cache.get(target_date, fingerprint)
+            if summary is not None:
+                return summary
+
+            logging.info(f"查詢服務: 彙整日期 {target_date}")
+            station_stats = compute_station_table(self.settings, target_date, files)
+            if station_stats is None:
+                return None
+            summary = summarize_date(target_date, station_stats, self.settings['failure_rules'])
+            summary['files'] = len(files)
+            self.cache.put(target_date, fingerprint, summary)
+            return summary
+
+    def summaries(self, dates, line=None):
+        results = []
+        missing = []
+        for target_date in dates:
+            summary = self.date_summary(target_date)
+            if summary is None:
+                missing.append(target_date)
+                continue
+            results.append(filter_lines(summary, line) if line else summary)
+        return {'dates': results, 'missing': missing}
+
+    def export(self, target_date):
+        """
+        回傳 Daily_Summary 報表路徑，不存在或已過期時先產生；該日沒有日誌或產生失敗時回傳 None。
+        多個匯出請求依序執行 (不論日期)。
+        """
+        settings = self.settings
+        files = find_log_files(settings['source_dir'], target_date)
+        if not files:
+            return None
+        with self._export_lock:
+            if is_summary_up_to_date(settings, target_date, files):
+                return daily_summary_path(settings['output_dir'], target_date)
+            logging.info(f"查詢服務: 產生日期 {target_date} 的報表")
+            return run_aggregation(target_date, settings=settings)
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def query_dates(params, max_days):
+    """
+    由查詢參數 date 或 from/to 取得日期清單。
+    """
+    def value(name):
+        values = params.get(name)
+        if not values:
+            return None
+        try:
+            return valid_date(values[0])
+        except argparse.ArgumentTypeError as e:
+            raise ServiceError(400, str(e))
+
+    date, date_from, date_to = value('date'), value('from'), value('to')
+    if date:
+        return [date]
+    if not date_from:
+        raise ServiceError(400, "需指定 date 或 from/to 參數")
+    dates = date_range(date_from, date_to or date_from)
+    if not dates:
+        raise ServiceError(400, "from 不可晚於 to")
+    if len(dates) > max_days:
+        raise ServiceError(400, f"日期區間最多 {max_days} 天 ([Service] Max_Range_Days)")
+    return dates
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        routes = {
+            '/api/dates': self.handle_dates,
+            '/api/summary': self.handle_summary,
+            '/api/failures': self.handle_failures,
+            '/api/export': self.handle_export,
+            '/api/status': self.handle_status,
+        }
+        handler = routes.get(url.path.rstrip('/'))
+        try:
+            if handler is None:
+                raise ServiceError(404, f"未知的路徑: {url.path}")
+            handler(params)
+        except ServiceError as e:
+            self.send_json({'error': str(e)}, e.status)
+        except Exception as e:
+            logging.exception(f"查詢服務處理 {self.path} 失敗")
+            self.send_json({'error': str(e)}, 500)
+
+    def handle_dates(self, params):
+        self.send_json({'dates': find_log_dates(self.service.settings['source_dir'])})
+
+    def handle_summary(self, params):
+        dates = query_dates(params, self.service.options['max_range_days'])
+        line = params.get('line', [None])[0]
+        self.send_json(self.service.summaries(dates, line))
+
+    def handle_failures(self, params):
+        dates = query_dates(params, self.service.options['max_range_days'])
+        line = params.get('line', [None])[0]
+        result = self.service.summaries(dates, line)
+        result['dates'] = [
+            {'date': s['date'], 'failure_modes': s['failure_modes']} for s in result['dates']
+        ]
+        self.send_json(result)
+
+    def handle_export(self, params):
+        dates = query_dates(params, 1)
+        output_file = self.service.export(dates[0])
+        if output_file is None or not os.path.exists(output_file):
+            raise ServiceError(404, f"無法產生日期 {dates[0]} 的報表 (沒有日誌或沒有有效資料)")
+        with open(output_file, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', XLSX_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Content-Disposition', f'attachment; filename="{os.path.basename(output_file)}"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_status(self, params):
+        self.send_json({'cache': self.service.cache.status()})
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.info(f"查詢服務 {self.address_string()} {format % args}")
+
+
+def create_server(service, host, port):
+    """
+    建立多執行緒 HTTP 伺服器 (每個請求一個執行緒)。
+    """
+    handler = type('BoundQueryHandler', (QueryHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def run_service(settings=None, host=None, port=None):
+    """
+    啟動查詢服務直到 Ctrl+C。
+    """
+    if settings is None:
+        settings = load_settings()
+    if settings is None:
+        return 1
+
+    options = get_service_options(settings['config'])
+    host = host or options['host']
+    port = port or options['port']
+    try:
+        server = create_server(QueryService(settings, options), host, port)
+    except OSError as e:
+        logging.error(f"無法啟動查詢服務 {host}:{port}: {e}")
+        return 1
+
+    logging.info(f"查詢服務已啟動: http://{host}:{port}/api/summary?date=YYYYMMDD (Ctrl+C 結束)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("已停止查詢服務")
+    finally:
+        server.server_close()
+    return 0
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="本機查詢服務：以 HTTP/JSON 提供各線別/站點指標、失效模式與報表下載")
+    parser.add_argument('--host', help="監聽位址 (預設依 config.ini 的 [Service] Host)")
+    parser.add_argument('--port', type=int, help="監聽埠號 (預設依 config.ini 的 [Service] Port)")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    return run_service(host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    # 打包成執行檔時，子程序需透過 freeze_support 啟動
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Daily_Summary 原始資料輸出模式 (config.ini 的 [Output] Raw_Data)。
+
+- sheet   : 預設，原始資料寫入以日期命名的分頁；超過 Excel 列數上限時自動接續至下一個分頁。
+- sharded : 依 Shard_Rows 拆成多個分頁 ({date}、{date}_2、{date}_3 ...)。
+- csv     : 另存為報表旁的 gzip 壓縮 CSV，報表只保留儀表板與連結分頁。
+- parquet : 另存為報表旁的 Parquet 檔 (需安裝 pyarrow，未安裝時改用 csv)。
+- none    : 不輸出原始資料。
+
+一般模式一次寫入整日資料，串流模式逐批呼叫 append，兩者輸出相同。
+"""
+import gzip
+import logging
+import os
+
+import pandas as pd
+
+from report_writer import RAW_STYLES, SheetLayout, widen_float32
+
+RAW_DATA_MODES = ['sheet', 'sharded', 'csv', 'parquet', 'none']
+
+# Excel 單一分頁最多 1,048,576 列 (含欄位標題列)
+EXCEL_MAX_DATA_ROWS = 1048575
+
+RAW_LINK_STYLES = dict(
+    RAW_STYLES,
+    raw_link={'color': '0563C1', 'align': 'left'},
+)
+
+
+def spill_path(output_file, mode):
+    """
+    另存原始資料的檔案路徑，例如 Daily_Summary_20260209_raw.csv.gz。
+    """
+    base = os.path.splitext(output_file)[0]
+    return f"{base}_raw.csv.gz" if mode == 'csv' else f"{base}_raw.parquet"
+
+
+def spill_kinds(df):
+    """
+    依第一批資料決定另存 Parquet 時各欄位的型態，後續各批皆轉為相同型態。
+    """
+    kinds = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            kinds[col] = 'boolean'
+        elif pd.api.types.is_integer_dtype(dtype):
+            kinds[col] = 'Int64'
+        elif pd.api.types.is_float_dtype(dtype):
+            kinds[col] = 'float64'
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            kinds[col] = 'datetime64[ns]'
+        else:
+            kinds[col] = 'string'
+    return kinds
+
+
+def conform_frame(df, kinds):
+    """
+    將一批資料轉為 spill_kinds 決定的型態；無法轉換的欄位記錄警告並視為缺值。
+    """
+    out = {}
+    for col, kind in kinds.items():
+        series = df[col]
+        try:
+            if kind in ('Int64', 'float64'):
+                series = pd.to_numeric(series, errors='coerce').astype(kind)
+            elif kind == 'datetime64[ns]':
+                series = pd.to_datetime(series, errors='coerce').astype(kind)
+            else:
+                series = series.astype(kind)
+        except (TypeError, ValueError) as e:
+            logging.warning(f"原始資料欄位 {col} 無法轉為 {kind}，此批資料以缺值寫出: {e}")
+            series = pd.Series(pd.NA, index=df.index, dtype=kind)
+        out[col] = series
+    return pd.DataFrame(out, index=df.index)
+
+
+class SpillFile:
+    """
+    將多批 DataFrame 依序寫入單一 CSV (fmt='csv.gz' 為 gzip 壓縮) 或 Parquet 檔，不保留已寫出的資料。
+    先寫入暫存檔，close 時才取代正式檔案。Parquet 各欄型態依 kinds (未指定時依第一批資料) 決定。
+    """
+
+    def __init__(self, path, fmt='csv', kinds=None):
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        self._tmp_path = f"{path}.tmp"
+        self._handle = None
+        self._kinds = kinds
+        self._schema = None
+
+    def append(self, df):
+        if self.fmt == 'parquet':
+            self._append_parquet(df)
+        else:
+            self._append_csv(df)
+        self.rows += len(df)
+
+    def _append_csv(self, df):
+        header = self._handle is None
+        if header:
+            if self.fmt == 'csv.gz':
+                self._handle = gzip.open(self._tmp_path, 'wt', encoding='utf-8-sig', newline='')
+            else:
+                self._handle = open(self._tmp_path, 'w', encoding='utf-8-sig', newline='')
+        widen_float32(df).to_csv(self._handle, index=False, header=header)
+
+    def _append_parquet(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._kinds is None:
+            self._kinds = spill_kinds(widen_float32(df))
+        table = pa.Table.from_pandas(conform_frame(widen_float32(df), self._kinds), schema=self._schema,
+                                     preserve_index=False)
+        if self._handle is None:
+            self._schema = table.schema
+            self._handle = pq.ParquetWriter(self._tmp_path, self._schema, compression='zstd')
+        self._handle.write_table(table)
+
+    def close(self):
+        """
+        完成寫出並以暫存檔取代正式檔案；沒有寫入任何資料時回傳 False。
+        """
+        if self._handle is None:
+            return False
+        self._handle.close()
+        self._handle = None
+        os.replace(self._tmp_path, self.path)
+        return True
+
+    def abort(self):
+        """
+        放棄寫出並刪除暫存檔 (正式檔案保持不變)。
+        """
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class RawDataOutput:
+    """
+    依輸出模式寫出原始資料；append 可重複呼叫 (各批欄位需一致)，close 於寫出儀表板前呼叫。
+    """
+
+    def __init__(self, writer, output_file, sheet_name, mode='sheet', shard_rows=EXCEL_MAX_DATA_ROWS):
+        if mode == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                logging.warning("未安裝 pyarrow，原始資料改存為 csv")
+                mode = 'csv'
+
+        self.writer = writer
+        self.output_file = output_file
+        self.sheet_name = sheet_name
+        self.mode = mode
+        self.shard_rows = EXCEL_MAX_DATA_ROWS if mode == 'sheet' else max(1, min(shard_rows, EXCEL_MAX_DATA_ROWS))
+        self.rows = 0
+        self._shard = 0
+        self._shard_used = 0
+        self._spill = None
+
+        if mode in ('csv', 'parquet'):
+            self.path = spill_path(output_file, mode)
+            self._spill = SpillFile(self.path, 'csv.gz' if mode == 'csv' else 'parquet')
+
+    def shard_name(self, index):
+        return self.sheet_name if index == 0 else f"{self.sheet_name}_{index + 1}"
+
+    def append(self, df):
+        if self.mode == 'none':
+            return
+        if self.mode in ('sheet', 'sharded'):
+            self._append_sheets(df)
+        else:
+            self._spill.append(df)
+        self.rows += len(df)
+
+    def _append_sheets(self, df):
+        start = 0
+        while True:
+            if self._shard_used >= self.shard_rows:
+                self._shard += 1
+                self._shard_used = 0
+                if self.mode == 'sheet' and self._shard == 1:
+                    logging.warning(f"原始資料超過 Excel 單一分頁上限 {EXCEL_MAX_DATA_ROWS} 列，接續寫入下一個分頁")
+
+            part = df.iloc[start:start + self.shard_rows - self._shard_used]
+            self.writer.append_dataframe(self.shard_name(self._shard), part)
+            self._shard_used += len(part)
+            start += len(part)
+            if start >= len(df):
+                break
+
+    def close(self):
+        """
+        完成原始資料輸出；另存模式時在報表中加入連結分頁。
+        """
+        if self.mode not in ('csv', 'parquet'):
+            return
+        if not self._spill.close():
+            return
+
+        name = os.path.basename(self.path)
+        layout = SheetLayout()
+        layout.write(1, 1, "原始資料另存於:", 'raw_header')
+        layout.write(1, 2, name, 'raw_link')
+        layout.link(1, 2, name)
+        layout.write(2, 1, "資料筆數:", 'raw_header')
+        layout.write(2, 2, self.rows)
+        self.writer.write_layout(self.sheet_name, layout, RAW_LINK_STYLES)
+        logging.info(f"原始資料 {self.rows} 筆已另存為: {self.path}")
+
+
+def get_raw_output_options(config):
+    """
+    由 config.ini 的 [Output] Raw_Data / Shard_Rows 取得原始資料輸出模式，回傳 (mode, shard_rows)。
+    """
+    mode = config.get('Output', 'Raw_Data', fallback='sheet').strip().lower()
+    if mode not in RAW_DATA_MODES:
+        logging.error(f"未知的 Raw_Data 設定: {mode}，改用 sheet")
+        mode = 'sheet'
+
+    try:
+        shard_rows = config.getint('Output', 'Shard_Rows', fallback=EXCEL_MAX_DATA_ROWS)
+    except ValueError:
+        logging.error("Config 中 Shard_Rows 必須為整數，改用 Excel 分頁上限")
+        shard_rows = EXCEL_MAX_DATA_ROWS
+    return mode, shard_rows
+
+
+def open_raw_output(writer, output_file, sheet_name, config):
+    mode, shard_rows = get_raw_output_options(config)
+    return RawDataOutput(writer, output_file, sheet_name, mode, shard_rows)
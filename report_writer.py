@@ -0,0 +1,390 @@
+"""
+Excel 報表輸出後端。
+
+- openpyxl            : 預設，沿用 pd.ExcelWriter，整本活頁簿保留於記憶體。
+- openpyxl_write_only : openpyxl 串流模式，逐列寫出，記憶體用量固定。
+- xlsxwriter          : XlsxWriter constant_memory 模式，速度最快 (需另行安裝 xlsxwriter)。
+
+各分頁內容先以 SheetLayout 描述 (儲存格值、樣式名稱、合併範圍)，
+再由後端依共用樣式表 (palette) 一次建立樣式物件後寫出。
+"""
+import logging
+import math
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
+from openpyxl.utils import get_column_letter
+
+EXCEL_ENGINES = ['openpyxl', 'openpyxl_write_only', 'xlsxwriter']
+
+# 原始資料分頁的欄位標題樣式 (與 pandas to_excel 預設相同) 與日期格式
+RAW_STYLES = {
+    'raw_header': {'bold': True, 'border_color': '000000', 'align': 'center', 'valign': 'top'},
+    'raw_datetime': {'num_format': 'yyyy-mm-dd hh:mm:ss'},
+}
+
+# 串流寫入原始資料時每批轉換的列數
+RAW_BATCH_ROWS = 10000
+
+
+class SheetLayout:
+    """
+    單一分頁的內容描述：{(row, col): (value, style)}、合併範圍與超連結 (列、欄皆由 1 起算)。
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self.merges = []
+        self.links = {}
+
+    def write(self, row, col, value, style=None):
+        # numpy 純量轉為 Python 原生型別，各後端皆可直接寫入
+        if hasattr(value, 'item'):
+            value = value.item()
+        self.cells[(row, col)] = (value, style)
+
+    def set_style(self, row, col, style):
+        value, _ = self.cells.get((row, col), (None, None))
+        self.cells[(row, col)] = (value, style)
+
+    def merge(self, first_row, first_col, last_row, last_col):
+        self.merges.append((first_row, first_col, last_row, last_col))
+
+    def link(self, row, col, target):
+        """
+        將儲存格設為超連結 (target 可為相對於報表的檔案路徑)。
+        """
+        self.links[(row, col)] = target
+
+    def rows(self):
+        """
+        依列號遞增回傳 (row, [(col, value, style), ...])，供串流後端逐列寫出。
+        """
+        by_row = {}
+        for (row, col), (value, style) in self.cells.items():
+            by_row.setdefault(row, []).append((col, value, style))
+        for row in sorted(by_row):
+            yield row, sorted(by_row[row], key=lambda x: x[0])
+
+
+def widen_float32(df):
+    """
+    float32 欄位經十進位字串轉回 float64，寫出的值與日誌中的數字相同 (避免 26.440000534 這類尾數)。
+    沒有 float32 欄位時直接回傳原 DataFrame。
+    """
+    cols = [c for c in df.columns if df[c].dtype == 'float32']
+    if not cols:
+        return df
+    return df.assign(**{c: pd.to_numeric(df[c].astype(str), errors='coerce') for c in cols})
+
+
+def iter_raw_rows(df):
+    """
+    逐批將 DataFrame 轉為 Python 值的列，缺值 (NaN/NaT) 轉為 None。
+    """
+    for start in range(0, len(df), RAW_BATCH_ROWS):
+        chunk = widen_float32(df.iloc[start:start + RAW_BATCH_ROWS])
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def _clean_value(value):
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    if value is pd.NaT:
+        return None
+    return value
+
+
+class OpenpyxlReportWriter:
+    """
+    預設後端：pd.ExcelWriter(engine='openpyxl')，輸出與舊版完全相同。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = pd.ExcelWriter(path, engine='openpyxl')
+        self.book = self.writer.book
+        self._style_cache = {}
+        self._appended_rows = {}
+
+    def write_dataframe(self, sheet_name, df):
+        widen_float32(df).to_excel(self.writer, sheet_name=sheet_name, index=False)
+
+    def append_dataframe(self, sheet_name, df):
+        """
+        分批寫入同一分頁：第一批寫出欄位標題，之後的資料列接續在後 (各批欄位需一致)。
+        """
+        written = self._appended_rows.get(sheet_name)
+        if written is None:
+            widen_float32(df).to_excel(self.writer, sheet_name=sheet_name, index=False)
+            written = 1
+        else:
+            widen_float32(df).to_excel(self.writer, sheet_name=sheet_name, index=False, startrow=written, header=False)
+        self._appended_rows[sheet_name] = written + len(df)
+
+    def _style(self, palette, key):
+        if key not in self._style_cache:
+            self._style_cache[key] = build_openpyxl_style(palette[key])
+        return self._style_cache[key]
+
+    def write_layout(self, sheet_name, layout, palette):
+        if sheet_name not in self.book.sheetnames:
+            self.book.create_sheet(sheet_name)
+        ws = self.book[sheet_name]
+
+        for first_row, first_col, last_row, last_col in layout.merges:
+            ws.merge_cells(start_row=first_row, start_column=first_col, end_row=last_row, end_column=last_col)
+
+        for (row, col), (value, style) in layout.cells.items():
+            cell = ws.cell(row=row, column=col, value=value)
+            if style:
+                apply_openpyxl_style(cell, self._style(palette, style))
+            if (row, col) in layout.links:
+                cell.hyperlink = layout.links[(row, col)]
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class OpenpyxlWriteOnlyReportWriter:
+    """
+    openpyxl write_only 串流後端：逐列寫出，不保留整本活頁簿。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.book = Workbook(write_only=True)
+        self._style_cache = {}
+        self._sheets = {}
+
+    def _style(self, palette, key):
+        if key not in self._style_cache:
+            self._style_cache[key] = build_openpyxl_style(palette[key])
+        return self._style_cache[key]
+
+    def _cell(self, ws, value, style_parts):
+        cell = WriteOnlyCell(ws, value=value)
+        apply_openpyxl_style(cell, style_parts)
+        return cell
+
+    def write_dataframe(self, sheet_name, df):
+        self.append_dataframe(sheet_name, df)
+
+    def append_dataframe(self, sheet_name, df):
+        """
+        分批寫入同一分頁：第一批建立分頁並寫出欄位標題，之後的資料列接續在後 (各批欄位需一致)。
+        """
+        ws = self._sheets.get(sheet_name)
+        if ws is None:
+            ws = self._sheets[sheet_name] = self.book.create_sheet(sheet_name)
+            header = self._style(RAW_STYLES, 'raw_header')
+            ws.append([self._cell(ws, str(c), header) for c in df.columns])
+
+        date_style = self._style(RAW_STYLES, 'raw_datetime')
+        for values in iter_raw_rows(df):
+            row = []
+            for v in values:
+                v = _clean_value(v)
+                row.append(self._cell(ws, v, date_style) if isinstance(v, datetime) else v)
+            ws.append(row)
+
+    def write_layout(self, sheet_name, layout, palette):
+        ws = self.book.create_sheet(sheet_name)
+        next_row = 1
+        for row, cells in layout.rows():
+            while next_row < row:
+                ws.append([])
+                next_row += 1
+
+            values = [None] * cells[-1][0]
+            for col, value, style in cells:
+                target = layout.links.get((row, col))
+                if style or target:
+                    values[col - 1] = self._cell(ws, value, self._style(palette, style) if style else {})
+                    if target:
+                        values[col - 1].hyperlink = target
+                else:
+                    values[col - 1] = value
+            ws.append(values)
+            next_row += 1
+
+        for first_row, first_col, last_row, last_col in layout.merges:
+            ws.merged_cells.add(
+                f"{get_column_letter(first_col)}{first_row}:{get_column_letter(last_col)}{last_row}"
+            )
+
+    def close(self):
+        self.book.save(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class XlsxReportWriter:
+    """
+    XlsxWriter constant_memory 串流後端 (列、欄於 XlsxWriter 中由 0 起算)。
+    """
+
+    def __init__(self, path):
+        import xlsxwriter
+
+        self.path = path
+        self.book = xlsxwriter.Workbook(path, {'constant_memory': True})
+        self._formats = {}
+        self._sheets = {}
+
+    def _format(self, palette, key):
+        if key not in self._formats:
+            self._formats[key] = self.book.add_format(build_xlsxwriter_format(palette[key]))
+        return self._formats[key]
+
+    def write_dataframe(self, sheet_name, df):
+        self.append_dataframe(sheet_name, df)
+
+    def append_dataframe(self, sheet_name, df):
+        """
+        分批寫入同一分頁：第一批建立分頁並寫出欄位標題，之後的資料列接續在後 (各批欄位需一致)。
+        """
+        if sheet_name not in self._sheets:
+            ws = self.book.add_worksheet(sheet_name)
+            ws.write_row(0, 0, [str(c) for c in df.columns], self._format(RAW_STYLES, 'raw_header'))
+            self._sheets[sheet_name] = [ws, 1]
+        ws, next_row = self._sheets[sheet_name]
+        date_fmt = self._format(RAW_STYLES, 'raw_datetime')
+
+        for r, values in enumerate(iter_raw_rows(df), next_row):
+            for c, v in enumerate(values):
+                v = _clean_value(v)
+                if v is None:
+                    continue
+                if isinstance(v, datetime):
+                    ws.write_datetime(r, c, v, date_fmt)
+                else:
+                    ws.write(r, c, v)
+        self._sheets[sheet_name][1] = next_row + len(df)
+
+    def write_layout(self, sheet_name, layout, palette):
+        ws = self.book.add_worksheet(sheet_name)
+        merges = {}
+        for m in layout.merges:
+            merges.setdefault(m[0], []).append(m)
+
+        for row, cells in layout.rows():
+            covered = set()
+            row_cells = {col: (value, style) for col, value, style in cells}
+            for first_row, first_col, last_row, last_col in merges.get(row, []):
+                value, style = row_cells.get(first_col, (None, None))
+                fmt = self._format(palette, style) if style else None
+                if (first_row, first_col) != (last_row, last_col):
+                    ws.merge_range(first_row - 1, first_col - 1, last_row - 1, last_col - 1, value, fmt)
+                    covered.update(range(first_col, last_col + 1))
+
+            for col, value, style in cells:
+                if col in covered:
+                    continue
+                fmt = self._format(palette, style) if style else None
+                if (row, col) in layout.links:
+                    target = layout.links[(row, col)]
+                    # XlsxWriter 的本機檔案連結需加上 external: 前綴
+                    if '://' not in target:
+                        target = f"external:{target}"
+                    ws.write_url(row - 1, col - 1, target, fmt, string=value)
+                elif value is None:
+                    if fmt is not None:
+                        ws.write_blank(row - 1, col - 1, None, fmt)
+                else:
+                    ws.write(row - 1, col - 1, value, fmt)
+
+    def close(self):
+        self.book.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def build_openpyxl_style(spec):
+    """
+    將樣式描述轉為 openpyxl 樣式物件 (每個樣式只建立一次，各儲存格共用)。
+    """
+    parts = {}
+    if any(k in spec for k in ('bold', 'color', 'size')):
+        parts['font'] = Font(bold=spec.get('bold', False), color=spec.get('color'), size=spec.get('size'))
+    if 'fill' in spec:
+        parts['fill'] = PatternFill(start_color=spec['fill'], end_color=spec['fill'], fill_type='solid')
+    if 'border_color' in spec:
+        side = Side(style='thin', color=spec['border_color'])
+        parts['border'] = Border(left=side, right=side, top=side, bottom=side)
+    if 'align' in spec:
+        parts['alignment'] = Alignment(horizontal=spec['align'], vertical=spec.get('valign', 'center'),
+                                       wrap_text=spec.get('wrap'))
+    if 'num_format' in spec:
+        parts['number_format'] = spec['num_format']
+    return parts
+
+
+def apply_openpyxl_style(cell, parts):
+    for attr, value in parts.items():
+        setattr(cell, attr, value)
+
+
+def build_xlsxwriter_format(spec):
+    """
+    將樣式描述轉為 XlsxWriter add_format 參數。
+    """
+    fmt = {}
+    if 'bold' in spec:
+        fmt['bold'] = spec['bold']
+    if 'color' in spec:
+        fmt['font_color'] = f"#{spec['color']}"
+    if 'size' in spec:
+        fmt['font_size'] = spec['size']
+    if 'fill' in spec:
+        fmt['bg_color'] = f"#{spec['fill']}"
+        fmt['pattern'] = 1
+    if 'border_color' in spec:
+        fmt['border'] = 1
+        fmt['border_color'] = f"#{spec['border_color']}"
+    if 'align' in spec:
+        fmt['align'] = spec['align']
+        fmt['valign'] = 'vcenter' if spec.get('valign', 'center') == 'center' else spec['valign']
+    if spec.get('wrap'):
+        fmt['text_wrap'] = True
+    if 'num_format' in spec:
+        fmt['num_format'] = spec['num_format']
+    return fmt
+
+
+def open_report_writer(path, engine='openpyxl'):
+    """
+    依 engine 名稱建立報表輸出後端；xlsxwriter 未安裝時改用 openpyxl 串流模式。
+    """
+    if engine not in EXCEL_ENGINES:
+        logging.error(f"未知的 Excel_Engine 設定: {engine}，改用 openpyxl")
+        engine = 'openpyxl'
+
+    if engine == 'xlsxwriter':
+        try:
+            return XlsxReportWriter(path)
+        except ImportError:
+            logging.warning("未安裝 xlsxwriter，改用 openpyxl_write_only 串流模式輸出")
+            engine = 'openpyxl_write_only'
+
+    if engine == 'openpyxl_write_only':
+        return OpenpyxlWriteOnlyReportWriter(path)
+    return OpenpyxlReportWriter(path)
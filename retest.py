@@ -0,0 +1,275 @@
+"""
+重測判定與首次良率 (Daily_Summary 的 Retest 分頁)。
+
+同一條碼 (Barcode) 的產品可能在同一站或其他站重測多次，每次測試各佔一列日誌。
+以條碼的 64 位元雜湊值與測試時間 (Time) 排序一次 (不需逐列查表)，依序判定：
+- 第幾次測試 (attempt，沒有條碼的資料為 0)，條碼與時間皆相同的資料列視為重複記錄 (duplicate)
+- 是否為該條碼的最後一次測試 (final) 與最後一次的判定結果 (final_ok)
+
+各站點以首次測試在該站的產品計算首次良率 (First Pass Yield) 與最終良率 (Final Yield)，
+並統計在該站執行的重測次數。
+[Retest] Count 決定 Summary_Dashboard 的統計 (Fail Rate 與失效模式規則) 納入哪些資料列：
+- all  : 全部資料列 (每次重測都計入，與原本相同)
+- first: 每個條碼只計首次測試 (重測與重複記錄不計入)
+- final: 每個條碼只計最後一次測試
+沒有條碼的資料列無法追蹤重測，一律計入。
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from aggregator import DASHBOARD_STYLES, SUMMARY_BORDER, format_location
+from log_schema import LOG_TIME_FORMAT
+from report_writer import SheetLayout
+
+RETEST_COUNT_MODES = ['all', 'first', 'final']
+
+DEFAULT_RETEST_OPTIONS = {
+    'enabled': False,
+    'count': 'all',
+}
+
+# 重測判定所需的精簡欄位 (串流模式逐批收集後再一次判定)
+RETEST_KEY_COLUMNS = ['Line_Name', 'Device_ID', 'key', 'time', 'valid', 'ok']
+
+# 各站點統計的加總欄位
+RETEST_SUM_COLS = ['units', 'first_pass', 'final_pass', 'retests', 'retested_units', 'duplicates',
+                   'no_barcode']
+
+RETEST_STYLES = {
+    'title': DASHBOARD_STYLES['title'],
+    'line_title': DASHBOARD_STYLES['line_title'],
+    'line_header': DASHBOARD_STYLES['line_header'],
+    'mode_header': DASHBOARD_STYLES['mode_header'],
+    'retest_label': {'border_color': SUMMARY_BORDER, 'align': 'left'},
+    'retest_value': {'border_color': SUMMARY_BORDER, 'align': 'center'},
+    'retest_rate': {'border_color': SUMMARY_BORDER, 'align': 'center', 'num_format': '0.00%'},
+    'retest_total_value': {'border_color': SUMMARY_BORDER, 'align': 'center', 'bold': True},
+    'retest_total_rate': {'border_color': SUMMARY_BORDER, 'align': 'center', 'bold': True, 'num_format': '0.00%'},
+}
+
+# (欄位標題, 統計欄位, 樣式)
+RETEST_SHEET_COLUMNS = [
+    ('Units', 'units', 'value'),
+    ('First Pass', 'first_pass', 'value'),
+    ('First Pass Yield', 'fpy', 'rate'),
+    ('Final Pass', 'final_pass', 'value'),
+    ('Final Yield', 'final_yield', 'rate'),
+    ('Retests', 'retests', 'value'),
+    ('Retested Units', 'retested_units', 'value'),
+    ('Duplicate Rows', 'duplicates', 'value'),
+    ('No Barcode', 'no_barcode', 'value'),
+]
+
+
+def get_retest_options(config):
+    """
+    由 config.ini 的 [Retest] 區段取得重測判定設定。
+    """
+    options = dict(DEFAULT_RETEST_OPTIONS)
+    try:
+        options['enabled'] = config.getboolean('Retest', 'Enabled', fallback=options['enabled'])
+    except ValueError:
+        logging.error("Config 中 [Retest] Enabled 必須為 true/false，改用預設值")
+
+    count = config.get('Retest', 'Count', fallback=options['count']).strip().lower()
+    if count not in RETEST_COUNT_MODES:
+        logging.error(f"未知的 [Retest] Count 設定: {count}，改用 {options['count']}")
+        count = options['count']
+    options['count'] = count
+    return options
+
+
+def time_order(series):
+    """
+    將 Time 欄位轉為可排序的 int64 (日期時間或 YYYYMMDDhhmmss 數值)，無法解析的時間排在最前面。
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.to_numpy(dtype='datetime64[s]').astype('int64')
+    values = pd.to_numeric(series, errors='coerce')
+    if values.isna().all() and series.notna().any():
+        # 非數值格式的時間字串
+        values = pd.to_datetime(series.astype(str), format=LOG_TIME_FORMAT, errors='coerce')
+        return values.to_numpy(dtype='datetime64[s]').astype('int64')
+    return values.fillna(-1).to_numpy(dtype='int64')
+
+
+def retest_key_frame(df):
+    """
+    由已經過 classify_results 的資料取出重測判定所需的精簡欄位 (RETEST_KEY_COLUMNS)，索引與 df 相同。
+    key 為去除前後空白後的條碼雜湊值，valid 表示有條碼，ok 表示該次測試判定為 OK。
+    """
+    barcode = df['Barcode'] if 'Barcode' in df.columns else pd.Series(np.nan, index=df.index)
+    text = barcode.astype(str).str.strip()
+    time = df['Time'] if 'Time' in df.columns else pd.Series(np.nan, index=df.index)
+    return pd.DataFrame({
+        'Line_Name': df['Line_Name'],
+        'Device_ID': df['Device_ID'],
+        'key': pd.util.hash_pandas_object(text, index=False).to_numpy(),
+        'time': time_order(time),
+        'valid': (barcode.notna() & text.ne('')).to_numpy(),
+        'ok': (df['is_fail'] == 0).to_numpy(),
+    }, index=df.index)
+
+
+def mark_retests(keys):
+    """
+    依 (條碼雜湊, 時間) 排序一次，於 keys 加上 attempt / duplicate / final / final_ok 欄位 (直接寫回並回傳)。
+    時間相同的資料列維持原本順序；沒有條碼的資料列 attempt 為 0、final 為 True。
+    """
+    n_rows = len(keys)
+    attempt = np.zeros(n_rows, dtype='int32')
+    duplicate = np.zeros(n_rows, dtype=bool)
+    final = np.ones(n_rows, dtype=bool)
+    final_ok = keys['ok'].to_numpy(copy=True)
+
+    rows = np.flatnonzero(keys['valid'].to_numpy())
+    if len(rows):
+        all_keys = keys['key'].to_numpy()
+        all_times = keys['time'].to_numpy()
+        # np.lexsort 為穩定排序：以條碼雜湊為主、時間為次
+        order = rows[np.lexsort((all_times[rows], all_keys[rows]))]
+        key = all_keys[order]
+        time = all_times[order]
+
+        new_unit = np.ones(len(order), dtype=bool)
+        new_unit[1:] = key[1:] != key[:-1]
+        is_dup = np.zeros(len(order), dtype=bool)
+        is_dup[1:] = ~new_unit[1:] & (time[1:] == time[:-1])
+
+        # 各條碼內的測試次數 (重複記錄沿用前一列的次數)
+        unit = np.cumsum(new_unit) - 1
+        counted = np.cumsum(~is_dup)
+        unit_start = np.flatnonzero(new_unit)
+        sorted_attempt = counted - counted[unit_start][unit] + 1
+
+        unit_end = np.append(unit_start[1:], len(order)) - 1
+        sorted_final = (sorted_attempt == sorted_attempt[unit_end][unit]) & ~is_dup
+        unit_ok = np.zeros(len(unit_start), dtype=bool)
+        unit_ok[unit[sorted_final]] = keys['ok'].to_numpy()[order][sorted_final]
+
+        attempt[order] = sorted_attempt
+        duplicate[order] = is_dup
+        final[order] = sorted_final
+        final_ok[order] = unit_ok[unit]
+
+    keys['attempt'] = attempt
+    keys['duplicate'] = duplicate
+    keys['final'] = final
+    keys['final_ok'] = final_ok
+    return keys
+
+
+def count_mask(keys, count):
+    """
+    依 [Retest] Count 回傳要納入站點統計的資料列 (bool 陣列)；count 為 all 時回傳 None (全部納入)。
+    """
+    if count == 'all':
+        return None
+    unique = ~keys['duplicate'].to_numpy()
+    attempt = keys['attempt'].to_numpy()
+    if count == 'first':
+        return unique & (attempt <= 1)
+    return unique & keys['final'].to_numpy()
+
+
+def compute_retest_stats(keys):
+    """
+    由 mark_retests 的結果計算各站點 (Line_Name, Device_ID) 的重測統計表。
+    units / first_pass / final_pass / retested_units 以首次測試在該站的產品計算，
+    retests 為在該站執行的重測次數 (第 2 次以後的測試)。
+    """
+    attempt = keys['attempt'].to_numpy()
+    first = attempt == 1
+    unique = ~keys['duplicate'].to_numpy()
+    flags = pd.DataFrame({
+        'Line_Name': keys['Line_Name'],
+        'Device_ID': keys['Device_ID'],
+        'units': first,
+        'first_pass': first & keys['ok'].to_numpy(),
+        'final_pass': first & keys['final_ok'].to_numpy(),
+        'retests': unique & (attempt > 1),
+        'retested_units': first & ~keys['final'].to_numpy(),
+        'duplicates': ~unique,
+        'no_barcode': attempt == 0,
+    })
+    stats = flags.groupby(['Line_Name', 'Device_ID'], sort=True, observed=True)[RETEST_SUM_COLS].sum()
+    return finalize_retest_stats(stats)
+
+
+def finalize_retest_stats(stats):
+    units = stats['units'].where(stats['units'] > 0)
+    stats['fpy'] = stats['first_pass'] / units
+    stats['final_yield'] = stats['final_pass'] / units
+    return stats
+
+
+def retest_totals(stats):
+    """
+    全部站點合計的重測統計 (Series)。
+    """
+    totals = stats[RETEST_SUM_COLS].sum()
+    units = totals['units']
+    totals['fpy'] = totals['first_pass'] / units if units else np.nan
+    totals['final_yield'] = totals['final_pass'] / units if units else np.nan
+    return totals
+
+
+def log_retest_summary(stats):
+    totals = retest_totals(stats)
+    if not totals['units']:
+        return
+    logging.info(
+        f"重測統計: {int(totals['units'])} 個產品, 首次良率 {totals['fpy']:.2%}, "
+        f"最終良率 {totals['final_yield']:.2%}, 重測 {int(totals['retests'])} 次, "
+        f"重複記錄 {int(totals['duplicates'])} 筆"
+    )
+
+
+def _cell_value(value):
+    return None if pd.isna(value) else float(value)
+
+
+def write_retest_row(layout, row, label, values, total=False):
+    layout.write(row, 1, label, 'retest_label')
+    for col, (_, name, kind) in enumerate(RETEST_SHEET_COLUMNS, 2):
+        value = int(values[name]) if kind == 'value' else _cell_value(values[name])
+        layout.write(row, col, value, f"retest_total_{kind}" if total else f"retest_{kind}")
+
+
+def write_retest_sheet(writer, stats, date_str):
+    """
+    由重測統計表產生 'Retest' 分頁：全部站點合計，以及各線別各站點的首次良率、最終良率與重測次數。
+    """
+    last_col = len(RETEST_SHEET_COLUMNS) + 1
+    layout = SheetLayout()
+    current_row = 1
+    layout.merge(current_row, 1, current_row, last_col)
+    layout.write(current_row, 1, f"Retest & First Pass Yield ({date_str})", 'title')
+    current_row += 2
+
+    headers = ['Location'] + [title for title, _, _ in RETEST_SHEET_COLUMNS]
+    for i, h in enumerate(headers, 1):
+        layout.write(current_row, i, h, 'mode_header')
+    current_row += 1
+    write_retest_row(layout, current_row, 'All', retest_totals(stats), total=True)
+    current_row += 3
+
+    for line in stats.index.unique(level='Line_Name'):
+        line_stats = stats.loc[line]
+        layout.merge(current_row, 1, current_row, last_col)
+        layout.write(current_row, 1, line, 'line_title')
+        current_row += 1
+
+        for i, h in enumerate(['Station'] + headers[1:], 1):
+            layout.write(current_row, i, h, 'line_header')
+        current_row += 1
+
+        for station, values in line_stats.iterrows():
+            write_retest_row(layout, current_row, format_location(line, station), values)
+            current_row += 1
+        write_retest_row(layout, current_row, format_location(line), retest_totals(line_stats), total=True)
+        current_row += 2
+
+    writer.write_layout('Retest', layout, RETEST_STYLES)
@@ -0,0 +1,293 @@
+"""
+彙整執行的效能紀錄 (config.ini 的 [Profiling])。
+
+run_aggregation 依階段 (discovery / parse / concat / classification / retest / failure_modes / raw_sheet_write /
+baseline / dashboard_write / spectrum / retest_write / save / trend / trace) 記錄執行秒數、每秒處理列數與記憶體，
+並逐檔記錄讀取秒數、筆數與編碼。執行結束時將摘要寫入日誌 (含最慢的日誌檔)，
+並在報表旁寫出 Daily_Summary_{date}_run.json。
+
+記憶體 (Memory):
+- rss        : 行程的記憶體峰值 (high-water mark，Windows 需安裝 psutil)，紀錄為該階段結束時的峰值
+- tracemalloc: 另以 tracemalloc 記錄各階段內 Python 配置的峰值 (較精確，但會拖慢執行)
+- none       : 不記錄記憶體
+
+Profiler = cprofile / pyinstrument 時另以分析器包住整個彙整流程 (平行讀取的子程序不在分析範圍內)，
+結果寫出為報表旁的 .prof / .html，並將最耗時的函式列入日誌；亦可用 python aggregator.py --profile 啟用。
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from ingest import parse_log_file
+
+PROFILERS = ['none', 'cprofile', 'pyinstrument']
+MEMORY_MODES = ['rss', 'tracemalloc', 'none']
+
+DEFAULT_PROFILING_OPTIONS = {
+    'enabled': True,
+    'memory': 'rss',
+    'profiler': 'none',
+    'slow_files': 5,
+    'top_functions': 25,
+}
+
+
+def get_profiling_options(config):
+    """
+    由 config.ini 的 [Profiling] 區段取得效能紀錄設定。
+    """
+    options = dict(DEFAULT_PROFILING_OPTIONS)
+    try:
+        options['enabled'] = config.getboolean('Profiling', 'Enabled', fallback=options['enabled'])
+    except ValueError:
+        logging.error("Config 中 [Profiling] Enabled 必須為 true/false，改用預設值")
+
+    for key, name, choices in (('memory', 'Memory', MEMORY_MODES), ('profiler', 'Profiler', PROFILERS)):
+        value = config.get('Profiling', name, fallback=options[key]).strip().lower()
+        if value not in choices:
+            logging.error(f"未知的 [Profiling] {name} 設定: {value}，改用 {options[key]}")
+            value = options[key]
+        options[key] = value
+
+    for key, name in (('slow_files', 'Slow_Files'), ('top_functions', 'Top_Functions')):
+        try:
+            options[key] = max(0, config.getint('Profiling', name, fallback=options[key]))
+        except ValueError:
+            logging.error(f"Config 中 [Profiling] {name} 必須為整數，改用預設值 {options[key]}")
+    return options
+
+
+def set_profiler(config, profiler):
+    """
+    以命令列參數 (--profile) 覆寫 [Profiling] Profiler。
+    """
+    if not profiler:
+        return
+    if not config.has_section('Profiling'):
+        config.add_section('Profiling')
+    config.set('Profiling', 'Profiler', profiler)
+
+
+def peak_rss_mb():
+    """
+    行程至今的記憶體峰值 (MB)；無法取得時回傳 None。
+    """
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 為單位，macOS 以 bytes 為單位
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return round(getattr(info, 'peak_wset', info.rss) / 1024 / 1024, 1)
+
+
+def rows_per_sec(rows, seconds):
+    if not rows or seconds <= 0:
+        return None
+    return round(rows / seconds)
+
+
+def file_record(file_path, rows, seconds, status='ok', encoding=None, malformed_rows=None):
+    """
+    單一日誌檔的讀取紀錄。
+    """
+    return {
+        'file': os.path.basename(file_path),
+        'status': status,
+        'bytes': os.path.getsize(file_path) if os.path.exists(file_path) else None,
+        'rows': rows,
+        'seconds': round(seconds, 4),
+        'rows_per_sec': rows_per_sec(rows, seconds),
+        'encoding': encoding,
+        'malformed_rows': malformed_rows,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def timed_parse_log_file(file_path, target_date, device_map, cache=None, schema=None):
+    """
+    執行 parse_log_file 並回傳 (DataFrame 或 None, 單檔紀錄)；可於平行讀取的子程序中執行。
+    """
+    start = time.perf_counter()
+    df = parse_log_file(file_path, target_date, device_map, cache, schema)
+    seconds = time.perf_counter() - start
+
+    if df is None:
+        return None, file_record(file_path, 0, seconds, status='skipped')
+    return df, file_record(file_path, len(df), seconds, encoding=df.attrs.get('encoding'),
+                           malformed_rows=df.attrs.get('malformed_rows'))
+
+
+class RunProfile:
+    """
+    記錄單次彙整的各階段與各日誌檔效能；未啟用時各方法不做任何事。
+    """
+
+    def __init__(self, target_date, options=None):
+        self.target_date = target_date
+        self.options = dict(DEFAULT_PROFILING_OPTIONS, **(options or {}))
+        self.enabled = self.options['enabled']
+        self.stages = []
+        self.files = []
+        self.info = {}
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        self._tracing = False
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        記錄區塊的執行秒數與記憶體；區塊內可設定回傳 dict 的 'rows' (處理列數)。
+        """
+        record = {'stage': name, 'rows': rows}
+        if not self.enabled:
+            yield record
+            return
+
+        tracing = self.options['memory'] == 'tracemalloc'
+        if tracing:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            record['seconds'] = round(seconds, 4)
+            record['rows_per_sec'] = rows_per_sec(record['rows'], seconds)
+            if self.options['memory'] != 'none':
+                record['peak_rss_mb'] = peak_rss_mb()
+            if tracing:
+                record['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+            self.stages.append(record)
+
+    def add_file(self, record):
+        if self.enabled:
+            self.files.append(record)
+
+    @contextmanager
+    def profiling(self, output_file):
+        """
+        依 [Profiling] Profiler 以 cProfile 或 pyinstrument 分析區塊，結果寫在 output_file 旁。
+        """
+        kind = self.options['profiler'] if self.enabled else 'none'
+        if kind == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                logging.warning("未安裝 pyinstrument，改用 cProfile 分析")
+                kind = 'cprofile'
+
+        if kind == 'none':
+            yield
+            return
+
+        if kind == 'pyinstrument':
+            profiler = Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            yield
+        finally:
+            base = os.path.splitext(output_file)[0]
+            if kind == 'pyinstrument':
+                profiler.stop()
+                path = f"{base}_profile.html"
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+            else:
+                profiler.disable()
+                path = f"{base}.prof"
+                profiler.dump_stats(path)
+                self._log_top_functions(profiler)
+            logging.info(f"效能分析結果已寫入: {path}")
+
+    def _log_top_functions(self, profiler):
+        if not self.options['top_functions']:
+            return
+        buffer = io.StringIO()
+        stats = pstats.Stats(profiler, stream=buffer).sort_stats('cumulative')
+        stats.print_stats(self.options['top_functions'])
+        logging.info(f"最耗時的函式 (累計時間):\n{buffer.getvalue().strip()}")
+
+    def report(self):
+        total = time.perf_counter() - self._start
+        rows = sum(f['rows'] for f in self.files)
+        return {
+            'date': self.target_date,
+            'started': self.started.isoformat(timespec='seconds'),
+            'total_seconds': round(total, 4),
+            'rows': rows,
+            'rows_per_sec': rows_per_sec(rows, total),
+            'peak_rss_mb': peak_rss_mb() if self.options['memory'] != 'none' else None,
+            'settings': self.info,
+            'stages': self.stages,
+            'files': self.files,
+        }
+
+    def log_summary(self, report):
+        logging.info(
+            f"執行效能: 共 {report['total_seconds']:.2f} 秒, {report['rows']} 筆資料"
+            + (f", 記憶體峰值 {report['peak_rss_mb']} MB" if report['peak_rss_mb'] is not None else "")
+        )
+        for stage in report['stages']:
+            parts = [f"{stage['seconds']:.3f} 秒"]
+            if stage['rows_per_sec']:
+                parts.append(f"{stage['rows_per_sec']:,} 筆/秒")
+            if stage.get('peak_rss_mb') is not None:
+                parts.append(f"RSS 峰值 {stage['peak_rss_mb']} MB")
+            if stage.get('tracemalloc_peak_mb') is not None:
+                parts.append(f"tracemalloc 峰值 {stage['tracemalloc_peak_mb']} MB")
+            logging.info(f"  {stage['stage']:<16} {', '.join(parts)}")
+
+        slow = sorted(report['files'], key=lambda f: f['seconds'], reverse=True)[:self.options['slow_files']]
+        if slow:
+            logging.info("讀取最慢的日誌檔: " + ", ".join(
+                f"{f['file']} ({f['seconds']:.2f} 秒, {f['rows']} 筆)" for f in slow
+            ))
+
+    def close(self, output_file):
+        """
+        結束紀錄：停止 tracemalloc、將摘要寫入日誌，並寫出 {報表檔名}_run.json；沒有任何紀錄時不寫出。
+        """
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        if not self.enabled or not self.stages:
+            return None
+
+        report = self.report()
+        self.log_summary(report)
+        path = f"{os.path.splitext(output_file)[0]}_run.json"
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logging.error(f"無法寫出執行效能紀錄 {path}: {e}")
+            return None
+        return path
+
+
+def open_run_profile(config, target_date):
+    return RunProfile(target_date, get_profiling_options(config))
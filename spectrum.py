@@ -0,0 +1,310 @@
+"""
+1/3 八音度頻譜分析 (Daily_Summary 的 Spectrum 分頁)。
+
+每筆日誌記錄 14 個頻帶的音壓值 (500 ~ 10000 Hz) 與升速過程的 RPM1 ~ RPM6。
+頻帶值一次轉為連續的 float32 矩陣 (列數 x 14)，以 np.bincount 依站點分組累加：
+- 各站點平均頻譜與百分位數頻譜 (百分位數由 0.1 dB 解析度的直方圖求得，可分批累加)
+- 各頻帶與同線別站點中位數的差距及離群分數 (差距 / 線別內差距中位數 x 1.4826，即 modified z-score)
+- RPM1 ~ RPM6 的升速斜率 (每筆以最小平方法計算，單位為 RPM/段)
+
+統計表只存放可直接相加的數值，串流模式逐批累加後結果與一次計算相同。
+於 config.ini 的 [Spectrum] 設定是否輸出、百分位數與離群分數門檻。
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from aggregator import DASHBOARD_STYLES, SUMMARY_BORDER, format_location
+from log_schema import OCTAVE_BANDS, RPM_COLUMNS, canonical_column
+from report_writer import SheetLayout
+
+# 直方圖解析度與範圍 (0 ~ 160 dB，超出範圍的值計入兩端)
+LEVEL_BIN_DB = 0.1
+LEVEL_BINS = 1600
+
+# 線別內差距中位數的下限 (dB)，避免各站點幾乎相同時分數失真
+MIN_SPREAD_DB = 0.5
+
+DEFAULT_SPECTRUM_OPTIONS = {
+    'enabled': False,
+    'percentiles': [10, 50, 90],
+    'outlier_score': 3.5,
+}
+
+# 可直接相加的統計項目
+SPECTRUM_SUM_KEYS = ['rows', 'count', 'sum', 'hist', 'slope_sum', 'slope_count']
+
+SPECTRUM_STYLES = {
+    'title': DASHBOARD_STYLES['title'],
+    'line_title': DASHBOARD_STYLES['line_title'],
+    'line_header': DASHBOARD_STYLES['line_header'],
+    'mode_header': DASHBOARD_STYLES['mode_header'],
+    'mode_ok': DASHBOARD_STYLES['mode_ok'],
+    'spec_label': {'border_color': SUMMARY_BORDER, 'align': 'left'},
+    'spec_value': {'border_color': SUMMARY_BORDER, 'align': 'center', 'num_format': '0.0'},
+    'spec_score': {'border_color': SUMMARY_BORDER, 'align': 'center', 'num_format': '0.00'},
+    'spec_outlier': {'border_color': SUMMARY_BORDER, 'align': 'center', 'num_format': '0.00',
+                     'bold': True, 'color': 'FF0000'},
+}
+
+
+def get_spectrum_options(config):
+    """
+    由 config.ini 的 [Spectrum] 區段取得頻譜分析設定。
+    """
+    options = dict(DEFAULT_SPECTRUM_OPTIONS)
+    try:
+        options['enabled'] = config.getboolean('Spectrum', 'Enabled', fallback=options['enabled'])
+    except ValueError:
+        logging.error("Config 中 [Spectrum] Enabled 必須為 true/false，改用預設值")
+
+    value = config.get('Spectrum', 'Percentiles', fallback=None)
+    if value:
+        try:
+            percentiles = [float(p) for p in value.split(',') if p.strip()]
+            if not all(0 < p <= 100 for p in percentiles):
+                raise ValueError(value)
+            options['percentiles'] = [int(p) if p.is_integer() else p for p in percentiles]
+        except ValueError:
+            logging.error(f"Config 中 [Spectrum] Percentiles 必須為 0 ~ 100 的數字清單，改用預設值 {options['percentiles']}")
+
+    try:
+        options['outlier_score'] = config.getfloat('Spectrum', 'Outlier_Score', fallback=options['outlier_score'])
+    except ValueError:
+        logging.error(f"Config 中 [Spectrum] Outlier_Score 必須為數字，改用預設值 {options['outlier_score']}")
+    return options
+
+
+def find_columns(df, names):
+    """
+    依 Schema 名稱找出 df 中對應的欄位 (日誌標題可能為 500.0 的格式)，缺少任一欄位時回傳 None。
+    """
+    lookup = {canonical_column(c): c for c in df.columns}
+    if not all(name in lookup for name in names):
+        return None
+    return [lookup[name] for name in names]
+
+
+def numeric_matrix(df, columns):
+    """
+    將指定欄位轉為連續的 float32 矩陣 (列數 x 欄數)，無法轉為數字的值視為 NaN。
+    """
+    block = df[columns]
+    if not all(pd.api.types.is_numeric_dtype(t) for t in block.dtypes):
+        block = block.apply(pd.to_numeric, errors='coerce')
+    return np.ascontiguousarray(block.to_numpy(dtype=np.float32, na_value=np.nan))
+
+
+def rpm_slopes(rpm):
+    """
+    各列 RPM1 ~ RPM6 對段數 (1 ~ 6) 的最小平方法斜率；任一段缺值時為 NaN。
+    """
+    steps = np.arange(1, rpm.shape[1] + 1, dtype=np.float32)
+    centered = steps - steps.mean()
+    return rpm @ centered / np.float32(centered @ centered)
+
+
+def compute_spectrum_stats(df):
+    """
+    依 (Line_Name, Device_ID) 累加頻帶值的筆數、總和與直方圖，以及 RPM 斜率的總和與筆數。
+    回傳 dict (index 為站點，其餘為與 index 對齊的 numpy 陣列)；日誌中沒有頻帶欄位時回傳 None。
+    """
+    band_cols = find_columns(df, OCTAVE_BANDS)
+    if band_cols is None:
+        return None
+
+    keys = ['Line_Name', 'Device_ID']
+    grouper = df.groupby(keys, sort=True, observed=True)
+    codes = grouper.ngroup().to_numpy()
+    index = pd.MultiIndex.from_tuples(list(grouper.size().index), names=keys)
+    stations = len(index)
+    bands = len(OCTAVE_BANDS)
+
+    levels = numeric_matrix(df, band_cols)
+    valid = ~np.isnan(levels)
+    cells = (codes[:, None] * bands + np.arange(bands))[valid]
+    values = levels[valid]
+    bins = np.clip((values / LEVEL_BIN_DB).astype(np.int64), 0, LEVEL_BINS - 1)
+
+    stats = {
+        'index': index,
+        'rows': np.bincount(codes, minlength=stations),
+        'count': np.bincount(cells, minlength=stations * bands).reshape(stations, bands),
+        'sum': np.bincount(cells, weights=values, minlength=stations * bands).reshape(stations, bands),
+        'hist': np.bincount(cells * LEVEL_BINS + bins,
+                            minlength=stations * bands * LEVEL_BINS).reshape(stations, bands, LEVEL_BINS),
+    }
+
+    rpm_cols = find_columns(df, RPM_COLUMNS)
+    if rpm_cols is None:
+        stats['slope_sum'] = np.zeros(stations)
+        stats['slope_count'] = np.zeros(stations, dtype=np.int64)
+    else:
+        slopes = rpm_slopes(numeric_matrix(df, rpm_cols))
+        ok = ~np.isnan(slopes)
+        stats['slope_sum'] = np.bincount(codes[ok], weights=slopes[ok], minlength=stations)
+        stats['slope_count'] = np.bincount(codes[ok], minlength=stations)
+    return stats
+
+
+def merge_spectrum_stats(tables):
+    """
+    合併多份 compute_spectrum_stats 的結果 (各檔、各批)，忽略 None。
+    """
+    tables = [t for t in tables if t is not None]
+    if not tables:
+        return None
+    if len(tables) == 1:
+        return tables[0]
+
+    index = tables[0]['index']
+    for table in tables[1:]:
+        index = index.union(table['index'], sort=False)
+
+    merged = {'index': index}
+    for key in SPECTRUM_SUM_KEYS:
+        first = tables[0][key]
+        total = np.zeros((len(index),) + first.shape[1:], dtype=first.dtype)
+        for table in tables:
+            total[index.get_indexer(table['index'])] += table[key]
+        merged[key] = total
+    return merged
+
+
+def histogram_percentile(hist, count, q):
+    """
+    由直方圖求第 q 百分位數 (nearest-rank)，回傳各站點、各頻帶的值 (以所在區間中點表示)。
+    """
+    rank = np.maximum(np.ceil(count * (q / 100.0)), 1)
+    position = (hist.cumsum(axis=2) < rank[..., None]).sum(axis=2)
+    values = (position + 0.5) * LEVEL_BIN_DB
+    return np.where(count > 0, values, np.nan)
+
+
+def band_outlier_scores(mean_spectrum):
+    """
+    各站點平均頻譜與同線別站點中位數的差距 (dB) 及離群分數 (modified z-score)。
+    線別只有一個站點時差距與分數皆為 0。
+    """
+    by_line = mean_spectrum.groupby(level='Line_Name', sort=False)
+    deviation = mean_spectrum - by_line.transform('median')
+    spread = deviation.abs().groupby(level='Line_Name', sort=False).transform('median') * 1.4826
+    score = deviation / spread.clip(lower=MIN_SPREAD_DB)
+    return deviation, score
+
+
+def finalize_spectrum_stats(stats, options=None):
+    """
+    由累加的統計推導各站點頻譜，回傳 dict:
+    rows (筆數), spectra ({'Mean': ..., 'P10': ...}，列為站點、欄為頻帶), deviation, score, rpm_slope。
+    """
+    options = options or DEFAULT_SPECTRUM_OPTIONS
+    index = stats['index'].sort_values()
+    order = stats['index'].get_indexer(index)
+    count = stats['count'][order]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, stats['sum'][order] / count, np.nan)
+        slope = stats['slope_sum'][order] / np.where(stats['slope_count'][order] > 0, stats['slope_count'][order], np.nan)
+
+    spectra = {'Mean': pd.DataFrame(mean, index=index, columns=OCTAVE_BANDS)}
+    hist = stats['hist'][order]
+    for q in options['percentiles']:
+        spectra[f"P{q}"] = pd.DataFrame(histogram_percentile(hist, count, q), index=index, columns=OCTAVE_BANDS)
+
+    deviation, score = band_outlier_scores(spectra['Mean'])
+    return {
+        'rows': pd.Series(stats['rows'][order], index=index),
+        'spectra': spectra,
+        'deviation': deviation,
+        'score': score,
+        'rpm_slope': pd.Series(slope, index=index),
+    }
+
+
+def find_band_outliers(result, outlier_score):
+    """
+    列出離群分數絕對值 >= outlier_score 的 (Line_Name, Device_ID, 頻帶)，依分數絕對值由大到小排列。
+    """
+    score = result['score']
+    hits = score.abs().where(score.abs() >= outlier_score).stack().dropna()
+    hits = hits.sort_values(ascending=False, kind='stable')
+    return [(line, station, band) for (line, station, band) in hits.index]
+
+
+def _cell_value(value):
+    return None if pd.isna(value) else float(value)
+
+
+def write_spectrum_sheet(writer, stats, date_str, options=None):
+    """
+    由頻譜統計產生 'Spectrum' 分頁：離群頻帶總表，以及各線別各站點的平均/百分位數頻譜與離群分數。
+    stats 為 None (日誌中沒有頻帶欄位) 時不產生分頁並回傳 None。
+    """
+    if stats is None:
+        logging.warning("日誌中缺少 1/3 八音度頻帶欄位，略過 Spectrum 分頁")
+        return None
+
+    options = options or DEFAULT_SPECTRUM_OPTIONS
+    result = finalize_spectrum_stats(stats, options)
+    threshold = options['outlier_score']
+    last_col = len(OCTAVE_BANDS) + 3
+
+    layout = SheetLayout()
+    current_row = 1
+    layout.merge(current_row, 1, current_row, last_col)
+    layout.write(current_row, 1, f"Spectrum Analysis ({date_str})", 'title')
+    current_row += 2
+
+    # 第一部分：離群頻帶總表
+    headers = ["Location", "Band (Hz)", "Mean (dB)", "Line Median (dB)", "Deviation (dB)", "Score"]
+    for i, h in enumerate(headers, 1):
+        layout.write(current_row, i, h, 'mode_header')
+    current_row += 1
+
+    outliers = find_band_outliers(result, threshold)
+    if not outliers:
+        layout.write(current_row, 1, "OK", 'mode_ok')
+        current_row += 1
+    for line, station, band in outliers:
+        mean = result['spectra']['Mean'].at[(line, station), band]
+        deviation = result['deviation'].at[(line, station), band]
+        layout.write(current_row, 1, format_location(line, station), 'spec_label')
+        layout.write(current_row, 2, int(band), 'spec_label')
+        layout.write(current_row, 3, _cell_value(mean), 'spec_value')
+        layout.write(current_row, 4, _cell_value(mean - deviation), 'spec_value')
+        layout.write(current_row, 5, _cell_value(deviation), 'spec_value')
+        layout.write(current_row, 6, _cell_value(result['score'].at[(line, station), band]), 'spec_outlier')
+        current_row += 1
+    current_row += 2
+
+    # 第二部分：各線別頻譜
+    for line in result['rows'].index.unique(level='Line_Name'):
+        layout.merge(current_row, 1, current_row, last_col)
+        layout.write(current_row, 1, line, 'line_title')
+        current_row += 1
+
+        headers = ['Station', 'Metric'] + [int(b) for b in OCTAVE_BANDS] + ['RPM Slope']
+        for i, h in enumerate(headers, 1):
+            layout.write(current_row, i, h, 'line_header')
+        current_row += 1
+
+        for station in result['rows'].loc[line].index:
+            key = (line, station)
+            metrics = [(name, frame.loc[key], 'spec_value') for name, frame in result['spectra'].items()]
+            metrics.append(('Score', result['score'].loc[key], 'spec_score'))
+            for name, values, style in metrics:
+                layout.write(current_row, 1, f"{station} ({result['rows'][key]})", 'spec_label')
+                layout.write(current_row, 2, name, 'spec_label')
+                for i, band in enumerate(OCTAVE_BANDS, 3):
+                    value = values[band]
+                    cell_style = 'spec_outlier' if name == 'Score' and abs(value) >= threshold else style
+                    layout.write(current_row, i, _cell_value(value), cell_style)
+                slope = result['rpm_slope'][key] if name == 'Mean' else None
+                layout.write(current_row, last_col, _cell_value(slope), 'spec_value')
+                current_row += 1
+        current_row += 1
+
+    writer.write_layout('Spectrum', layout, SPECTRUM_STYLES)
+    return result
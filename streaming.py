@@ -0,0 +1,187 @@
+"""
+分塊串流彙整 (記憶體用量與單日資料量無關)。
+
+各日誌檔以 read_csv(chunksize=...) 分批讀取，每批資料：
+先附加寫入原始資料分頁，再經 classify_results 判定後以 compute_station_stats 計算站點統計，
+並合併至可累加的統計表 (筆數、各判定加總、平均值分子、線材異常次數)。
+不保留整日的 master_df 與 calc_* 欄位，峰值記憶體取決於 Chunk_Rows。
+
+失效模式判定與 Summary_Dashboard 皆只讀取站點統計表，因此結果與一次讀取全部資料相同；
+Spectrum 分頁的頻譜統計同樣逐批累加；重測判定與條碼索引需要整日的條碼，只逐批收集條碼、時間等精簡欄位，
+最後一次處理 (站點統計不依 [Retest] Count 排除重測)。
+於 config.ini 的 [Performance] 設定 Streaming = true 啟用。
+"""
+import codecs
+import logging
+import os
+import time
+
+import pandas as pd
+
+from aggregator import CABLE_FAIL_INDEX, classify_results, compute_station_stats, merge_station_stats
+from ingest import ENCODING_SAMPLE_SIZE, LOG_ENCODINGS, detect_encoding, station_meta, tag_log_frame
+from log_schema import TAG_COLUMNS, apply_log_schema, prune_columns
+from run_profile import file_record
+from spectrum import compute_spectrum_stats, merge_spectrum_stats
+
+DEFAULT_CHUNK_ROWS = 50000
+
+# 驗證檔案編碼時每次解碼的位元組數
+DECODE_BLOCK_SIZE = 1024 * 1024
+
+
+def decodes_cleanly(file_path, encoding):
+    """
+    以遞增解碼器逐段檢查整個檔案能否以 encoding 解碼 (不將整個檔案讀入記憶體)。
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        with open(file_path, 'rb') as f:
+            while True:
+                block = f.read(DECODE_BLOCK_SIZE)
+                if not block:
+                    break
+                decoder.decode(block)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def detect_file_encoding(file_path):
+    """
+    與 read_log_bytes 相同的編碼判斷：先依開頭樣本偵測，整個檔案解碼失敗時依序改用其他編碼。
+    分批讀取無法在中途更換編碼，因此先確認整個檔案可以解碼。
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(ENCODING_SAMPLE_SIZE + 1)
+
+    encoding = detect_encoding(sample)
+    candidates = [encoding] + [enc for enc in LOG_ENCODINGS if enc != encoding]
+    for enc in candidates:
+        if decodes_cleanly(file_path, enc):
+            if enc != encoding:
+                logging.warning(f"檔案 {os.path.basename(file_path)} 以 {encoding} 解碼失敗，改用 {enc} 編碼")
+            return enc
+
+    raise UnicodeDecodeError(encoding, sample[:1], 0, 1, f"無法以 {', '.join(candidates)} 解碼")
+
+
+def read_log_columns(file_path, encoding, schema=None):
+    """
+    只讀取標題列，回傳清理後 (並依 schema 篩選) 的欄位名稱。
+    """
+    df = pd.read_csv(file_path, sep='\t', encoding=encoding, index_col=False, nrows=0)
+    df.columns = df.columns.str.strip()
+    df = df.rename(columns={'Toral_Result': 'Total_Result'})
+    if schema:
+        df = prune_columns(df, schema['columns'])
+    return list(df.columns)
+
+
+def plan_log_files(files, target_date, device_map, schema=None):
+    """
+    檢查各檔的檔名、編碼與欄位，回傳 (可處理的檔案清單, 原始資料分頁欄位)。
+    原始資料分頁欄位依檔案順序合併各檔欄位與標記欄位，與 pd.concat 的欄位順序相同。
+    """
+    plans = []
+    raw_columns = []
+    for file_path in files:
+        filename = os.path.basename(file_path)
+        source = station_meta(filename, target_date, device_map)
+        if source is None:
+            continue
+
+        try:
+            encoding = detect_file_encoding(file_path)
+            columns = read_log_columns(file_path, encoding, schema)
+        except UnicodeDecodeError as e:
+            logging.error(f"檔案 {filename} 編碼無法辨識: {e}")
+            continue
+        except Exception as e:
+            logging.error(f"讀取檔案 {filename} 發生未知錯誤: {e}")
+            continue
+
+        if 'Total_Result' not in columns:
+            logging.warning(f"跳過檔案 {filename}: 缺少 'Total_Result' 欄位")
+            continue
+
+        for col in columns + TAG_COLUMNS:
+            if col not in raw_columns:
+                raw_columns.append(col)
+        plans.append((file_path, source, encoding))
+    return plans, raw_columns
+
+
+def iter_log_chunks(file_path, encoding, chunk_rows, schema=None):
+    """
+    分批讀取並清理單一日誌檔，每批最多 chunk_rows 列。
+    """
+    reader = pd.read_csv(file_path, sep='\t', encoding=encoding, on_bad_lines='skip', index_col=False,
+                         chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            chunk.columns = chunk.columns.str.strip()
+            if 'Toral_Result' in chunk.columns:
+                chunk = chunk.rename(columns={'Toral_Result': 'Total_Result'})
+            if schema:
+                chunk = prune_columns(chunk, schema['columns'])
+                if schema['typed']:
+                    apply_log_schema(chunk)
+            yield chunk
+
+
+def stream_log_files(plans, raw_columns, target_date, schema=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                     raw_output=None, cable_index=CABLE_FAIL_INDEX, spectrum=False, collect=None, profile=None):
+    """
+    依 plan_log_files 的結果分批讀取當日日誌檔並累加站點統計，回傳 (站點統計表, 頻譜統計, 收集的欄位)，
+    無有效資料時統計表為 None；spectrum 為 False 時不計算頻譜統計 (回傳 None)。
+    collect 為 {名稱: 函式}，函式由每批已分類的資料取出需要整日一次處理的精簡欄位 (例如 retest_key_frame)，
+    各名稱的結果依檔名順序合併為一個 DataFrame (沒有資料時為 None)；批次的索引為該列在日誌檔中的資料列序號。
+    raw_output (RawDataOutput) 依檔名順序接收每批原始資料；None 表示不寫出原始資料。
+    profile (RunProfile) 記錄各檔的處理秒數 (含寫出原始資料與統計)。
+    """
+    station_stats = None
+    spectrum_stats = None
+    collect = collect or {}
+    collected = {name: [] for name in collect}
+    rows_before = 0
+    for file_path, (ip_key, meta), encoding in plans:
+        filename = os.path.basename(file_path)
+        file_stats = None
+        file_spectrum = None
+        file_collected = {name: [] for name in collect}
+        file_rows = 0
+        start = time.perf_counter()
+        try:
+            for chunk in iter_log_chunks(file_path, encoding, chunk_rows, schema):
+                tag_log_frame(chunk, ip_key, meta, target_date)
+                if raw_output is not None:
+                    raw_output.append(chunk.reindex(columns=raw_columns))
+
+                classify_results(chunk)
+                chunk_stats = compute_station_stats(chunk, row_offset=rows_before + file_rows, cable_index=cable_index)
+                file_stats = merge_station_stats([file_stats, chunk_stats])
+                if spectrum:
+                    file_spectrum = merge_spectrum_stats([file_spectrum, compute_spectrum_stats(chunk)])
+                for name, func in collect.items():
+                    file_collected[name].append(func(chunk))
+                file_rows += len(chunk)
+        except Exception as e:
+            # 已寫出的原始資料列無法撤回，統計表則不納入此檔
+            logging.error(f"讀取檔案 {filename} 發生錯誤，此檔不列入統計: {e}")
+            if profile is not None:
+                profile.add_file(file_record(file_path, file_rows, time.perf_counter() - start, 'error', encoding))
+            continue
+
+        station_stats = merge_station_stats([station_stats, file_stats])
+        spectrum_stats = merge_spectrum_stats([spectrum_stats, file_spectrum])
+        for name, frames in file_collected.items():
+            collected[name].extend(frames)
+        rows_before += file_rows
+        if profile is not None:
+            profile.add_file(file_record(file_path, file_rows, time.perf_counter() - start, encoding=encoding))
+        logging.info(f"已處理檔案: {filename} (共 {file_rows} 筆資料, 編碼 {encoding}, 分批讀取)")
+
+    collected = {name: pd.concat(frames, ignore_index=True) if frames else None for name, frames in collected.items()}
+    return station_stats, spectrum_stats, collected
@@ -0,0 +1,162 @@
+"""
+測試機台日誌的快速讀取路徑 ([Performance] Parser = fast)。
+
+日誌為固定標題、CRLF 換行、沒有引號的 tab 分隔文字，不需要 read_csv 通用的引號與錯誤列處理。
+以 mmap 檢查檔案格式並解析標題一次，再交由 pyarrow 的多執行緒 CSV 讀取器直接讀取記憶體對應的檔案
+(不處理引號，數值欄位直接解析為欄式緩衝區；Typed = true 時依 Schema 指定欄位型態)：
+- 欄位數多於標題的資料列由 invalid_row_handler 略過並計數，由呼叫端記錄於日誌
+- 第一筆資料比標題多一欄時 (每列結尾多一個欄位)，與 read_csv 的 index_col=False 相同捨棄最後一欄
+- 全檔皆為 ASCII 時以 UTF-8 讀取 (cp950 相容)，省去轉碼
+
+內容含引號、欄位數不足的資料列、標題重複或空白欄名、推斷為日期時間等 read_csv 不會產生的型態時回傳 None，
+由呼叫端改用 read_csv 讀取，結果與原本相同；未安裝 pyarrow 時一律使用 read_csv。
+"""
+import logging
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+
+from ingest import ENCODING_SAMPLE_SIZE, detect_encoding
+from log_schema import LOG_SCHEMA, TAG_COLUMNS, canonical_column
+
+# 與 read_csv 預設相同的缺值字串
+NA_STRINGS = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+# 第一筆資料比標題多一欄時，多出的欄位名稱 (讀取後捨棄)
+EXTRA_COLUMN = '__extra__'
+
+# read_csv 也會產生的 pyarrow 型態 (其餘型態改用 read_csv 讀取)
+ARROW_KINDS = ('int64', 'double', 'bool', 'string', 'large_string', 'null')
+
+# 檢查是否全為 ASCII 時每次取出的位元組數
+ASCII_BLOCK_SIZE = 1024 * 1024
+
+_arrow_warned = False
+
+
+def arrow_csv_available():
+    global _arrow_warned
+    try:
+        import pyarrow.csv  # noqa: F401
+        return True
+    except ImportError:
+        if not _arrow_warned:
+            logging.warning("未安裝 pyarrow，Parser = fast 改用 read_csv 讀取")
+            _arrow_warned = True
+        return False
+
+
+def is_ascii(mm):
+    return all(mm[start:start + ASCII_BLOCK_SIZE].isascii() for start in range(0, len(mm), ASCII_BLOCK_SIZE))
+
+
+def scan_layout(file_path):
+    """
+    以 mmap 檢查檔案：回傳 (偵測的編碼, 標題欄位, 第一筆資料的欄位數, 是否含非 ASCII 位元組)；
+    空檔案、沒有資料列或內容含引號時回傳 None。
+    """
+    if os.path.getsize(file_path) == 0:
+        return None
+
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm.find(b'"') >= 0:
+            return None
+        header_end = mm.find(b'\n')
+        if header_end < 0:
+            return None
+        line_end = mm.find(b'\n', header_end + 1)
+        first = mm[header_end + 1:line_end if line_end >= 0 else len(mm)].rstrip(b'\r')
+        if not first.strip():
+            return None
+
+        encoding = detect_encoding(mm[:ENCODING_SAMPLE_SIZE + 1])
+        names = mm[:header_end].decode(encoding).rstrip('\r').split('\t')
+        return encoding, names, first.count(b'\t') + 1, not is_ascii(mm)
+
+
+def read_log_mmap(file_path, columns=None, typed=False):
+    """
+    以快速路徑讀取單一日誌檔，回傳 (DataFrame, 使用的編碼, 略過的資料列數)；
+    無法與 read_csv 得到相同結果時回傳 None，由呼叫端改用 read_csv。
+    columns 為要保留的欄位 (None 表示全部)；typed=True 時量測欄位讀為 float32、其他 Schema 欄位讀為文字，
+    交由 apply_log_schema 轉換。
+    """
+    if not arrow_csv_available():
+        return None
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    layout = scan_layout(file_path)
+    if layout is None:
+        return None
+    encoding, names, first_width, non_ascii = layout
+    if len(set(names)) != len(names) or any(not n.strip() for n in names):
+        return None
+    if first_width > len(names) + 1:
+        return None
+
+    column_names = names + [EXTRA_COLUMN] if first_width == len(names) + 1 else list(names)
+    wanted = None if columns is None else set(columns) | set(TAG_COLUMNS)
+    keep = [n for n in names if wanted is None or canonical_column(n) in wanted]
+
+    column_types = {}
+    if typed:
+        for name in keep:
+            kind = LOG_SCHEMA.get(canonical_column(name))
+            if kind == 'float32':
+                # 先解析為 float64 再轉為 float32，與 read_csv 的 dtype='float32' 相同
+                column_types[name] = pa.float64()
+            elif kind is not None:
+                column_types[name] = pa.string()
+
+    rows = {'skipped': 0, 'short': 0}
+
+    def handle_invalid_row(row):
+        if row.actual_columns > row.expected_columns:
+            rows['skipped'] += 1
+        elif row.text.strip():
+            rows['short'] += 1
+        return 'skip'
+
+    try:
+        with pa.memory_map(file_path) as source:
+            table = pacsv.read_csv(
+                source,
+                read_options=pacsv.ReadOptions(column_names=column_names, skip_rows=1,
+                                               encoding=encoding if non_ascii else 'utf8'),
+                parse_options=pacsv.ParseOptions(delimiter='\t', quote_char=False,
+                                                 invalid_row_handler=handle_invalid_row),
+                convert_options=pacsv.ConvertOptions(include_columns=keep, column_types=column_types,
+                                                     null_values=NA_STRINGS, strings_can_be_null=True,
+                                                     timestamp_parsers=[]),
+            )
+    except (pa.ArrowInvalid, UnicodeDecodeError) as e:
+        logging.debug(f"快速讀取 {os.path.basename(file_path)} 失敗: {e}")
+        return None
+
+    # 欄位數不足的資料列 read_csv 會以缺值補齊，pyarrow 無法比照
+    if rows['short'] or table.num_rows == 0:
+        return None
+
+    data = {}
+    for field in table.schema:
+        kind = str(field.type)
+        if kind not in ARROW_KINDS:
+            return None
+        column = table.column(field.name)
+        if kind == 'null' or column.null_count == table.num_rows:
+            # 整欄皆為缺值：read_csv 推斷為 float64，指定為文字型態時為 object
+            dtype = object if field.name in column_types else np.float64
+            data[field.name] = pd.Series(np.nan, index=range(table.num_rows), dtype=dtype)
+        elif kind == 'bool' and column.null_count:
+            return None
+        elif typed and column_types.get(field.name) == pa.float64():
+            data[field.name] = column.to_numpy().astype(np.float32)
+        else:
+            data[field.name] = column.to_pandas()
+    return pd.DataFrame(data), encoding, rows['skipped']
@@ -0,0 +1,96 @@
+"""
+classify_results 的回歸測試：以 test_log/ 的日誌樣本比對向量化判定與原本逐列 (apply / lambda) 判定的結果。
+
+    python -m pytest tests
+"""
+import glob
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from aggregator import STAT_FLAG_COLS, classify_results  # noqa: E402
+from ingest import parse_log_file  # noqa: E402
+
+SAMPLE_DATE = '20260209'
+SAMPLE_FILES = sorted(glob.glob(os.path.join(BASE_DIR, 'test_log', f"{SAMPLE_DATE}_*.txt")))
+
+
+def legacy_classify(df):
+    """
+    向量化之前 create_summary_dashboard 的逐列判定 (保留原本的寫法作為比對基準)。
+    """
+    numeric_cols = [
+        'index1', 'Index1_Limit',
+        'index2', 'Index2_Limit',
+        'index3', 'Index3_Limit',
+        'RPM', 'RPM_Low', 'RPM_Up', 'dB(A)'
+    ]
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        else:
+            df[col] = 0
+
+    cond_rotating = (df['RPM'] != 0)
+    cond_idx1_high = (df['index1'] > df['Index1_Limit'])
+    cond_idx2_high = (df['index2'] > df['Index2_Limit'])
+    cond_idx3_high = (df['index3'] > df['Index3_Limit'])
+    cond_out_of_control = (df['RPM'] > df['RPM_Low']) | (df['RPM'] > 10000)
+    cond_no_rotate = (df['RPM'] == 0)
+
+    df['is_fail'] = df['Total_Result'].apply(lambda x: 0 if str(x).strip().upper() == 'OK' else 1)
+    df['calc_noise'] = (
+        ((cond_idx1_high | cond_idx2_high | cond_idx3_high) & cond_rotating).astype(int) +
+        df.apply(lambda row: 1 if str(row.get('Intelligent_Control', '')).strip().upper() == 'OK'
+                 and str(row.get('Total_Result', '')).strip().upper() != 'OK' else 0, axis=1)
+    )
+    df['calc_only_idx1'] = (cond_idx1_high & ~cond_idx2_high & ~cond_idx3_high & cond_rotating).astype(int)
+    df['calc_only_idx2'] = (~cond_idx1_high & cond_idx2_high & ~cond_idx3_high & cond_rotating).astype(int)
+    df['calc_only_idx3'] = (~cond_idx1_high & ~cond_idx2_high & cond_idx3_high & cond_rotating).astype(int)
+    df['calc_multi_idx'] = (((cond_idx1_high.astype(int) + cond_idx2_high.astype(int)
+                              + cond_idx3_high.astype(int)) >= 2) & cond_rotating).astype(int)
+    df['calc_spec_fail'] = df.apply(lambda row: 1 if str(row.get('Intelligent_Control', '')).strip().upper() == 'OK'
+                                    and str(row.get('Total_Result', '')).strip().upper() != 'OK' else 0, axis=1)
+    df['calc_out_control'] = cond_out_of_control.astype(int)
+    df['calc_no_rotate'] = cond_no_rotate.astype(int)
+    df['calc_rpm_ng'] = ((cond_out_of_control) | (cond_no_rotate)).astype(int)
+    df['calc_pause'] = df['Model_Name'].apply(lambda x: 1 if 'pauseorfreerun' in str(x).lower().replace(" ", "") else 0)
+    df['calc_no_barcode'] = df['Barcode'].apply(lambda x: 1 if pd.isna(x) or str(x).strip() == '' else 0)
+    df['calc_others'] = ((df['calc_pause'] == 1) | (df['calc_no_barcode'] == 1)).astype(int)
+    return df
+
+
+def load_samples(schema=None):
+    frames = [parse_log_file(f, SAMPLE_DATE, {}, schema=schema) for f in SAMPLE_FILES]
+    return pd.concat([df for df in frames if df is not None], ignore_index=True)
+
+
+@pytest.fixture(scope='module')
+def expected():
+    return legacy_classify(load_samples())
+
+
+@pytest.mark.skipif(not SAMPLE_FILES, reason="找不到 test_log/ 日誌樣本")
+@pytest.mark.parametrize('typed', [False, True], ids=['untyped', 'typed'])
+def test_flags_match_legacy(expected, typed):
+    schema = {'typed': True, 'columns': None, 'parser': 'pandas'} if typed else None
+    actual = classify_results(load_samples(schema))
+
+    assert len(actual) == len(expected)
+    # 各判定欄位的筆數與逐列結果皆與原本的判定相同
+    assert actual[STAT_FLAG_COLS].sum().to_dict() == expected[STAT_FLAG_COLS].sum().to_dict()
+    for col in STAT_FLAG_COLS:
+        assert (actual[col].to_numpy() == expected[col].to_numpy()).all(), col
+
+
+@pytest.mark.skipif(not SAMPLE_FILES, reason="找不到 test_log/ 日誌樣本")
+def test_samples_cover_flags(expected):
+    # 樣本需涵蓋主要的異常類型，比對才有意義
+    counts = expected[STAT_FLAG_COLS].sum()
+    for col in ['is_fail', 'calc_noise', 'calc_others', 'calc_no_barcode']:
+        assert counts[col] > 0, col
@@ -0,0 +1,39 @@
+"""
+[Retest] Count 的測試：同一條碼測試多次時，first / final 在 Fail Rate 只計一次。
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from aggregator import classify_results, compute_station_stats, resolve_retests  # noqa: E402
+
+
+def sample_frame():
+    # DCZ001 測試三次 (NG, NG, OK)，DCZ002 測試一次 (OK)，另有一筆沒有條碼的 NG
+    return classify_results(pd.DataFrame({
+        'Time': [20260209080000, 20260209080500, 20260209081000, 20260209080100, 20260209080200],
+        'Barcode': ['DCZ001', 'DCZ001', 'DCZ001', 'DCZ002', np.nan],
+        'Total_Result': ['NG', 'NG', 'OK', 'OK', 'NG'],
+        'Model_Name': 'FFB0412UHN',
+        'RPM': 5000,
+        'Line_Name': 'C13',
+        'Device_ID': 'No1',
+    }))
+
+
+@pytest.mark.parametrize('count, total, fails', [('all', 5, 3), ('first', 3, 2), ('final', 3, 1)])
+def test_fail_rate_counts_each_barcode_once(count, total, fails):
+    df, retest_stats = resolve_retests(sample_frame(), count)
+    stats = compute_station_stats(df).loc[('C13', 'No1')]
+
+    assert stats['total'] == total
+    assert stats['is_fail'] == fails
+    assert retest_stats['retests'].sum() == 2
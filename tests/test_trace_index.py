@@ -0,0 +1,46 @@
+"""
+條碼追溯索引的測試：空白的 Time / Total_Result 不可使當日索引寫入失敗。
+
+    python -m pytest tests
+"""
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from trace_index import save_trace_rows, trace_rows  # noqa: E402
+
+
+def sample_frame(typed=False):
+    df = pd.DataFrame({
+        'Time': ['20260209080000', np.nan, '20260209080200'],
+        'Barcode': ['DCZ001', 'DCZ002', 'DCZ003'],
+        'Total_Result': ['OK', 'NG', np.nan],
+        'Log_Date': '20260209',
+        'Line_Name': 'C13',
+        'Device_ID': 'No1',
+        'Source_IP': '10.184.136.66',
+    })
+    if typed:
+        df['Time'] = pd.to_datetime(df['Time'], format='%Y%m%d%H%M%S')
+        df['Total_Result'] = df['Total_Result'].astype('category')
+    return df
+
+
+def test_blank_cells_stored_as_empty_text(tmp_path):
+    for typed in (False, True):
+        rows = trace_rows(sample_frame(typed))
+        assert rows['test_time'].tolist() == ['20260209080000', '', '20260209080200']
+        assert rows['result'].tolist() == ['OK', 'NG', '']
+        assert rows['parsed_row'].tolist() == [1, 2, 3]
+
+        db_path = str(tmp_path / f"trace_{typed}.sqlite")
+        save_trace_rows(db_path, '20260209', rows)
+        with sqlite3.connect(db_path) as conn:
+            stored = conn.execute("SELECT barcode, test_time, result FROM barcode_tests ORDER BY barcode").fetchall()
+        assert stored == [('DCZ001', '20260209080000', 'OK'), ('DCZ002', '', 'NG'), ('DCZ003', '20260209080200', '')]
@@ -0,0 +1,325 @@
+"""
+條碼追溯索引 (Barcode Traceability)。
+
+每次 run_aggregation 完成後，將當日每筆測試的條碼、日期、來源 IP/線別/站點、
+在日誌檔中解析後的資料列序號、測試時間與判定結果存入本機 SQLite (以條碼建立索引)。
+資料列序號 (parsed_row) 只計入成功解析的資料列：欄位數不符而被略過的行不編號，因此不一定等於原始檔案的行號。
+查詢某個條碼在何時何站測試過只需查索引，不需重新搜尋數月份的原始日誌。
+重跑同一天時以新資料取代該日期的紀錄；尚未彙整過的歷史日期可用 build 補建索引。
+
+    python trace_index.py lookup DCZ30061606 [其他條碼 ...]
+    python trace_index.py lookup DCZ300616 --prefix
+    python trace_index.py build [--from YYYYMMDD] [--to YYYYMMDD] [--force]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from aggregator import (
+    date_range, default_target_date, find_log_dates, find_log_files, load_settings, valid_date
+)
+from ingest import get_log_parser, parse_log_file, resolve_config_path
+
+# 索引所需的日誌欄位 (補建索引時只保留這些欄位)
+TRACE_COLUMNS = ['Time', 'Barcode', 'Total_Result']
+
+# barcode_tests 資料表的欄位 (trace_rows 的欄位順序)
+TRACE_TABLE_COLUMNS = ['barcode', 'log_date', 'test_time', 'line_name', 'device_id', 'source_ip', 'parsed_row', 'result']
+
+# 查詢結果的欄位: (標題, 資料表欄位)
+TRACE_FIELDS = [
+    ('Barcode', 'barcode'),
+    ('Date', 'log_date'),
+    ('Time', 'test_time'),
+    ('Line', 'line_name'),
+    ('Station', 'device_id'),
+    ('Source_IP', 'source_ip'),
+    ('Parsed_Row', 'parsed_row'),
+    ('Result', 'result'),
+]
+
+
+# 批次平行處理多個日期時各程序輪流寫入，等待其他程序寫完的秒數
+INDEX_LOCK_TIMEOUT = 60
+
+
+def open_index(db_path):
+    conn = sqlite3.connect(db_path, timeout=INDEX_LOCK_TIMEOUT)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS barcode_tests (
+            barcode TEXT NOT NULL,
+            log_date TEXT NOT NULL,
+            test_time TEXT NOT NULL DEFAULT '',
+            line_name TEXT NOT NULL,
+            device_id TEXT NOT NULL,
+            source_ip TEXT NOT NULL,
+            parsed_row INTEGER NOT NULL,
+            result TEXT NOT NULL DEFAULT ''
+        )
+    """)
+    # 舊版索引的欄位名稱為 row_no (內容相同，皆為解析後的資料列序號)
+    if 'row_no' in {row[1] for row in conn.execute("PRAGMA table_info(barcode_tests)")}:
+        conn.execute("ALTER TABLE barcode_tests RENAME COLUMN row_no TO parsed_row")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_barcode_tests_barcode ON barcode_tests (barcode)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_barcode_tests_date ON barcode_tests (log_date)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS indexed_dates (
+            log_date TEXT PRIMARY KEY,
+            rows INTEGER NOT NULL,
+            indexed_at TEXT NOT NULL
+        )
+    """)
+    return conn
+
+
+def get_index_path(settings):
+    """
+    依 config.ini 的 [Trace] 區段取得索引資料庫路徑；未啟用時回傳 None。
+    """
+    config = settings['config']
+    if not config.getboolean('Trace', 'Enabled', fallback=False):
+        return None
+    return resolve_config_path(settings['base_dir'], config.get('Trace', 'Database', fallback='./trace_index.sqlite'))
+
+
+def time_text(series):
+    """
+    測試時間統一存為日誌的 YYYYMMDDhhmmss 格式 (Typed 讀取時 Time 為日期時間)。
+    """
+    from log_schema import LOG_TIME_FORMAT
+
+    if hasattr(series, 'dt'):
+        return series.dt.strftime(LOG_TIME_FORMAT).fillna('')
+    return text_values(series).str.replace(r'\.0$', '', regex=True)
+
+
+def text_values(series):
+    """
+    轉為字串並將空白儲存格 (NaN) 轉為 ''，索引的 test_time / result 欄位不允許 NULL。
+    """
+    return series.astype(str).where(series.notna(), '')
+
+
+def trace_rows(df, parsed_row=None):
+    """
+    由已加上標記的日誌資料 (parse_log_file / master_df) 取出索引欄位，略過沒有條碼的資料列。
+    parsed_row 為各列在該日誌檔解析結果中的序號 (1 起算，不含標題列與被略過的行)；
+    None 時依各檔 (Source_IP) 的出現順序編號。
+    """
+    import pandas as pd
+
+    if parsed_row is None:
+        parsed_row = df.groupby('Source_IP', sort=False, observed=True).cumcount() + 1
+
+    barcode = df['Barcode'].astype(str).str.strip()
+    valid = df['Barcode'].notna() & barcode.ne('')
+    frame = {
+        'barcode': barcode,
+        'log_date': df['Log_Date'].astype(str),
+        'test_time': time_text(df['Time']) if 'Time' in df.columns else '',
+        'line_name': df['Line_Name'].astype(str),
+        'device_id': df['Device_ID'].astype(str),
+        'source_ip': df['Source_IP'].astype(str),
+        'parsed_row': parsed_row,
+        'result': text_values(df['Total_Result']).str.strip(),
+    }
+    return pd.DataFrame(frame, index=df.index)[valid.to_numpy()]
+
+
+def save_trace_rows(db_path, log_date, rows):
+    """
+    以當日資料取代索引中同一日期的紀錄 (重跑同一天不會重複)。
+    """
+    # 依條碼排序後寫入，條碼索引的插入位置較集中；逐欄轉為 list 再組合比 itertuples 快
+    rows = rows.sort_values('barcode', kind='stable')
+    values = zip(*(rows[col].tolist() for col in TRACE_TABLE_COLUMNS))
+
+    conn = open_index(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM barcode_tests WHERE log_date = ?", (log_date,))
+            conn.executemany(
+                f"INSERT INTO barcode_tests ({', '.join(TRACE_TABLE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(TRACE_TABLE_COLUMNS))})",
+                values
+            )
+            conn.execute("INSERT OR REPLACE INTO indexed_dates VALUES (?, ?, ?)",
+                         (log_date, len(rows), datetime.now().isoformat(timespec='seconds')))
+    finally:
+        conn.close()
+    logging.info(f"已更新條碼索引: {log_date} (共 {len(rows)} 筆)")
+
+
+def trace_chunk_rows(chunk):
+    """
+    串流模式每批資料的索引欄位 (批次的索引即為日誌檔解析結果中的資料列序號，由 0 起算)。
+    """
+    return trace_rows(chunk, chunk.index + 1)
+
+
+def update_trace_index(db_path, log_date, rows):
+    """
+    run_aggregation 完成後更新條碼索引；失敗只記錄錯誤，不影響日報表。
+    """
+    try:
+        save_trace_rows(db_path, log_date, rows)
+    except sqlite3.Error as e:
+        logging.error(f"寫入條碼索引 {db_path} 失敗: {e}")
+
+
+def indexed_dates(db_path):
+    conn = open_index(db_path)
+    try:
+        return {row[0] for row in conn.execute("SELECT log_date FROM indexed_dates")}
+    finally:
+        conn.close()
+
+
+def index_date(settings, db_path, log_date, ingest):
+    """
+    讀取單日日誌 (只保留索引欄位) 並寫入索引，回傳寫入的筆數；沒有日誌時回傳 None。
+    """
+    from ingest import iter_parsed
+
+    files = find_log_files(settings['source_dir'], log_date)
+    if not files:
+        return None
+
+    frames = []
+    args = (log_date, settings['device_map'], ingest['cache'], ingest['schema'])
+    for df in iter_parsed(parse_log_file, files, args, ingest['workers']):
+        if df is not None:
+            frames.append(trace_rows(df, df.index + 1))
+    if not frames:
+        return None
+
+    import pandas as pd
+
+    rows = pd.concat(frames, ignore_index=True)
+    save_trace_rows(db_path, log_date, rows)
+    return len(rows)
+
+
+def build_index(settings, dates, force=False, jobs=None):
+    """
+    補建 dates 中尚未建立索引的日期 (force=True 時全部重建)，回傳寫入的總筆數。
+    """
+    from ingest import open_ingest
+
+    db_path = get_index_path(settings)
+    done = set() if force else indexed_dates(db_path)
+    pending = [d for d in dates if d not in done]
+    if not pending:
+        logging.info("條碼索引已是最新")
+        return 0
+
+    config = settings['config']
+    schema = {'typed': False, 'columns': list(TRACE_COLUMNS), 'parser': get_log_parser(config)}
+    # 補建索引只讀取少數欄位，不寫入每日報表使用的解析快取
+    ingest = open_ingest(config, settings['base_dir'], 1, schema, jobs)
+    ingest['cache'] = None
+
+    total = 0
+    for log_date in pending:
+        rows = index_date(settings, db_path, log_date, ingest)
+        total += rows or 0
+    return total
+
+
+def lookup(db_path, barcodes, prefix=False):
+    """
+    查詢條碼的所有測試紀錄 (依日期與測試時間排序)，回傳 [dict, ...]。
+    prefix=True 時查詢以指定字串開頭的條碼。
+    """
+    conn = open_index(db_path)
+    conn.row_factory = sqlite3.Row
+    columns = ", ".join(field for _, field in TRACE_FIELDS)
+    try:
+        results = []
+        for barcode in barcodes:
+            barcode = barcode.strip()
+            if prefix:
+                # 以範圍條件查詢，可使用條碼索引
+                query = (f"SELECT {columns} FROM barcode_tests WHERE barcode >= ? AND barcode < ? "
+                         "ORDER BY barcode, log_date, test_time, parsed_row")
+                params = (barcode, barcode + '\uffff')
+            else:
+                query = f"SELECT {columns} FROM barcode_tests WHERE barcode = ? ORDER BY log_date, test_time, parsed_row"
+                params = (barcode,)
+            results.extend(dict(row) for row in conn.execute(query, params))
+        return results
+    finally:
+        conn.close()
+
+
+def print_records(records):
+    headers = [title for title, _ in TRACE_FIELDS]
+    table = [[str(record[field]) for _, field in TRACE_FIELDS] for record in records]
+    widths = [max([len(h)] + [len(row[i]) for row in table]) for i, h in enumerate(headers)]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for row in table:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="條碼追溯索引：查詢條碼的測試紀錄，或補建歷史日誌的索引")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    find = commands.add_parser('lookup', help="查詢條碼在何時何站測試過")
+    find.add_argument('barcodes', nargs='+', help="條碼 (可指定多個)")
+    find.add_argument('--prefix', action='store_true', help="查詢以指定字串開頭的條碼")
+
+    build = commands.add_parser('build', help="補建來源資料夾中尚未建立索引的日期")
+    build.add_argument('--from', dest='date_from', type=valid_date, metavar='YYYYMMDD', help="起始日")
+    build.add_argument('--to', dest='date_to', type=valid_date, metavar='YYYYMMDD', help="結束日 (含)")
+    build.add_argument('--force', action='store_true', help="重建已建立索引的日期")
+    build.add_argument('--jobs', type=int, default=None,
+                       help="平行讀取的程序數 (預設依 config.ini 的 [Performance] Parse_Workers)")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    settings = load_settings()
+    if settings is None:
+        return 1
+
+    db_path = get_index_path(settings)
+    if db_path is None:
+        logging.error("條碼索引未啟用，請確認 config.ini 的 [Trace] 設定")
+        return 1
+
+    if args.command == 'lookup':
+        if not os.path.exists(db_path):
+            logging.error(f"條碼索引尚未建立: {db_path} (請先執行每日彙整或 python trace_index.py build)")
+            return 1
+        start = time.perf_counter()
+        records = lookup(db_path, args.barcodes, args.prefix)
+        elapsed = (time.perf_counter() - start) * 1000
+        if not records:
+            print(f"查無測試紀錄 ({elapsed:.1f} ms)")
+            return 1
+        print_records(records)
+        print(f"共 {len(records)} 筆測試紀錄 ({elapsed:.1f} ms)")
+        return 0
+
+    dates = find_log_dates(settings['source_dir'])
+    if args.date_from:
+        wanted = set(date_range(args.date_from, args.date_to or default_target_date()))
+        dates = [d for d in dates if d in wanted]
+    elif args.date_to:
+        dates = [d for d in dates if d <= args.date_to]
+    total = build_index(settings, dates, args.force, args.jobs)
+    logging.info(f"條碼索引補建完成: 共寫入 {total} 筆 ({db_path})")
+    return 0
+
+
+if __name__ == "__main__":
+    # 打包成執行檔時，子程序需透過 freeze_support 啟動
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+長期趨勢 (Long-term Trend) 資料庫與報表。
+
+每次 run_aggregation 完成後，將當日各線別/站點統計表與偵測到的失效模式存入本機 SQLite，
+Long-term Trend 報表只讀取這些每日彙總資料，不需重新開啟數月份的原始日誌。
+
+    python trend_store.py [起始日期 YYYYMMDD] [結束日期 YYYYMMDD]
+"""
+import logging
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+from aggregator import (
+    DASHBOARD_STYLES, FAILURE_MODES, STAT_MEAN_COLS, STAT_SUM_COLS, finalize_station_stats, format_location,
+    load_settings, write_line_block
+)
+from ingest import resolve_config_path
+from report_writer import SheetLayout, open_report_writer
+
+TREND_FILE_NAME = 'Long-term Trend.xlsx'
+
+# Summary 分頁每個線別列出的比率指標: (名稱, 統計欄位)
+TREND_RATE_METRICS = [
+    ('Total Fail Rate', 'is_fail'),
+    ('Noise Rate', 'calc_noise'),
+    ('RPM Fail Rate', 'calc_rpm_ng'),
+    ('Other Fail Rate', 'calc_others'),
+]
+
+TREND_STYLES = dict(
+    DASHBOARD_STYLES,
+    trend_line=dict(DASHBOARD_STYLES['line_header'], align='left'),
+    trend_date=dict(DASHBOARD_STYLES['line_header'], num_format='yyyy/mm/dd'),
+    trend_block_date=dict(DASHBOARD_STYLES['line_title'], num_format='yyyy/mm/dd'),
+    trend_rate=dict(DASHBOARD_STYLES['g1_sub_value'], num_format='0.00%'),
+)
+
+
+def open_store(db_path):
+    conn = sqlite3.connect(db_path)
+    # 筆數類欄位為整數，平均值分子為浮點數
+    sum_cols = ", ".join(
+        f'"{c}" {"REAL" if c in STAT_MEAN_COLS.values() else "INTEGER"} NOT NULL DEFAULT 0' for c in STAT_SUM_COLS
+    )
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS station_daily (
+            log_date TEXT NOT NULL,
+            line_name TEXT NOT NULL,
+            device_id TEXT NOT NULL,
+            {sum_cols},
+            first_seen INTEGER NOT NULL DEFAULT 0,
+            model_names TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (log_date, line_name, device_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS failure_daily (
+            log_date TEXT NOT NULL,
+            mode_no INTEGER NOT NULL,
+            failure_mode TEXT NOT NULL,
+            location TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_failure_daily_date ON failure_daily (log_date)")
+
+    # 舊版資料庫缺少的統計欄位 (例如 rpm_sum)：補上欄位，舊資料為 NULL
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(station_daily)")}
+    for c in STAT_SUM_COLS:
+        if c not in existing:
+            conn.execute(f'ALTER TABLE station_daily ADD COLUMN "{c}" REAL')
+    return conn
+
+
+def save_daily_stats(db_path, log_date, station_stats, detected_failures):
+    """
+    以當日資料取代資料庫中同一日期的紀錄 (重跑同一天不會重複累加)。
+    """
+    rows = []
+    for (line, station), st in station_stats.iterrows():
+        values = [st[c].item() if hasattr(st[c], 'item') else st[c] for c in STAT_SUM_COLS]
+        rows.append([log_date, line, station] + values + [int(st['first_seen']), '\t'.join(st['model_names'])])
+
+    failures = [
+        (log_date, FAILURE_MODES.index(mode) + 1, mode, loc)
+        for mode, locations in detected_failures.items()
+        for loc in locations
+    ]
+
+    placeholders = ", ".join("?" * (len(STAT_SUM_COLS) + 5))
+    columns = ", ".join(['log_date', 'line_name', 'device_id'] + [f'"{c}"' for c in STAT_SUM_COLS]
+                        + ['first_seen', 'model_names'])
+
+    conn = open_store(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM station_daily WHERE log_date = ?", (log_date,))
+            conn.execute("DELETE FROM failure_daily WHERE log_date = ?", (log_date,))
+            conn.executemany(f"INSERT INTO station_daily ({columns}) VALUES ({placeholders})", rows)
+            conn.executemany("INSERT INTO failure_daily VALUES (?, ?, ?, ?)", failures)
+    finally:
+        conn.close()
+
+    logging.info(f"已更新趨勢資料庫: {log_date} (共 {len(rows)} 個站點)")
+
+
+def load_daily_stats(db_path, start_date=None, end_date=None):
+    """
+    讀取日期區間內的每日統計，回傳 (stats, failures)：
+    stats 以 (log_date, Line_Name, Device_ID) 為索引並已推導比率，failures 為失效模式紀錄。
+    """
+    start_date = start_date or '00000000'
+    end_date = end_date or '99999999'
+
+    conn = open_store(db_path)
+    try:
+        stats = pd.read_sql_query(
+            "SELECT * FROM station_daily WHERE log_date BETWEEN ? AND ? ORDER BY log_date",
+            conn, params=(start_date, end_date)
+        )
+        failures = pd.read_sql_query(
+            "SELECT * FROM failure_daily WHERE log_date BETWEEN ? AND ? ORDER BY log_date, mode_no",
+            conn, params=(start_date, end_date)
+        )
+    finally:
+        conn.close()
+
+    stats = stats.rename(columns={'line_name': 'Line_Name', 'device_id': 'Device_ID'})
+    # 舊版資料庫補上的欄位在舊資料中為 NULL
+    stats = stats.astype({c: 'float64' for c in STAT_MEAN_COLS.values()})
+    stats['model_names'] = [tuple(n.split('\t')) if n else () for n in stats['model_names']]
+    stats = stats.set_index(['log_date', 'Line_Name', 'Device_ID'])
+    return finalize_station_stats(stats), failures
+
+
+def pad_stations(line_stats, stations):
+    """
+    補齊當日沒有資料的站點 (筆數為 0)，使每日區塊的欄位一致。
+    """
+    padded = line_stats.reindex(stations)
+    missing = padded['total'].isna()
+    if missing.any():
+        numeric = [c for c in padded.columns if c != 'model_names']
+        padded[numeric] = padded[numeric].fillna(0)
+        padded['model_names'] = [n if isinstance(n, tuple) else () for n in padded['model_names']]
+        padded['first_seen'] = padded['first_seen'].where(~missing, padded['first_seen'].max() + 1)
+    return padded
+
+
+def line_failure_modes(failures, log_date, line):
+    """
+    回傳該線別當日偵測到的失效模式編號字串，例如 "4, 6"。
+    """
+    code = format_location(line)
+    day = failures[failures['log_date'] == log_date]
+    hits = day[day['location'].str.startswith(f"{code}-")]
+    return ", ".join(str(n) for n in sorted(hits['mode_no'].unique()))
+
+
+def build_trend_workbook(db_path, output_file, start_date=None, end_date=None, excel_engine='openpyxl'):
+    """
+    由每日統計產生 Long-term Trend 報表：
+    Summary 分頁列出各線別每日比率、失效模式與停機台數；各線別分頁依月份並排每日詳細報表。
+    """
+    stats, failures = load_daily_stats(db_path, start_date, end_date)
+    if len(stats) == 0:
+        logging.warning("趨勢資料庫在指定日期區間內沒有資料")
+        return None
+
+    dates = list(stats.index.unique(level='log_date'))
+    lines = sorted(stats.index.unique(level='Line_Name'))
+    date_values = {d: datetime.strptime(d, '%Y%m%d') for d in dates}
+
+    # --- Summary 分頁 ---
+    summary = SheetLayout()
+    current_row = 1
+    for line in lines:
+        line_all = stats.xs(line, level='Line_Name')
+        stations = sorted(line_all.index.unique(level='Device_ID'))
+
+        summary.write(current_row, 1, format_location(line), 'trend_line')
+        for i, d in enumerate(dates):
+            summary.write(current_row, i + 2, date_values[d], 'trend_date')
+
+        for offset, (label, col) in enumerate(TREND_RATE_METRICS, 1):
+            summary.write(current_row + offset, 1, label, 'g1_main_label')
+        summary.write(current_row + 5, 1, 'Failure Mode', 'g1_main_label')
+        summary.write(current_row + 6, 1, 'Shut down device', 'g1_main_label')
+
+        day_dates = set(line_all.index.unique(level='log_date'))
+        for i, d in enumerate(dates):
+            c = i + 2
+            if d not in day_dates:
+                continue
+            day = line_all.xs(d, level='log_date')
+            total = day['total'].sum()
+            for offset, (label, col) in enumerate(TREND_RATE_METRICS, 1):
+                rate = day[col].sum() / total if total > 0 else 0
+                summary.write(current_row + offset, c, rate, 'trend_rate')
+            summary.write(current_row + 5, c, line_failure_modes(failures, d, line), 'g1_sub_value')
+            active = int((day['total'] > 0).sum())
+            summary.write(current_row + 6, c, len(stations) - active, 'g1_sub_value')
+
+        current_row += 7
+
+    # --- 各線別分頁：每月一欄區塊，每日一個詳細報表 ---
+    line_layouts = []
+    for line in lines:
+        layout = SheetLayout()
+        line_all = stats.xs(line, level='Line_Name')
+        stations = sorted(line_all.index.unique(level='Device_ID'))
+        block_width = len(stations) + 3
+
+        months = []
+        rows_by_month = {}
+        for d in line_all.index.unique(level='log_date'):
+            month = d[:6]
+            if month not in rows_by_month:
+                months.append(month)
+                rows_by_month[month] = 1
+            start_col = months.index(month) * block_width + 1
+            day = pad_stations(line_all.xs(d, level='log_date'), stations)
+            rows_by_month[month] = write_line_block(
+                layout, rows_by_month[month], date_values[d], day, start_col=start_col, title_style='trend_block_date'
+            )
+        line_layouts.append((format_location(line), layout))
+
+    with open_report_writer(output_file, excel_engine) as writer:
+        writer.write_layout('Summary', summary, TREND_STYLES)
+        for sheet_name, layout in line_layouts:
+            writer.write_layout(sheet_name, layout, TREND_STYLES)
+
+    logging.info(f"長期趨勢報表輸出完畢 ({dates[0]} ~ {dates[-1]}, 共 {len(dates)} 天): {output_file}")
+    return output_file
+
+
+def get_store_path(settings):
+    """
+    依 config.ini 的 [Trend] 區段取得資料庫路徑；未啟用時回傳 None。
+    """
+    config = settings['config']
+    if not config.getboolean('Trend', 'Enabled', fallback=False):
+        return None
+    return resolve_config_path(settings['base_dir'], config.get('Trend', 'Database', fallback='./trend_store.sqlite'))
+
+
+def run_trend_report(start_date=None, end_date=None):
+    settings = load_settings()
+    if settings is None:
+        return None
+
+    db_path = get_store_path(settings)
+    if db_path is None or not os.path.exists(db_path):
+        logging.error("趨勢資料庫未啟用或尚未建立，請確認 config.ini 的 [Trend] 設定並先執行每日彙整")
+        return None
+
+    output_file = os.path.join(settings['output_dir'], TREND_FILE_NAME)
+    excel_engine = settings['config'].get('Output', 'Excel_Engine', fallback='openpyxl').strip()
+    return build_trend_workbook(db_path, output_file, start_date, end_date, excel_engine)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run_trend_report(args[0] if len(args) > 0 else None, args[1] if len(args) > 1 else None)
@@ -0,0 +1,179 @@
+"""
+常駐監看模式：Source_Folder 中的日誌有變動時，自動重新產生該日期的 Daily_Summary。
+
+以 os.scandir 定期比對各日誌檔的大小與修改時間 (不需額外套件，網路磁碟亦可使用)，
+只重新彙整有變動的日期。測試機台會連續寫入，因此同一日期需靜止 Debounce_Seconds 後才重建，
+持續寫入時最晚每 Max_Delay_Seconds 重建一次。重建時強制使用解析快取，未變動的日誌檔不重新解析；
+報表先寫入暫存檔再取代，開啟中的報表不會讀到寫到一半的內容。
+
+    python watcher.py
+    python aggregator.py --watch
+"""
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+from aggregator import find_log_files, is_summary_up_to_date, load_settings, run_aggregation
+
+LOG_NAME_PATTERN = re.compile(r"(\d{8})_.+\.txt$")
+
+DEFAULT_WATCH_OPTIONS = {
+    'poll_seconds': 10.0,
+    'debounce_seconds': 30.0,
+    'max_delay_seconds': 300.0,
+    'catch_up_days': 2,
+}
+
+
+def get_watch_options(config):
+    """
+    由 config.ini 的 [Watch] 區段取得監看設定。
+    """
+    options = dict(DEFAULT_WATCH_OPTIONS)
+    keys = {
+        'poll_seconds': 'Poll_Seconds',
+        'debounce_seconds': 'Debounce_Seconds',
+        'max_delay_seconds': 'Max_Delay_Seconds',
+        'catch_up_days': 'Catch_Up_Days',
+    }
+    for key, name in keys.items():
+        try:
+            if key == 'catch_up_days':
+                options[key] = config.getint('Watch', name, fallback=options[key])
+            else:
+                options[key] = config.getfloat('Watch', name, fallback=options[key])
+        except ValueError:
+            logging.error(f"Config 中 [Watch] {name} 必須為數字，改用預設值 {options[key]}")
+    options['poll_seconds'] = max(1.0, options['poll_seconds'])
+    return options
+
+
+def scan_source(source_dir):
+    """
+    回傳 {檔名: (大小, 修改時間)}；資料夾無法讀取時回傳 None (例如網路磁碟暫時斷線)。
+    """
+    snapshot = {}
+    try:
+        with os.scandir(source_dir) as entries:
+            for entry in entries:
+                if not LOG_NAME_PATTERN.match(entry.name):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                snapshot[entry.name] = (st.st_size, st.st_mtime_ns)
+    except OSError as e:
+        logging.error(f"無法讀取來源資料夾 {source_dir}: {e}")
+        return None
+    return snapshot
+
+
+def changed_dates(before, after):
+    """
+    比對兩次掃描結果，回傳有新增、修改或刪除日誌檔的日期。
+    """
+    names = set(before) | set(after)
+    return {LOG_NAME_PATTERN.match(n).group(1) for n in names if before.get(n) != after.get(n)}
+
+
+def due_dates(pending, now, options):
+    """
+    pending: {日期: (第一次變動時間, 最後一次變動時間)}。
+    回傳已靜止 debounce_seconds，或自第一次變動起已等待 max_delay_seconds 的日期。
+    """
+    due = []
+    for date, (first_change, last_change) in sorted(pending.items()):
+        if now - last_change >= options['debounce_seconds'] or now - first_change >= options['max_delay_seconds']:
+            due.append(date)
+    return due
+
+
+def stale_recent_dates(settings, snapshot, days):
+    """
+    啟動時補做最近 days 天內報表不存在或已過期的日期。
+    """
+    oldest = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
+    dates = sorted({LOG_NAME_PATTERN.match(n).group(1) for n in snapshot})
+    return [
+        d for d in dates
+        if d >= oldest and not is_summary_up_to_date(settings, d, find_log_files(settings['source_dir'], d))
+    ]
+
+
+def enable_parse_cache(config):
+    """
+    監看模式下每次重建只有少數日誌檔變動，強制啟用解析快取以重用其餘檔案的解析結果。
+    """
+    if not config.has_section('Cache'):
+        config.add_section('Cache')
+    if not config.getboolean('Cache', 'Enabled', fallback=False):
+        config.set('Cache', 'Enabled', 'true')
+        logging.info("監看模式: 已啟用解析快取")
+
+
+def rebuild(settings, date):
+    try:
+        run_aggregation(date, settings=settings)
+    except Exception as e:
+        logging.error(f"重新產生日期 {date} 的報表失敗: {e}")
+
+
+def run_watcher(settings=None):
+    """
+    持續監看 Source_Folder 並重建有變動日期的報表，直到 Ctrl+C。
+    """
+    if settings is None:
+        settings = load_settings()
+    if settings is None:
+        return 1
+
+    config = settings['config']
+    options = get_watch_options(config)
+    enable_parse_cache(config)
+    source_dir = settings['source_dir']
+
+    snapshot = scan_source(source_dir)
+    if snapshot is None:
+        return 1
+
+    logging.info(
+        f"開始監看 {source_dir} (每 {options['poll_seconds']:g} 秒掃描, 靜止 {options['debounce_seconds']:g} 秒後重建, "
+        f"最長延遲 {options['max_delay_seconds']:g} 秒)"
+    )
+
+    pending = {}
+    if options['catch_up_days'] > 0:
+        now = time.monotonic()
+        for date in stale_recent_dates(settings, snapshot, options['catch_up_days']):
+            logging.info(f"日期 {date} 的報表不存在或已過期，排入重建")
+            pending[date] = (now - options['max_delay_seconds'], now - options['debounce_seconds'])
+
+    try:
+        while True:
+            now = time.monotonic()
+            for date in due_dates(pending, now, options):
+                del pending[date]
+                logging.info(f"偵測到日期 {date} 的日誌變動，重新產生報表")
+                rebuild(settings, date)
+
+            time.sleep(options['poll_seconds'])
+
+            current = scan_source(source_dir)
+            if current is None:
+                continue
+            now = time.monotonic()
+            for date in changed_dates(snapshot, current):
+                first_change = pending.get(date, (now, now))[0]
+                pending[date] = (first_change, now)
+            snapshot = current
+    except KeyboardInterrupt:
+        logging.info("已停止監看")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_watcher())